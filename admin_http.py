@@ -0,0 +1,156 @@
+"""
+Pure-HTTP admin mode: read and save Gravity Forms notifications with plain
+GET/POST requests, using the cookies of the one manual browser login.
+
+The notification edit page is an ordinary HTML form. Saving it means posting
+back every control it contains (nonce included) with the routing replaced, the
+same request the browser sends when "Update Notification" is clicked, so no
+page has to be rendered or scripted. Each worker thread keeps its own pooled
+keep-alive connection, so many forms can be processed at once.
+
+Gravity Forms serializes the routing table into a hidden JSON field when the
+form is submitted (gform_routing_meta before 2.5, _gform_setting_routing
+since); the table itself is built by JavaScript from that JSON and the page's
+form object, which is where the routing rows and field choices are read from
+(see gf_parser).
+"""
+
+import json
+import threading
+import time
+
+from gf_parser import (
+    ROUTING_JSON_FIELDS,
+    TO_TYPE_FIELDS,
+    is_login_page,
+    parse_export_page,
+    parse_form_export,
+    parse_form_list,
+    parse_notification_list,
+    parse_notification_page,
+)
+from session_broker import SessionExpired
+
+USER_AGENT = "Mozilla/5.0 (lead-router admin-http)"
+
+
+class AdminHttpClient:
+    """Thread-safe WordPress admin client: one keep-alive requests.Session per worker thread."""
+
+    def __init__(self, site, session_broker, workers=8, timeout=30, latency=None):
+        self.site = site.rstrip('/')
+        self.admin = self.site + '/wp/wp-admin/'
+        self.session_broker = session_broker
+        self.workers = workers
+        self.timeout = timeout
+        self.latency = latency  # LatencyStore: request timeouts follow the site's observed response times
+        self._local = threading.local()
+
+    def _session(self):
+        """This thread's session, reloaded with cookies after every re-login."""
+        local = self._local
+        if getattr(local, 'session', None) is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            local.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+            local.session.mount('https://', adapter)
+            local.session.mount('http://', adapter)
+            local.session.headers['User-Agent'] = USER_AGENT
+            local.generation = None
+        if local.generation != self.session_broker.generation:
+            local.session.cookies.clear()
+            self.session_broker.apply_to_session(local.session)
+            local.generation = self.session_broker.generation
+        return local.session
+
+    @property
+    def generation(self):
+        """Session generation this thread is using (pass it to SessionBroker.renew)."""
+        return getattr(self._local, 'generation', None) or self.session_broker.generation
+
+    def _check(self, response):
+        if self.session_broker.is_login_url(response.url) or is_login_page(response.text):
+            raise SessionExpired(f"redirected to login page {response.url}")
+        response.raise_for_status()
+        return response
+
+    def _request(self, method, url, **kwargs):
+        timeout = self.latency.timeout('http', self.timeout) if self.latency else self.timeout
+        start = time.perf_counter()
+        response = self._session().request(method, url, timeout=timeout, **kwargs)
+        if self.latency:
+            self.latency.record('http', time.perf_counter() - start)
+        return self._check(response)
+
+    def get(self, url):
+        return self._request('GET', url)
+
+    def post(self, url, data, referer):
+        return self._request('POST', url, data=data, headers={'Referer': referer})
+
+    def list_active_forms(self):
+        response = self.get(self.admin + 'admin.php?page=gf_edit_forms&active=1')
+        return parse_form_list(response.text, response.url)
+
+    def notifications_url(self, form_id):
+        return f"{self.admin}admin.php?page=gf_edit_forms&view=settings&subview=notification&id={form_id}"
+
+    def list_notifications(self, form_id):
+        """[{'name', 'href', 'nid'}] for a form's notifications."""
+        response = self.get(self.notifications_url(form_id))
+        return parse_notification_list(response.text, response.url)
+
+    def export_forms(self, form_ids):
+        """Current state of many forms from one Import/Export download (see gf_parser.parse_form_export)."""
+        export_url = self.admin + 'admin.php?page=gf_export&view=export_form'
+        response = self.get(export_url)
+        export_form = parse_export_page(response.text, response.url)
+        if export_form is None:
+            raise ValueError("No export form on the Import/Export screen (missing permission or an unsupported Gravity Forms version)")
+        action, controls, submit = export_form
+        data = [tuple(control) for control in controls] + [('gf_form_id[]', str(form_id)) for form_id in form_ids]
+        response = self.post(action, data + [submit], referer=response.url)
+        try:
+            return parse_form_export(response.text, self.notifications_url)
+        except ValueError:
+            raise ValueError(f"Export did not return JSON ({response.headers.get('Content-Type', 'unknown type')})")
+
+    def load_notification(self, href):
+        response = self.get(href)
+        page = parse_notification_page(response.text, response.url)
+        if page.submit is None:
+            raise ValueError(f"No notification form found at {href}")
+        return page
+
+    def save_notification(self, page, rules):
+        """Post the page back with its routing replaced by rules.
+
+        Returns (errors, saved_page): Gravity Forms' error notices and the
+        re-rendered page, whose routing should now equal rules.
+        """
+        if not page.routing_field:
+            raise ValueError("Notification page has no routing field to post")
+        routing = json.dumps([{
+            'fieldId': rule['field_id'] or page.field_id(rule['field']),
+            'operator': rule['operator'] or 'is',
+            'value': rule['value'],
+            'email': rule['email'],
+        } for rule in rules])
+
+        data = []
+        for name, value in page.fields:
+            if name == page.routing_field:
+                value = routing
+            elif name in TO_TYPE_FIELDS:
+                value = 'routing'
+            data.append((name, value))
+        if not any(name in TO_TYPE_FIELDS for name, _ in data):
+            data.append((TO_TYPE_FIELDS[0] if page.routing_field == ROUTING_JSON_FIELDS[0]
+                         else TO_TYPE_FIELDS[1], 'routing'))
+        if page.submit and page.submit[0]:
+            data.append(page.submit)
+
+        response = self.post(page.action, data, referer=page.url)
+        saved = parse_notification_page(response.text, response.url)
+        return saved.errors, saved
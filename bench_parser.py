@@ -0,0 +1,148 @@
+"""
+Benchmark and regression check for gf_parser.
+
+Every page in fixtures/gf_pages (and any extra directory given) is parsed with
+each installed backend, compared with the page's .expected.json, and timed.
+
+    python bench_parser.py                  check, then time every backend
+    python bench_parser.py --check          check only; exit 1 on any mismatch
+    python bench_parser.py --update         rewrite the .expected.json files
+    python bench_parser.py --pages DIR      also use saved pages from DIR
+
+An .expected.json holds {"kind": "notification" | "notification_list" |
+"form_list", "url": ..., "expected": ...}. Pages saved from a real site can be
+added to the corpus by dropping them in with --update after checking the output.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import gf_parser
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'gf_pages')
+REFERENCE_BACKEND = 'html.parser'
+
+
+def guess_kind(name):
+    if 'form_list' in name:
+        return 'form_list'
+    if 'notification_list' in name:
+        return 'notification_list'
+    return 'notification'
+
+
+def parse(kind, html, url, backend):
+    if kind == 'form_list':
+        return gf_parser.parse_form_list(html, url, backend)
+    if kind == 'notification_list':
+        return gf_parser.parse_notification_list(html, url, backend)
+    return gf_parser.parse_notification_page(html, url, backend).as_dict()
+
+
+def load_pages(directories):
+    pages = []
+    for directory in directories:
+        for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+            with open(path, encoding='utf-8') as f:
+                html = f.read()
+            expected_path = path[:-len('.html')] + '.expected.json'
+            spec = None
+            if os.path.exists(expected_path):
+                with open(expected_path, encoding='utf-8') as f:
+                    spec = json.load(f)
+            pages.append({'path': path, 'html': html, 'expected_path': expected_path, 'spec': spec})
+    return pages
+
+
+def update(pages):
+    for page in pages:
+        name = os.path.basename(page['path'])
+        spec = page['spec'] or {
+            'kind': guess_kind(name),
+            'url': 'https://dealer.example.com/wp/wp-admin/admin.php?page=gf_edit_forms',
+        }
+        spec['expected'] = parse(spec['kind'], page['html'], spec['url'], REFERENCE_BACKEND)
+        with open(page['expected_path'], 'w', encoding='utf-8') as f:
+            json.dump(spec, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print(f"Updated {os.path.basename(page['expected_path'])}")
+
+
+def check(pages, backends):
+    failures = 0
+    for page in pages:
+        name = os.path.basename(page['path'])
+        if page['spec'] is None:
+            print(f"  {name}: no .expected.json (run with --update)")
+            failures += 1
+            continue
+        spec = page['spec']
+        for backend in backends:
+            result = json.loads(json.dumps(parse(spec['kind'], page['html'], spec['url'], backend)))
+            if result != spec['expected']:
+                failures += 1
+                print(f"  MISMATCH {name} [{backend}]")
+                if isinstance(result, dict):
+                    for key in sorted(set(result) | set(spec['expected'])):
+                        if result.get(key) != spec['expected'].get(key):
+                            print(f"    {key}: got {str(result.get(key))[:120]}")
+                            print(f"    {key}: expected {str(spec['expected'].get(key))[:120]}")
+    return failures
+
+
+def benchmark(pages, backends, iterations):
+    print(f"\n{'page':<32}" + ''.join(f"{backend:>14}" for backend in backends) + "   (ms per page)")
+    totals = {backend: 0.0 for backend in backends}
+    for page in pages:
+        spec = page['spec'] or {'kind': guess_kind(os.path.basename(page['path'])), 'url': ''}
+        row = f"{os.path.basename(page['path'])[:31]:<32}"
+        for backend in backends:
+            parse(spec['kind'], page['html'], spec['url'], backend)  # Warm up imports
+            start = time.perf_counter()
+            for _ in range(iterations):
+                parse(spec['kind'], page['html'], spec['url'], backend)
+            elapsed = (time.perf_counter() - start) / iterations * 1000
+            totals[backend] += elapsed
+            row += f"{elapsed:>14.3f}"
+        print(row)
+    print(f"{'total':<32}" + ''.join(f"{totals[backend]:>14.3f}" for backend in backends))
+    fallback = totals.get(REFERENCE_BACKEND)
+    if fallback:
+        for backend in backends:
+            if backend != REFERENCE_BACKEND and totals[backend]:
+                print(f"{backend} is {fallback / totals[backend]:.1f}x faster than {REFERENCE_BACKEND}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check the Gravity Forms page parsers")
+    parser.add_argument('--pages', action='append', default=[], metavar='DIR',
+                        help="extra directory of saved pages (repeatable)")
+    parser.add_argument('--iterations', type=int, default=200, help="parses per page and backend (default 200)")
+    parser.add_argument('--check', action='store_true', help="only check against the expected output")
+    parser.add_argument('--update', action='store_true', help="regenerate the expected output")
+    args = parser.parse_args()
+
+    pages = load_pages([FIXTURE_DIR] + args.pages)
+    if not pages:
+        print("No pages found")
+        return 1
+    if args.update:
+        update(pages)
+        return 0
+
+    backends = gf_parser.available_backends()
+    print(f"Checking {len(pages)} pages with {', '.join(backends)}")
+    failures = check(pages, backends)
+    print("All backends match the expected output" if not failures else f"{failures} mismatches")
+    if args.check:
+        return 1 if failures else 0
+    benchmark(pages, backends, args.iterations)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Browser health watchdog for long Lead Router runs.
+Samples Chrome memory and WebDriver command latency, and decides when the
+automation session should be recycled.
+"""
+
+import subprocess
+import sys
+import time
+
+from env_config import env_float, env_int
+
+
+class BrowserWatchdog:
+    """Tracks browser health and tells the caller when to restart Chrome.
+
+    Thresholds come from the environment (.env):
+      LEADROUTER_RECYCLE_EVERY     restart after this many forms (0 = never)
+      LEADROUTER_MAX_RSS_MB        total Chrome process tree RSS limit
+      LEADROUTER_MAX_JS_HEAP_MB    renderer JS heap limit
+      LEADROUTER_MAX_LATENCY_MS    WebDriver round-trip latency limit
+    """
+
+    def __init__(self):
+        self.recycle_every = env_int('LEADROUTER_RECYCLE_EVERY', 75)
+        self.max_rss_mb = env_float('LEADROUTER_MAX_RSS_MB', 2500)
+        self.max_js_heap_mb = env_float('LEADROUTER_MAX_JS_HEAP_MB', 512)
+        self.max_latency_ms = env_float('LEADROUTER_MAX_LATENCY_MS', 2000)
+        # Latency must stay over the limit for this many samples in a row,
+        # so a single slow page load does not trigger a restart.
+        self.latency_strikes_needed = env_int('LEADROUTER_LATENCY_STRIKES', 3)
+        self.forms_since_restart = 0
+        self.restarts = 0
+        self.last_sample = {}
+        self._latency_strikes = 0
+        self._metrics_enabled = False
+
+    def reset(self):
+        """Call after a fresh browser session has been started."""
+        self.forms_since_restart = 0
+        self._latency_strikes = 0
+        self._metrics_enabled = False
+
+    def form_done(self):
+        self.forms_since_restart += 1
+
+    def sample(self, driver):
+        """Collect one health sample from the running browser."""
+        sample = {
+            'rss_mb': None,
+            'js_heap_mb': None,
+            'latency_ms': None,
+        }
+
+        # WebDriver round-trip latency for a trivial command
+        start = time.perf_counter()
+        driver.execute_script("return 1")
+        sample['latency_ms'] = (time.perf_counter() - start) * 1000
+
+        # Renderer JS heap via the Chrome DevTools Protocol
+        try:
+            if not self._metrics_enabled:
+                driver.execute_cdp_cmd('Performance.enable', {})
+                self._metrics_enabled = True
+            metrics = driver.execute_cdp_cmd('Performance.getMetrics', {})
+            for metric in metrics.get('metrics', []):
+                if metric.get('name') == 'JSHeapUsedSize':
+                    sample['js_heap_mb'] = metric['value'] / (1024 * 1024)
+                    break
+        except Exception:
+            pass
+
+        # Resident memory of chromedriver and every Chrome process under it
+        try:
+            root_pid = driver.service.process.pid
+            sample['rss_mb'] = process_tree_rss_mb(root_pid)
+        except Exception:
+            pass
+
+        self.last_sample = sample
+        return sample
+
+    def check(self, driver):
+        """Return a restart reason, or None if the browser is healthy.
+
+        Raises whatever WebDriver raises if the session is already dead,
+        so the caller can treat that as a lost session.
+        """
+        if self.recycle_every and self.forms_since_restart >= self.recycle_every:
+            return f"scheduled restart after {self.forms_since_restart} forms"
+
+        sample = self.sample(driver)
+
+        if sample['rss_mb'] is not None and sample['rss_mb'] > self.max_rss_mb:
+            return f"Chrome RSS {sample['rss_mb']:.0f} MB over {self.max_rss_mb:.0f} MB"
+        if sample['js_heap_mb'] is not None and sample['js_heap_mb'] > self.max_js_heap_mb:
+            return f"JS heap {sample['js_heap_mb']:.0f} MB over {self.max_js_heap_mb:.0f} MB"
+
+        if sample['latency_ms'] > self.max_latency_ms:
+            self._latency_strikes += 1
+            if self._latency_strikes >= self.latency_strikes_needed:
+                return f"command latency {sample['latency_ms']:.0f} ms over {self.max_latency_ms:.0f} ms"
+        else:
+            self._latency_strikes = 0
+
+        return None
+
+    def describe(self):
+        """Short human readable summary of the last sample."""
+        s = self.last_sample
+        parts = []
+        if s.get('rss_mb') is not None:
+            parts.append(f"RSS {s['rss_mb']:.0f} MB")
+        if s.get('js_heap_mb') is not None:
+            parts.append(f"JS heap {s['js_heap_mb']:.0f} MB")
+        if s.get('latency_ms') is not None:
+            parts.append(f"latency {s['latency_ms']:.0f} ms")
+        return ", ".join(parts) if parts else "no sample"
+
+
+def process_tree_rss_mb(root_pid):
+    """Sum the RSS of a process and all of its descendants, in MB.
+
+    Uses psutil when it is installed, otherwise falls back to `ps`
+    (macOS/Linux). Returns None when neither is available.
+    """
+    try:
+        import psutil
+        root = psutil.Process(root_pid)
+        procs = [root] + root.children(recursive=True)
+        total = 0
+        for proc in procs:
+            try:
+                total += proc.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total / (1024 * 1024)
+    except ImportError:
+        pass
+
+    if sys.platform.startswith('win'):
+        return None
+
+    output = subprocess.run(
+        ['ps', '-A', '-o', 'pid=,ppid=,rss='],
+        capture_output=True, text=True, timeout=5
+    ).stdout
+
+    children = {}
+    rss_kb = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) != 3:
+            continue
+        pid, ppid, rss = (int(p) for p in parts)
+        children.setdefault(ppid, []).append(pid)
+        rss_kb[pid] = rss
+
+    total_kb = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total_kb += rss_kb.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total_kb / 1024
@@ -0,0 +1,88 @@
+"""
+Attach to a long-lived Chrome started with --remote-debugging-port instead of
+launching a new one for every run.
+
+The attached Chrome keeps its SSO login between runs, so back-to-back runs
+start without the manual login. If nothing is listening on the port, a
+Chrome is started detached from this process (with its own profile in
+LEADROUTER_ATTACH_PROFILE, default /tmp/chrome-leadrouter-debug-profile) and
+is left running when the run ends.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_PORT = 9222
+
+
+def debugger_version(port, timeout=2):
+    """Chrome's /json/version info if a debuggable Chrome is listening on port, else None."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/version", timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def start_debug_chrome(chrome_binary, port, user_data_dir=None, start_url=None, timeout=30):
+    """Start Chrome detached with remote debugging on port and wait until it answers.
+
+    The process is put in its own session so it outlives this script (and a
+    Ctrl+C in this terminal). Returns the /json/version info.
+    """
+    user_data_dir = user_data_dir or os.getenv('LEADROUTER_ATTACH_PROFILE', '/tmp/chrome-leadrouter-debug-profile')
+    os.makedirs(user_data_dir, exist_ok=True)
+    command = [
+        chrome_binary,
+        f"--remote-debugging-port={port}",
+        "--remote-debugging-address=127.0.0.1",
+        f"--user-data-dir={user_data_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--window-size=1920,1080",
+    ]
+    if start_url:
+        command.append(start_url)
+    detach = {'creationflags': subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP} \
+        if sys.platform == 'win32' else {'start_new_session': True}
+    subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, close_fds=True, **detach)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = debugger_version(port)
+        if info:
+            return info
+        time.sleep(0.25)
+    raise RuntimeError(f"Chrome did not open its debugging port {port} within {timeout}s")
+
+
+def find_admin_tab(driver, admin_url, is_login_url):
+    """Switch to a tab already on wp-admin of this site. Returns its handle, or None.
+
+    Tabs are checked without loading anything, so an authenticated tab left over
+    from an earlier run is reused as is.
+    """
+    current = None
+    try:
+        current = driver.current_window_handle
+    except Exception:
+        pass
+    handles = driver.window_handles
+    # Check the tab chromedriver attached to first, it is usually the one in front
+    for handle in sorted(handles, key=lambda h: h != current):
+        try:
+            driver.switch_to.window(handle)
+            url = driver.current_url
+        except Exception:
+            continue
+        if url.startswith(admin_url) and not is_login_url(url):
+            return handle
+    if handles:
+        driver.switch_to.window(current if current in handles else handles[0])
+    return None
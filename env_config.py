@@ -0,0 +1,29 @@
+"""
+Helpers for reading Lead Router tuning options from the environment (.env).
+"""
+
+import os
+
+
+def env_float(name, default):
+    """Read a float from the environment, falling back to default."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+def env_int(name, default):
+    """Read an int from the environment, falling back to default."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def env_flag(name, default=False):
+    """Read a yes/no flag from the environment."""
+    value = os.getenv(name)
+    if value is None or value.strip() == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'y', 'on')
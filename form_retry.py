@@ -0,0 +1,143 @@
+"""
+Failure classification and retry scheduling for form processing.
+Transient failures (timeouts, stale elements, lost sessions) are retried at
+the end of the queue with exponential backoff; permanent ones are not.
+"""
+
+import random
+import time
+
+from env_config import env_float, env_int
+
+# Failure classes
+TIMEOUT = "timeout"
+STALE_ELEMENT = "stale_element"
+SESSION_LOST = "session_lost"
+VALIDATION_ERROR = "validation_error"
+MISSING_FIELD = "missing_field"
+CONFLICT = "conflict"  # Someone else changed the notification between our read and our save
+NETWORK_ERROR = "network_error"  # HTTP mode: the site could not be reached
+HTTP_ERROR = "http_error"  # HTTP mode: the site answered with a server error (or 403/408/429)
+UNKNOWN = "unknown"
+
+TRANSIENT_ERRORS = {TIMEOUT, STALE_ELEMENT, SESSION_LOST, CONFLICT, NETWORK_ERROR, HTTP_ERROR, UNKNOWN}
+PERMANENT_ERRORS = {VALIDATION_ERROR, MISSING_FIELD}
+
+
+def classify_error(error):
+    """Map an exception (or an already classified string) to a failure class."""
+    if error is None:
+        return UNKNOWN
+    if isinstance(error, str):
+        return error
+
+    # HTTP mode raises requests exceptions, many of which are also OSErrors
+    import requests
+
+    if isinstance(error, requests.Timeout):
+        return TIMEOUT
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        if 400 <= status < 500 and status not in (403, 408, 429):
+            return VALIDATION_ERROR  # The request itself was rejected; sending it again won't help
+        return HTTP_ERROR
+    if isinstance(error, requests.ConnectionError):
+        return NETWORK_ERROR
+    if isinstance(error, requests.RequestException):
+        return HTTP_ERROR
+
+    from selenium.common.exceptions import (
+        InvalidSessionIdException,
+        NoSuchElementException,
+        NoSuchWindowException,
+        StaleElementReferenceException,
+        TimeoutException,
+        UnexpectedAlertPresentException,
+        WebDriverException,
+    )
+
+    if isinstance(error, TimeoutException):
+        return TIMEOUT
+    if isinstance(error, StaleElementReferenceException):
+        return STALE_ELEMENT
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException)):
+        return SESSION_LOST
+    if isinstance(error, NoSuchElementException):
+        return MISSING_FIELD
+    if isinstance(error, UnexpectedAlertPresentException):
+        return VALIDATION_ERROR
+
+    message = str(error).lower()
+    if isinstance(error, WebDriverException):
+        if ("invalid session id" in message or "disconnected" in message
+                or "no such window" in message or "connection refused" in message):
+            return SESSION_LOST
+        if "timed out" in message or "timeout" in message:
+            return TIMEOUT
+    if isinstance(error, (ConnectionError, OSError)):
+        return SESSION_LOST
+    return UNKNOWN
+
+
+def is_transient(error_class):
+    return error_class in TRANSIENT_ERRORS
+
+
+class RetryScheduler:
+    """Decides whether a failed form is retried and when it becomes due again.
+
+    Options from the environment (.env):
+      LEADROUTER_MAX_RETRIES       retries per form for transient errors
+      LEADROUTER_RETRY_BASE_DELAY  first backoff delay in seconds
+      LEADROUTER_RETRY_MAX_DELAY   upper bound for the backoff delay
+    """
+
+    def __init__(self):
+        self.max_retries = env_int('LEADROUTER_MAX_RETRIES', 3)
+        self.base_delay = env_float('LEADROUTER_RETRY_BASE_DELAY', 5)
+        self.max_delay = env_float('LEADROUTER_RETRY_MAX_DELAY', 120)
+        self.attempts = {}       # form_id -> retries scheduled so far
+        self.due_at = {}         # form_id -> monotonic time the retry is due
+        self.last_error = {}     # form_id -> failure class of the last attempt
+
+    def record(self, form_id, error_class):
+        self.last_error[form_id] = error_class
+
+    def schedule(self, form_id, error_class):
+        """Record a failure. Returns the backoff delay if the form should be
+        retried, or None if it failed permanently or ran out of retries."""
+        self.record(form_id, error_class)
+        if not is_transient(error_class):
+            return None
+        attempt = self.attempts.get(form_id, 0) + 1
+        if attempt > self.max_retries:
+            return None
+        self.attempts[form_id] = attempt
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay *= random.uniform(0.8, 1.2)  # Jitter so retries don't line up
+        self.due_at[form_id] = time.monotonic() + delay
+        return delay
+
+    def requeue(self, form_id, error_class):
+        """Count a retry that is redone right away (e.g. after logging in again) rather than
+        after a backoff. Returns False once the form has used up its retries."""
+        self.record(form_id, error_class)
+        attempt = self.attempts.get(form_id, 0) + 1
+        if attempt > self.max_retries:
+            return False
+        self.attempts[form_id] = attempt
+        return True
+
+    def remaining(self, form_id):
+        """Seconds until the form's retry is due (0 if due or never failed)."""
+        due = self.due_at.get(form_id)
+        if due is None:
+            return 0
+        return max(0, due - time.monotonic())
+
+    def succeeded(self, form_id):
+        self.due_at.pop(form_id, None)
+        self.last_error.pop(form_id, None)
+
+    def retries(self, form_id):
+        return self.attempts.get(form_id, 0)
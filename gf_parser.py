@@ -0,0 +1,537 @@
+"""
+Fast parsing of Gravity Forms admin pages fetched over plain HTTP.
+
+Extracts the structures the browser mode reads through WebDriver: the routing
+rows (routing_field_id_N / routing_operator_N / routing_value_N /
+routing_email_N or the routing JSON field), the routing field dropdown and
+choice options, the notification form's controls and nonce, error notices, and
+the form and notification list links.
+
+The page is scanned once by the fastest parser available - selectolax
+(Lexbor), then lxml, then the standard library's html.parser - into a small
+intermediate structure, and everything else is read from that. Force a backend
+with LEADROUTER_HTML_PARSER=selectolax|lxml|html.parser. bench_parser.py times
+the backends and checks them against the fixtures in fixtures/gf_pages.
+"""
+
+import json
+import os
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+ROUTING_JSON_FIELDS = ("_gform_setting_routing", "gform_routing_meta")
+TO_TYPE_FIELDS = ("_gform_setting_toType", "gform_notification_to_type")
+SAVE_BUTTON_VALUES = ("Update Notification", "Save Notification")
+ERROR_CLASSES = ("gform_validation_error", "gform-settings-validation__error",
+                 "notice-error", "gform-alert--error")
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+
+class NotificationPage:
+    """Everything needed to rewrite one notification's routing and post it back."""
+
+    def __init__(self, url):
+        self.url = url
+        self.action = url
+        self.fields = []        # [name, value] pairs in document order, as the browser would post them
+        self.submit = None      # (name, value) of the save button
+        self.routing = []       # rules: index, field_id, field, operator, value, email
+        self.field_options = []  # (field_id, label) of the routing field dropdown
+        self.choices = {}       # field_id -> [(value, text)] for choice fields
+        self.routing_field = None  # name of the hidden JSON field holding the routing
+        self.to_type = None     # "routing" if Configure Routing is selected
+        self.nonce = None
+        self.errors = []
+
+    def field_label(self, field_id):
+        for option_id, label in self.field_options:
+            if option_id == str(field_id):
+                return label
+        return ''
+
+    def field_id(self, label):
+        for option_id, label_text in self.field_options:
+            if label_text == label:
+                return option_id
+        return ''
+
+    def as_dict(self):
+        """Plain JSON-compatible view (used by the regression corpus)."""
+        return {
+            'action': self.action,
+            'fields': [list(pair) for pair in self.fields],
+            'submit': list(self.submit) if self.submit else None,
+            'routing': self.routing,
+            'field_options': [list(option) for option in self.field_options],
+            'choices': {key: [list(choice) for choice in value] for key, value in self.choices.items()},
+            'routing_field': self.routing_field,
+            'to_type': self.to_type,
+            'nonce': self.nonce,
+            'errors': self.errors,
+        }
+
+
+class _Scan:
+    """What one pass over a page collects; filled in by a backend."""
+
+    def __init__(self):
+        self.forms = []      # {'action', 'method', 'controls': [[name, value]], 'submits': [(name, value)]}
+        self.selects = {}    # id -> {'name', 'options': [(value, text, selected)]}
+        self.inputs = {}     # id -> value, for routing_* inputs
+        self.links = []      # (href, text)
+        self.errors = []
+        self.scripts = []
+
+
+def _clean(text):
+    return ' '.join(text.split())
+
+
+def _add_error(scan, message):
+    message = _clean(message)
+    if message and message not in scan.errors:
+        scan.errors.append(message)
+
+
+def _select_controls(select):
+    """Values a select submits: the selected options, else the first one."""
+    chosen = [o for o in select['options'] if o[2]]
+    if not chosen and select['options'] and not select.get('multiple'):
+        chosen = select['options'][:1]
+    return [[select['name'], value] for value, _text, _selected in chosen]
+
+
+def _control(scan, form, tag, attrs, options=None, text=''):
+    """Record one form control the way a browser would serialize it."""
+    name = attrs.get('name') or ''
+    element_id = attrs.get('id') or ''
+    if tag == 'select':
+        select = {'name': name, 'options': options, 'multiple': 'multiple' in attrs}
+        if element_id:
+            scan.selects[element_id] = select
+        if form is not None and name:
+            form['controls'].extend(_select_controls(select))
+        return
+    if tag == 'textarea':
+        if form is not None and name:
+            form['controls'].append([name, text])
+        return
+    input_type = (attrs.get('type') or 'text').lower()
+    value = attrs.get('value') or ''
+    if element_id.startswith('routing_'):
+        scan.inputs[element_id] = value
+    if form is None or not name or 'disabled' in attrs:
+        return
+    if input_type in ('submit', 'button', 'image'):
+        form['submits'].append((name, value))
+    elif input_type in ('checkbox', 'radio'):
+        if 'checked' in attrs:
+            form['controls'].append([name, value or 'on'])
+    elif input_type != 'file':
+        form['controls'].append([name, value])
+
+
+def _is_error(tag, classes):
+    return bool(set(classes) & set(ERROR_CLASSES)) or (tag == 'div' and 'error' in classes)
+
+
+# Backends
+
+
+def _scan_selectolax(html):
+    try:
+        from selectolax.lexbor import LexborHTMLParser as Parser
+    except ImportError:
+        from selectolax.parser import HTMLParser as Parser
+    tree = Parser(html)
+    scan = _Scan()
+    in_form = set()
+    for form_node in tree.css('form'):
+        attrs = form_node.attributes
+        form = {'action': attrs.get('action') or '', 'method': (attrs.get('method') or 'get').lower(),
+                'controls': [], 'submits': []}
+        scan.forms.append(form)
+        for node in form_node.css('input, select, textarea'):
+            in_form.add(node.mem_id)
+            _selectolax_control(scan, form, node)
+    for node in tree.css("input[id^='routing_'], select[id]"):
+        if node.mem_id not in in_form:
+            _selectolax_control(scan, None, node)
+    for node in tree.css('a[href]'):
+        scan.links.append((node.attributes.get('href') or '', _clean(node.text())))
+    for node in tree.css('script'):
+        scan.scripts.append(node.text())
+    selector = ', '.join('.' + name for name in ERROR_CLASSES) + ', div.error'
+    for node in tree.css(selector):
+        _add_error(scan, node.text())
+    return scan
+
+
+def _selectolax_control(scan, form, node):
+    attrs = node.attributes
+    if node.tag == 'select':
+        options = []
+        for option in node.css('option'):
+            text = _clean(option.text())
+            value = option.attributes.get('value')
+            options.append((text if value is None else value, text, 'selected' in option.attributes))
+        _control(scan, form, 'select', attrs, options)
+    else:
+        _control(scan, form, node.tag, attrs, text=node.text() if node.tag == 'textarea' else '')
+
+
+def _scan_lxml(html):
+    import lxml.html
+    root = lxml.html.document_fromstring(html)
+    scan = _Scan()
+    in_form = set()
+    for form_node in root.iter('form'):
+        form = {'action': form_node.get('action') or '', 'method': (form_node.get('method') or 'get').lower(),
+                'controls': [], 'submits': []}
+        scan.forms.append(form)
+        for node in form_node.iter('input', 'select', 'textarea'):
+            in_form.add(node)
+            _lxml_control(scan, form, node)
+    for node in root.iter('input', 'select'):
+        node_id = node.get('id') or ''
+        if node not in in_form and (node_id.startswith('routing_') or (node.tag == 'select' and node_id)):
+            _lxml_control(scan, None, node)
+    for node in root.iter('a'):
+        if node.get('href'):
+            scan.links.append((node.get('href'), _clean(node.text_content())))
+    for node in root.iter('script'):
+        scan.scripts.append(node.text or '')
+    for node in root.iter():
+        if isinstance(node.tag, str) and _is_error(node.tag, (node.get('class') or '').split()):
+            _add_error(scan, node.text_content())
+    return scan
+
+
+def _lxml_control(scan, form, node):
+    attrs = dict(node.attrib)
+    if node.tag == 'select':
+        options = []
+        for option in node.iter('option'):
+            text = _clean(option.text_content())
+            value = option.get('value')
+            options.append((text if value is None else value, text, option.get('selected') is not None))
+        _control(scan, form, 'select', attrs, options)
+    else:
+        _control(scan, form, node.tag, attrs, text=(node.text or '') if node.tag == 'textarea' else '')
+
+
+class _StdlibScanner(HTMLParser):
+    """Pure-Python fallback; slower but always available."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.scan = _Scan()
+        self._form = None
+        self._select = None
+        self._option = None
+        self._textarea = None
+        self._link = None
+        self._script = None
+        self._error_depth = 0
+        self._error_text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {key: (value if value is not None else '') for key, value in attrs}
+        if tag in VOID_TAGS:
+            pass  # Never closed, so they must not count towards the notice's nesting depth
+        elif self._error_depth:
+            self._error_depth += 1
+        elif _is_error(tag, attrs.get('class', '').split()):
+            self._error_depth = 1
+            self._error_text = []
+
+        if tag == 'form':
+            self._form = {'action': attrs.get('action', ''), 'method': attrs.get('method', 'get').lower(),
+                          'controls': [], 'submits': []}
+            self.scan.forms.append(self._form)
+        elif tag == 'input':
+            _control(self.scan, self._form, 'input', attrs)
+        elif tag == 'select':
+            self._select = (attrs, [])
+        elif tag == 'option' and self._select is not None:
+            self._option = [attrs.get('value'), [], 'selected' in attrs]
+        elif tag == 'textarea':
+            self._textarea = (attrs, [])
+        elif tag == 'a' and attrs.get('href'):
+            self._link = [attrs['href'], []]
+        elif tag == 'script':
+            self._script = []
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag == 'option' and self._option is not None:
+            value, text, selected = self._option
+            text = _clean(''.join(text))
+            self._select[1].append((text if value is None else value, text, selected))
+            self._option = None
+        elif tag == 'select' and self._select is not None:
+            _control(self.scan, self._form, 'select', self._select[0], self._select[1])
+            self._select = None
+        elif tag == 'textarea' and self._textarea is not None:
+            _control(self.scan, self._form, 'textarea', self._textarea[0], text=''.join(self._textarea[1]))
+            self._textarea = None
+        elif tag == 'a' and self._link is not None:
+            self.scan.links.append((self._link[0], _clean(''.join(self._link[1]))))
+            self._link = None
+        elif tag == 'script' and self._script is not None:
+            self.scan.scripts.append(''.join(self._script))
+            self._script = None
+        elif tag == 'form':
+            self._form = None
+
+        if self._error_depth and tag not in VOID_TAGS:
+            self._error_depth -= 1
+            if not self._error_depth:
+                _add_error(self.scan, ''.join(self._error_text))
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option[1].append(data)
+        if self._textarea is not None:
+            self._textarea[1].append(data)
+        if self._link is not None:
+            self._link[1].append(data)
+        if self._script is not None:
+            self._script.append(data)
+        if self._error_depth:
+            self._error_text.append(data)
+
+
+def _scan_stdlib(html):
+    scanner = _StdlibScanner()
+    scanner.feed(html)
+    scanner.close()
+    return scanner.scan
+
+
+BACKENDS = {'selectolax': _scan_selectolax, 'lxml': _scan_lxml, 'html.parser': _scan_stdlib}
+
+
+def available_backends():
+    names = []
+    for name, module in (('selectolax', 'selectolax'), ('lxml', 'lxml.html')):
+        try:
+            __import__(module)
+            names.append(name)
+        except ImportError:
+            continue
+    return names + ['html.parser']
+
+
+def _pick_backend():
+    forced = os.getenv('LEADROUTER_HTML_PARSER')
+    if forced:
+        if forced not in BACKENDS:
+            raise ValueError(f"LEADROUTER_HTML_PARSER must be one of {', '.join(BACKENDS)}")
+        return forced
+    return available_backends()[0]
+
+
+BACKEND = _pick_backend()
+
+
+def scan_page(html, backend=None):
+    return BACKENDS[backend or BACKEND](html)
+
+
+# Page models
+
+
+def _script_json(scripts, variable):
+    """Decode the object assigned to a JS variable (var form = {...};) in inline scripts."""
+    pattern = re.compile(r'\b' + re.escape(variable) + r'\s*=\s*(?=[\[{])')
+    decoder = json.JSONDecoder()
+    for script in scripts:
+        match = pattern.search(script)
+        if match:
+            try:
+                return decoder.raw_decode(script, match.end())[0]
+            except ValueError:
+                continue
+    return None
+
+
+def parse_notification_page(html, url, backend=None):
+    """Parse a notification edit page into a NotificationPage."""
+    scan = scan_page(html, backend)
+    page = NotificationPage(url)
+    page.errors = scan.errors
+
+    form = next((f for f in scan.forms if f['method'] == 'post' and any(
+        name in ROUTING_JSON_FIELDS or name in TO_TYPE_FIELDS for name, _ in f['controls'])), None)
+    if form is None:
+        form = next((f for f in scan.forms if f['method'] == 'post'), None)
+    if form is None:
+        return page
+    page.action = urljoin(url, form['action']) if form['action'] else url
+    page.fields = form['controls']
+    page.submit = next((s for s in form['submits'] if s[1] in SAVE_BUTTON_VALUES),
+                       form['submits'][0] if form['submits'] else None)
+    for name, value in page.fields:
+        if 'nonce' in name.lower() or name == 'gforms_save_notification':
+            page.nonce = value
+        if name in ROUTING_JSON_FIELDS:
+            page.routing_field = name
+        if name in TO_TYPE_FIELDS:
+            page.to_type = value
+
+    # Field dropdown: the rendered table if there is one, otherwise the form object
+    gf_form = _script_json(scan.scripts, 'form') or {}
+    field_select = scan.selects.get('routing_field_id_0')
+    if field_select:
+        page.field_options = [(value, text) for value, text, _ in field_select['options'] if text]
+    _add_form_fields(page, gf_form, field_options=not field_select)
+
+    page.routing = _parse_routing(page, scan)
+    return page
+
+
+def _add_form_fields(page, gf_form, field_options=True):
+    """Field labels (for the routing field dropdown) and choices from a Gravity Forms form object."""
+    for field in gf_form.get('fields', []) or []:
+        field_id = str(field.get('id', ''))
+        label = str(field.get('adminLabel') or field.get('label') or '').strip()
+        if field_options and field_id and label:
+            page.field_options.append((field_id, label))
+        if field.get('choices'):
+            page.choices[field_id] = [(str(c.get('value', c.get('text', ''))), str(c.get('text', '')).strip())
+                                      for c in field['choices']]
+
+
+def _routing_rules(page, raw):
+    """Rules in the routing JSON Gravity Forms stores ([{fieldId, operator, value, email}])."""
+    return [{
+        'index': str(i),
+        'field_id': str(rule.get('fieldId', '')),
+        'field': page.field_label(rule.get('fieldId', '')),
+        'operator': rule.get('operator', '') or '',
+        'value': str(rule.get('value', '') or '').strip(),
+        'email': str(rule.get('email', '') or '').strip(),
+    } for i, rule in enumerate(raw)]
+
+
+def _parse_routing(page, scan):
+    raw = None
+    if page.routing_field:
+        raw = dict(page.fields).get(page.routing_field) or None
+    if raw:
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raw = None
+    if raw is None:
+        notification = _script_json(scan.scripts, 'current_notification') or {}
+        raw = notification.get('routing')
+    if raw:
+        return _routing_rules(page, raw)
+    return parse_routing_rows(scan)
+
+
+def parse_routing_rows(scan):
+    """Routing rows rendered into the page as routing_*_N elements."""
+    indexes = sorted((key[len('routing_email_'):] for key in scan.inputs if key.startswith('routing_email_')),
+                     key=lambda index: int(index) if index.isdigit() else 0)
+    rules = []
+    for index in indexes:
+        field = scan.selects.get(f'routing_field_id_{index}', {'options': []})
+        chosen = next((o for o in field['options'] if o[2]), None)
+        operator = scan.selects.get(f'routing_operator_{index}', {'options': []})
+        value = scan.inputs.get(f'routing_value_{index}')
+        if value is None:
+            value_select = scan.selects.get(f'routing_value_{index}', {'options': []})
+            value = next((o[0] for o in value_select['options'] if o[2]), '')
+        rules.append({
+            'index': index,
+            'field_id': chosen[0] if chosen else '',
+            'field': chosen[1] if chosen else '',
+            'operator': next((o[0] for o in operator['options'] if o[2]), ''),
+            'value': value.strip(),
+            'email': scan.inputs[f'routing_email_{index}'].strip(),
+        })
+    return rules
+
+
+def parse_value_options(html, index=0, backend=None):
+    """Option texts of routing_value_N when it is a dropdown (location choices)."""
+    select = scan_page(html, backend).selects.get(f'routing_value_{index}')
+    return [text for _value, text, _selected in select['options'] if text] if select else []
+
+
+def parse_form_list(html, base_url, backend=None):
+    """[{'id', 'title', 'href'}] for the forms on the Forms list page."""
+    forms = {}
+    for href, text in scan_page(html, backend).links:
+        if 'page=gf_edit_forms' not in href or 'view=' in href:
+            continue
+        match = re.search(r'[?&]id=(\d+)', href)
+        if match and text and match.group(1) not in forms:
+            forms[match.group(1)] = {'id': match.group(1), 'title': text, 'href': urljoin(base_url, href)}
+    return list(forms.values())
+
+
+def parse_notification_list(html, base_url, backend=None):
+    """[{'name', 'href', 'nid'}] for a form's notifications."""
+    notifications = []
+    seen = set()
+    for href, text in scan_page(html, backend).links:
+        match = re.search(r'[?&]nid=([^&#]+)', href)
+        if not match or not text or match.group(1) in seen or 'subview=notification' not in href:
+            continue
+        seen.add(match.group(1))
+        notifications.append({'name': text, 'href': urljoin(base_url, href), 'nid': match.group(1)})
+    return notifications
+
+
+def parse_export_page(html, url, backend=None):
+    """The Import/Export screen's export form: (action, controls, submit). Controls hold the
+    nonce and referer; form checkboxes are left out so the caller can choose the forms."""
+    for form in scan_page(html, backend).forms:
+        submit = next((s for s in form['submits'] if s[0] == 'export_forms'), None)
+        if form['method'] == 'post' and submit:
+            action = urljoin(url, form['action']) if form['action'] else url
+            return action, [c for c in form['controls'] if c[0] != 'gf_form_id[]'], submit
+    return None
+
+
+def parse_form_export(data, notifications_url):
+    """Current state of every form in a Gravity Forms export file (the JSON the Import/Export
+    screen downloads). Returns {form_id: {'id', 'title', 'notifications': [{'name', 'nid',
+    'href', 'page'}]}}, where page is a NotificationPage built without fetching the edit page
+    (its fields, nonce and submit are empty: it is for reading and planning, not for posting).
+    notifications_url(form_id) is the form's notification list URL."""
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    forms = data.values() if isinstance(data, dict) else data
+    model = {}
+    for form in forms:
+        if not isinstance(form, dict) or 'id' not in form:
+            continue  # The "version" entry
+        form_id = str(form['id'])
+        notifications = form.get('notifications') or {}
+        if isinstance(notifications, dict):
+            notifications = list(notifications.values())
+        entries = []
+        for notification in notifications:
+            nid = str(notification.get('id', ''))
+            href = f"{notifications_url(form_id)}&nid={nid}"
+            page = NotificationPage(href)
+            _add_form_fields(page, form)
+            page.to_type = notification.get('toType')
+            page.routing = _routing_rules(page, notification.get('routing') or [])
+            entries.append({'name': str(notification.get('name', '')).strip(), 'nid': nid, 'href': href, 'page': page})
+        model[form_id] = {'id': form_id, 'title': str(form.get('title', '')), 'notifications': entries}
+    return model
+
+
+def is_login_page(html):
+    return 'id="loginform"' in html or "id='loginform'" in html
@@ -0,0 +1,137 @@
+"""
+Adaptive timeouts learned from each site's observed latency.
+
+Page loads and element waits are timed per site and per kind (page type such
+as notification_edit, or a wait such as element or save) and the most recent
+samples are kept in a small JSON file (LEADROUTER_LATENCY_FILE, default
+.leadrouter-latency.json). Once a kind has enough samples its timeout is
+p99 x LEADROUTER_TIMEOUT_MARGIN (default 3), clamped between
+LEADROUTER_TIMEOUT_MIN and LEADROUTER_TIMEOUT_MAX seconds (default 3 and 60).
+Until then the old fixed timeout is used. Slow sites stop timing out early,
+and fast sites no longer wait the full fixed time for an element that is
+missing.
+
+Timed-out waits are not recorded. Many waits probe for elements that may not
+exist, and those misses would push every timeout up to the maximum.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from env_config import env_float, env_int
+
+MAX_SAMPLES = 200  # Per site and kind; older samples are dropped so the store follows the site
+KIND_MAXIMUM = {'page_load': 120}  # Kinds allowed more than LEADROUTER_TIMEOUT_MAX (whole page loads)
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class LatencyStore:
+    def __init__(self, site, path=None):
+        self.site = urlparse(site).netloc or site or 'unknown'
+        self.path = path or os.getenv('LEADROUTER_LATENCY_FILE', '.leadrouter-latency.json')
+        self.margin = env_float('LEADROUTER_TIMEOUT_MARGIN', 3)
+        self.minimum = env_float('LEADROUTER_TIMEOUT_MIN', 3)
+        self.maximum = env_float('LEADROUTER_TIMEOUT_MAX', 60)
+        self.min_samples = env_int('LEADROUTER_TIMEOUT_MIN_SAMPLES', 20)
+        self._lock = threading.Lock()
+        self.samples = {}  # kind -> seconds, oldest first
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self.samples = json.load(f).get(self.site, {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring latency history {self.path}: {e}")
+        self._dirty = False
+
+    def record(self, kind, seconds):
+        with self._lock:
+            samples = self.samples.setdefault(kind, [])
+            samples.append(round(seconds, 3))
+            del samples[:-MAX_SAMPLES]
+            self._dirty = True
+
+    def timeout(self, kind, default):
+        """Timeout in seconds for kind, or default while there is too little history."""
+        with self._lock:
+            samples = list(self.samples.get(kind, ()))
+        if len(samples) < self.min_samples:
+            return default
+        maximum = max(KIND_MAXIMUM.get(kind, 0), self.maximum)
+        return min(max(percentile(samples, 0.99) * self.margin, self.minimum), maximum)
+
+    def describe(self):
+        """One line per kind: samples, p50/p99 and the timeout in use."""
+        with self._lock:
+            kinds = {kind: list(samples) for kind, samples in self.samples.items() if samples}
+        return [f"{kind}: {len(samples)} samples, p50 {percentile(samples, 0.5):.2f}s, "
+                f"p99 {percentile(samples, 0.99):.2f}s -> timeout {self.timeout(kind, 'default')}"
+                for kind, samples in sorted(kinds.items())]
+
+    def instrument(self, driver, page_type):
+        """Record the duration of every navigation under its page type (page_type(url) -> kind)."""
+        execute = driver.execute
+
+        def timed_execute(driver_command, params=None):
+            start = time.perf_counter()
+            result = execute(driver_command, params)
+            if driver_command == "get" and params:
+                self.record(page_type(params.get('url', '')), time.perf_counter() - start)
+            return result
+
+        driver.execute = timed_execute
+        return driver
+
+    def save(self):
+        """Write this site's history back, keeping other sites' entries (other runs may
+        have saved since this one started), atomically."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            samples = json.loads(json.dumps(self.samples))
+        data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        data[self.site] = samples
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save latency history {self.path}: {e}")
+
+
+class TimedWait:
+    """Wraps a WebDriverWait built with the adaptive timeout and records how long
+    successful waits took, so the next timeout is learned from them."""
+
+    def __init__(self, wait, store, kind):
+        self._wait = wait
+        self.store = store
+        self.kind = kind
+
+    def until(self, method, message=''):
+        start = time.perf_counter()
+        result = self._wait.until(method, message)
+        self.store.record(self.kind, time.perf_counter() - start)
+        return result
+
+    def until_not(self, method, message=''):
+        start = time.perf_counter()
+        result = self._wait.until_not(method, message)
+        self.store.record(self.kind, time.perf_counter() - start)
+        return result
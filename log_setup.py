@@ -0,0 +1,140 @@
+"""
+Logging for long runs: records are queued and written by a background thread,
+so a notification with hundreds of rules never waits on the terminal.
+
+Console (stdout): a compact "HH:MM:SS message" view at LEADROUTER_LOG_LEVEL
+(default INFO; DEBUG shows every selector attempt and filled rule). With
+LEADROUTER_LOG_FORMAT=json the console prints JSON lines instead.
+LEADROUTER_LOG_JSON=path also writes every record, DEBUG included, as one
+JSON object per line to that file for log shippers and later analysis.
+
+Records carry the current form/notification (see log_context) and any
+extra={...} fields, which the JSON output includes as top-level keys.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+_context = contextvars.ContextVar('leadrouter_log_context', default={})
+_listener = None
+_queue = None
+_console = None
+
+# Attributes every LogRecord has; anything else came from extra= or the context
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach fields (form_id=..., notification=...) to every record logged inside the block,
+    in this thread only."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    """Copies the context onto the record in the calling thread, before it is queued."""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class CompactFormatter(logging.Formatter):
+    """Time and message for INFO and below; the level name is shown only for problems."""
+
+    def __init__(self):
+        super().__init__(datefmt='%H:%M:%S')
+
+    def format(self, record):
+        line = f"{self.formatTime(record, self.datefmt)} "
+        if record.levelno >= logging.WARNING:
+            line += f"{record.levelname} "
+        line += record.getMessage()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging():
+    """Configure the root logger once per process; later calls do nothing."""
+    global _listener, _queue, _console
+    if _listener is not None:
+        return
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(getattr(logging, os.getenv('LEADROUTER_LOG_LEVEL', 'INFO').upper(), logging.INFO))
+    console.setFormatter(JsonFormatter() if os.getenv('LEADROUTER_LOG_FORMAT', '').lower() == 'json'
+                         else CompactFormatter())
+    handlers = [console]
+    _console = console
+    json_path = os.getenv('LEADROUTER_LOG_JSON')
+    if json_path:
+        json_file = logging.FileHandler(json_path, encoding='utf-8')
+        json_file.setFormatter(JsonFormatter())
+        handlers.append(json_file)
+
+    log_queue = _queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(_ContextFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(logging.DEBUG if json_path else min(console.level, logging.INFO))
+    for noisy in ('urllib3', 'selenium', 'googleapiclient', 'google_auth_httplib2'):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def redirect_console(stream):
+    """Send console output to another stream (the progress status line wraps stdout)."""
+    if _console is not None:
+        _console.setStream(stream)
+
+
+def drain_logs(timeout=2.0):
+    """Wait (briefly) until queued records have been written, e.g. before prompting for input."""
+    deadline = time.monotonic() + timeout
+    while _queue is not None and not _queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.02)  # The record taken off the queue last may still be printing
+
+
+def stop_logging():
+    """Write out everything still queued (also runs at exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
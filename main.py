@@ -1,37 +1,62 @@
 import os
 import re
 from dotenv import load_dotenv
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 
+import argparse
 import json
 import logging
 import subprocess
 import time
 import sys
 import threading
+from collections import deque
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from browser_watchdog import BrowserWatchdog
+from env_config import env_flag, env_int
+from form_retry import (
+    CONFLICT,
+    MISSING_FIELD,
+    SESSION_LOST,
+    UNKNOWN,
+    VALIDATION_ERROR,
+    RetryScheduler,
+    classify_error,
+    is_transient,
 )
-logger = logging.getLogger(__name__)
+from latency_store import LatencyStore, TimedWait
+from log_setup import drain_logs, log_context, setup_logging
+from progress import RunProgress
+from metrics import RunMetrics, page_type
+from notification_catalog import email_columns, load_notification_catalog
+from routing_strategies import LOCATION_STRATEGY, load_custom_strategies, resolve_routing, value_columns
+from preflight import check_sheet_rows, check_site, dedupe_rows, find_conflicts
+from run_report import RunReport
+from session_broker import LoginFailed, SessionBroker, SessionExpired
+from sheet_partition import FormSlicer, SheetPartition, run_site_keys, site_column, site_key, tag_column
+from traffic_replay import TrafficRecorder
+from routing_io import add_notification, new_document, normalize_rule, read_document, routing_fingerprint, write_document
 
 # Load environment variables (for Google credentials)
 load_dotenv()
 
+# Set up logging (queued; options in .env)
+setup_logging()
+logger = logging.getLogger(__name__)
+
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
+def _import_selenium():
+    """Import Selenium on first browser use. It is the slowest import by far, and
+    sheet validation runs before the browser is needed (or fails without it)."""
+    global webdriver, Service, Options, By, WebDriverWait, EC, NoSuchElementException, TimeoutException
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import NoSuchElementException, TimeoutException
+
 def get_sheet_id_from_url(url):
     match = re.search(r'/d/([a-zA-Z0-9-_]+)', url)
     if match:
@@ -40,16 +65,95 @@ def get_sheet_id_from_url(url):
         return url  # If user just pasted the ID
 
 class LeadRouter:
-    def __init__(self, sheet_id, wp_url, headless=True):
+    def __init__(self, sheet_id, wp_url, headless=True, metrics=None):
         self.google_creds = None
+        self.sheets_service = None  # Built once; the service mode reuses it across jobs
         self.driver = None
+        self.interactive = True  # False in service mode: no terminal prompts except the login
         self.headless = headless
         self.sheet_id = sheet_id
         self.wp_url = wp_url
-        self.add_text_notifications = None  # Will be set by user prompt
-        self.setup_browser()
+        self.notification_catalog = load_notification_catalog()
+        load_custom_strategies()
+        self.location_notification_answers = {}  # Notification name -> user's answer for location-based forms
+        self.watchdog = BrowserWatchdog()
+        self.retry_scheduler = RetryScheduler()
+        self.last_failure = None  # Failure class of the last "failed" notification
+        self.prune_rules = env_flag('LEADROUTER_PRUNE')  # Remove rules not in the sheet
+        self.dedupe_rows = env_flag('LEADROUTER_DEDUPE')  # Keep only the first row per FEED ID / dealership name
+        self.http_mode = env_flag('LEADROUTER_HTTP')  # Save notifications with plain HTTP requests instead of the browser
+        self.notification_stats = {}  # routing_type/added/kept/removed of the last notification processed
+        self.planned_fingerprint = None  # Routing the open notification's changes were planned against
+        self.deferred_save = None  # Tab mode: (clicked save button, URL before the click) of the last deferred save
+        self.retired_rows = []  # Watch mode: old versions of changed/removed sheet rows whose rules must go
+        self.full_sheet = None  # Watch mode: every current sheet row (rules they still need are never retired)
+        self.last_sheet_data = None  # Rows applied by the last sync()
+        self.sheet_row_numbers = {}  # id(row) -> sheet row number, for messages about a site's slice of the sheet
+        self.last_report = None
+        self.run_error = None  # Why the last run stopped early, if it did (read by service mode)
+        # No-op unless a metrics port/textfile is configured; service mode passes one shared registry
+        self.metrics = metrics or RunMetrics.from_env(wp_url)
+        self.metrics.start()
+        self.session_broker = SessionBroker(wp_url)  # Login cookies shared by browser restarts and later runs
+        self.latency = LatencyStore(wp_url)  # Per-site latency history that timeouts are derived from
+        self.progress = RunProgress()  # Live forms/min, ETA and slowest phase of the current run
+        self.attach_port = env_int('LEADROUTER_ATTACH_PORT', 0)  # Attach to a long-lived Chrome on this debugging port
+        self.attached = False
+        self._attached_handles = set()  # Tabs the attached Chrome already had; the rest are this run's
+        self._admin_handle = None  # Attached mode: the logged-in tab this run works in
+        self.record_dir = os.getenv('LEADROUTER_RECORD_DIR')  # Record traffic + page snapshots here for replay
+        self.recorder = None
+        self._driver_timeouts = None  # (page-load timeout, implicit wait) last set on the driver
+        # The browser is launched by setup_browser() once the sheet has been read and checked
+
+    def setup_browser(self, port=None):
+        """Open Chrome and make sure it is logged in. With a port (or LEADROUTER_ATTACH_PORT)
+        attach to the Chrome listening there instead, skipping the login if it already has one."""
+        self.attach_port = port or self.attach_port
+        if self.attach_port:
+            if self._attach_browser(self.attach_port):
+                return
+        else:
+            self._launch_browser()
+        if self.session_broker.load():
+            print("Restoring the saved login session...")
+            if self.session_broker.apply_to_driver(self.driver):
+                print("✓ Logged in with the saved session - no manual login needed")
+                return
+            print("Saved session was not accepted - manual login required.")
+            self.session_broker.forget()
+        self._wait_for_manual_login()
+        self._capture_session()
+
+    def _capture_session(self):
+        """Hand the freshly logged-in browser's cookies/localStorage to the session broker."""
+        try:
+            count = self.session_broker.capture(self.driver)
+            print(f"Saved login session ({count} cookies)")
+        except Exception as e:
+            print(f"Could not capture the login session: {e}")
+
+    def _reauthenticate(self):
+        """Run by the session broker when the shared login has expired."""
+        print("\n🔒 The login session has expired - please log in again in the automation window.")
+        self._wait_for_manual_login()
+        if not self._logged_in():
+            raise LoginFailed(f"nobody logged in again within LEADROUTER_LOGIN_TIMEOUT ({self.driver.current_url})")
+        self._capture_session()
 
-    def setup_browser(self, port=9222):
+    def _logged_in(self):
+        """True if the browser can open wp-admin without being sent to a login page."""
+        try:
+            if self.session_broker.is_login_url(self.driver.current_url):
+                return False
+            self.driver.get(self.wp_url.rstrip('/') + '/wp/wp-admin/')
+            return not self.session_broker.is_login_url(self.driver.current_url)
+        except Exception as e:
+            print(f"Could not check the login: {e}")
+            return False
+
+    def _launch_browser(self):
+        _import_selenium()
         # Use system Chrome directly from environment
         chrome_binary = os.getenv('CHROME_BINARY_PATH', '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome')
         chromedriver_path = os.getenv('CHROMEDRIVER_PATH', './chrome-for-testing/chromedriver')
@@ -83,6 +187,8 @@ class LeadRouter:
             "profile.default_content_setting_values.images": 2,
             "profile.managed_default_content_settings.javascript": 1,
         })
+        if self.record_dir:
+            TrafficRecorder.configure(chrome_options)
         service = Service(executable_path=chromedriver_path)
         
         try:
@@ -96,15 +202,123 @@ class LeadRouter:
             print("If you see a version mismatch error, please update Chrome or ChromeDriver so their versions are compatible.")
             sys.exit(1)
         
-        self.driver.implicitly_wait(5)
+        self._instrument_driver()
+        self.watchdog.reset()
+        logger.info(f"Launched Chrome with user data dir {user_data_dir}")
+
+    def _attach_browser(self, port):
+        """Connect to the Chrome on the debugging port, starting it detached if nothing is listening.
+        Returns True if one of its tabs is already logged in to wp-admin (that tab is selected)."""
+        _import_selenium()
+        from chrome_attach import debugger_version, find_admin_tab, start_debug_chrome
+        chromedriver_path = os.getenv('CHROMEDRIVER_PATH', './chrome-for-testing/chromedriver')
+        wp_admin_url = self.wp_url.rstrip('/') + '/wp/wp-admin/'
+        if not os.path.isfile(chromedriver_path) or not os.access(chromedriver_path, os.X_OK):
+            print(f"ERROR: ChromeDriver not found or not executable at {chromedriver_path}.\nPlease check your CHROMEDRIVER_PATH in .env file.")
+            sys.exit(1)
         
+        info = debugger_version(port)
+        if info is None:
+            chrome_binary = os.getenv('CHROME_BINARY_PATH', '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome')
+            print(f"No Chrome is listening on debugging port {port} - starting one that stays open after this run...")
+            try:
+                info = start_debug_chrome(chrome_binary, port, start_url=wp_admin_url)
+            except (OSError, RuntimeError) as e:
+                print(f"ERROR: Could not start Chrome with remote debugging: {e}")
+                print(f"Start it yourself with: \"{chrome_binary}\" --remote-debugging-port={port} --user-data-dir=/tmp/chrome-leadrouter-debug-profile")
+                sys.exit(1)
+        print(f"Attaching to {info.get('Browser', 'Chrome')} on debugging port {port}")
+        
+        chrome_options = Options()
+        chrome_options.add_experimental_option("debuggerAddress", f"127.0.0.1:{port}")
+        if self.record_dir:
+            TrafficRecorder.configure(chrome_options)
+        try:
+            self.driver = webdriver.Chrome(service=Service(executable_path=chromedriver_path), options=chrome_options)
+        except Exception as e:
+            print(f"ERROR: Could not attach to Chrome on port {port}: {e}")
+            print("If you see a version mismatch error, please update Chrome or ChromeDriver so their versions are compatible.")
+            sys.exit(1)
+        self.attached = True
+        self._instrument_driver()
+        self.watchdog.reset()
+        self._attached_handles = set(self.driver.window_handles)
+        
+        self._admin_handle = find_admin_tab(self.driver, wp_admin_url, self.session_broker.is_login_url)
+        if self._admin_handle:
+            print(f"✓ Reusing logged-in tab at {self.driver.current_url} - no manual login needed")
+            self._capture_session()  # Keeps the HTTP mode and session renewal in step with the browser
+            return True
+        self._admin_handle = self.driver.current_window_handle
+        return False
+
+    def _instrument_driver(self):
+        """Hook metrics and latency recording into the new driver and apply the learned timeouts."""
+        self.metrics.instrument(self.driver)
+        self.latency.instrument(self.driver, lambda url: 'page_load')
+        self.latency.instrument(self.driver, page_type)
+        self._driver_timeouts = None
+        self._apply_driver_timeouts()
+        if self.record_dir:
+            if self.recorder is None:
+                self.recorder = TrafficRecorder(self.record_dir, self.wp_url)
+                print(f"Recording admin traffic and page snapshots to {self.record_dir}")
+            self.recorder.attach(self.driver)
+
+    def _apply_driver_timeouts(self):
+        """Set the page-load timeout and implicit wait learned so far; only talks to the driver
+        when they have changed. The implicit wait (every find_element miss) never exceeds the
+        old fixed 5 s but drops with the learned element timeout on fast sites."""
+        timeouts = (self.latency.timeout('page_load', 300), min(self.latency.timeout('element', 5), 5))
+        if timeouts != self._driver_timeouts:
+            self.driver.set_page_load_timeout(timeouts[0])
+            self.driver.implicitly_wait(timeouts[1])
+            self._driver_timeouts = timeouts
+
+    def _wait(self, driver, kind='element', default=10):
+        """A WebDriverWait whose timeout is learned from this site's history for kind
+        (default until there is enough history); successful waits add to the history."""
+        return TimedWait(WebDriverWait(driver, self.latency.timeout(kind, default)), self.latency, kind)
+
+    def _renew_attached_tabs(self):
+        """Attached mode's browser recycling: the shared Chrome keeps running, but this run's
+        tabs are swapped for one fresh tab (freeing their renderer memory). Reconnects first
+        if chromedriver lost the browser."""
+        try:
+            self.driver.window_handles
+        except Exception:
+            try:
+                self.driver.service.stop()  # Only chromedriver; never Chrome itself
+            except Exception:
+                pass
+            self._attach_browser(self.attach_port)
+        driver = self.driver
+        stale = [handle for handle in driver.window_handles
+                 if handle not in self._attached_handles or handle == self._admin_handle]
+        driver.switch_to.new_window('tab')
+        fresh = driver.current_window_handle
+        for handle in stale:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except Exception:
+                continue
+        driver.switch_to.window(fresh)
+        self._admin_handle = fresh
+        self.watchdog.reset()
+
+    def _wait_for_manual_login(self):
         # Give user instructions for manual navigation
         wp_admin_url = self.wp_url.rstrip('/') + '/wp/wp-admin/'
         print("\n" + "="*60)
         print("MANUAL NAVIGATION REQUIRED")
         print("="*60)
-        print("A new Chrome window has opened for automation.")
-        print("Look for the window with a YELLOW BAR saying 'Chrome is being controlled by automated test software'")
+        if self.attached:
+            print(f"Lead Router is attached to the Chrome window with remote debugging on port {self.attach_port}.")
+            print("Log in once in that window - later runs reuse the login for as long as it stays open.")
+        else:
+            print("A new Chrome window has opened for automation.")
+            print("Look for the window with a YELLOW BAR saying 'Chrome is being controlled by automated test software'")
         print("")
         print("Please complete these steps in the AUTOMATION Chrome window:")
         print(f"1. Navigate to: {wp_admin_url}")
@@ -112,15 +326,16 @@ class LeadRouter:
         print("3. Ensure you reach the WordPress admin dashboard")
         print("4. You should see the WordPress menu on the left side")
         print("")
-        print("IMPORTANT: Use the automation window (with yellow bar), not your regular Chrome!")
+        if not self.attached:
+            print("IMPORTANT: Use the automation window (with yellow bar), not your regular Chrome!")
         print("="*60)
         
         def wait_for_enter():
             input("\nPress Enter after you have navigated to the WordPress admin dashboard in the AUTOMATION window...")
         
-        t = threading.Thread(target=wait_for_enter)
+        t = threading.Thread(target=wait_for_enter, daemon=True)  # Left waiting on stdin after a timeout
         t.start()
-        t.join(timeout=900)  # 15 minutes for manual navigation
+        t.join(timeout=env_int('LEADROUTER_LOGIN_TIMEOUT', 900))  # 15 minutes for manual navigation by default
         
         if t.is_alive():
             print("\nTimeout reached. Proceeding with automation...")
@@ -129,19 +344,62 @@ class LeadRouter:
         else:
             print("\nReady to begin automation!")
         
-        logger.info(f"Launched Chrome with user data dir {user_data_dir}")
         logger.info(f"User will manually navigate to {wp_admin_url}")
 
-    def setup_google_credentials(self):
-        """Set up Google API credentials."""
-        SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+    def recycle_browser(self, reason):
+        """Restart Chrome, restore the authenticated cookies and return to wp-admin.
+        Falls back to the manual login prompt if the restored session is not accepted."""
+        print(f"\n♻️  Recycling browser session: {reason} ({self.watchdog.describe()})")
+        logger.info(f"Recycling browser session: {reason}")
+        try:
+            self.session_broker.capture(self.driver)  # Pick up any cookies refreshed since login
+        except Exception as e:
+            print(f"Could not capture cookies from old session: {e}")
+        if self.attached:
+            self._renew_attached_tabs()
+        else:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self._launch_browser()
+        self.watchdog.restarts += 1
+        self.metrics.browser_restarted()
+        
+        try:
+            accepted = self.session_broker.apply_to_driver(self.driver)
+        except Exception as e:
+            print(f"Could not restore session cookies: {e}")
+            accepted = False
+        if not accepted:
+            print("Restored session was not accepted - manual login required again.")
+            self._wait_for_manual_login()
+            self._capture_session()
+        else:
+            print(f"Browser session restored ({self.watchdog.restarts} restart(s) so far)")
+
+    def setup_google_credentials(self, extra_scopes=()):
+        """Set up Google API credentials. A saved token that lacks one of the scopes
+        (e.g. the Drive scope watch mode adds) is replaced by a new sign-in."""
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from google.auth.transport.requests import Request
+        
+        SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly'] + list(extra_scopes)
         creds = None
         token_file = os.getenv('GOOGLE_TOKEN_FILE', 'token.json')
         credentials_file = os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
         # Load credentials from token file if it exists
         if os.path.exists(token_file):
             with open(token_file, 'r') as token:
-                creds = Credentials.from_authorized_user_info(json.load(token), SCOPES)
+                info = json.load(token)
+            granted = info.get('scopes') or SCOPES
+            if isinstance(granted, str):
+                granted = granted.split()
+            if set(SCOPES) - set(granted):
+                print("The saved Google sign-in does not cover everything this mode needs - please sign in again.")
+            else:
+                creds = Credentials.from_authorized_user_info(info, SCOPES)
         # If credentials are not valid, get new ones
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
@@ -157,8 +415,12 @@ class LeadRouter:
 
     def read_google_sheet(self):
         """Read data from Google Sheet and extract specific columns with row alignment. Abort if any required value is missing or empty, and summarize all issues."""
-        self.setup_google_credentials()
-        service = build('sheets', 'v4', credentials=self.google_creds)
+        from googleapiclient.discovery import build
+        
+        if self.sheets_service is None:
+            self.setup_google_credentials()
+            self.sheets_service = build('sheets', 'v4', credentials=self.google_creds)
+        service = self.sheets_service
         sheet_range = 'Combined Feed Info'  # You can prompt for a specific tab if needed
         try:
             result = service.spreadsheets().values().get(
@@ -172,7 +434,7 @@ class LeadRouter:
             logger.warning("No data found in the sheet.")
             return []
         header = values[0]
-        required_cols = ['DEALERSHIP NAME', 'FEED ID', 'ADF Email', 'Text Email']
+        required_cols = list(dict.fromkeys(['DEALERSHIP NAME'] + value_columns() + email_columns(self.notification_catalog)))
         col_indices = {}
         for col in required_cols:
             if col in header:
@@ -180,17 +442,36 @@ class LeadRouter:
             else:
                 logger.error(f"Required column '{col}' not found in sheet header.")
                 return []
+        optional_cols = [col for col in (site_column(), tag_column()) if col in header]  # May be blank
+        col_indices.update({col: header.index(col) for col in optional_cols})
         extracted = []
-        missing_issues = []
+        row_issues = []
         for i, row in enumerate(values[1:], start=2):
             row_dict = {}
-            for col in required_cols:
+            issues = []
+            for col in required_cols + optional_cols:
                 idx = col_indices[col]
                 value = row[idx] if idx < len(row) else ''
-                if value is None or str(value).strip() == '':
-                    missing_issues.append(f"Row {i}, Column '{col}' is missing or empty.")
+                if col not in optional_cols and (value is None or str(value).strip() == ''):
+                    issues.append(f"Row {i}, Column '{col}' is missing or empty.")
                 row_dict[col] = value
             extracted.append(row_dict)
+            row_issues.append(issues)
+        
+        # Multi-site sheet: keep this site's rows (and shared ones); other sites' rows are not checked
+        row_numbers = list(range(2, len(extracted) + 2))
+        partition = SheetPartition(extracted, row_numbers)
+        if partition.partitioned:
+            site_rows, row_numbers = partition.for_site(self.wp_url)
+            print(f"Multi-site sheet: {len(partition.sites())} sites; {len(site_rows)} of {len(extracted)} rows are for {site_key(self.wp_url)}")
+            if len(site_rows) == len(partition.by_site.get('', [])):
+                print(f"⚠️  No rows have SITE {', '.join(sorted(run_site_keys(self.wp_url)))} - only rows with a blank SITE apply. "
+                      f"Sites in the sheet: {', '.join(sorted(partition.sites()))}")
+            if not site_rows:
+                return []
+            extracted = site_rows
+        missing_issues = [issue for n in row_numbers for issue in row_issues[n - 2]]
+        self.sheet_row_numbers = {id(row): n for row, n in zip(extracted, row_numbers)}
         if missing_issues:
             logger.error("Missing or empty values detected:")
             for issue in missing_issues:
@@ -203,144 +484,121 @@ class LeadRouter:
         logger.info(f"Extracted {len(extracted)} rows with required columns.")
         return extracted
 
-    def prompt_for_text_notifications(self):
-        """Ask user if they want to add Text Notifications for inventory forms with location fields"""
-        if self.add_text_notifications is None:
+    def preflight(self, sheet_data=None):
+        """Check the sheet rows (if given) and the WordPress site before opening Chrome.
+        Prints every problem found and returns False if the run should not start.
+        With dedupe on, conflicting and repeated rows are removed from sheet_data in place."""
+        print("\nRunning pre-flight checks...")
+        errors, warnings = [], []
+        if sheet_data is not None:
+            email_cols = email_columns(self.notification_catalog)
+            errors, warnings = check_sheet_rows(sheet_data, email_cols, value_columns() + [tag_column()],
+                                                row_numbers=self._row_numbers(sheet_data))
+            self._report_conflicts(sheet_data, email_cols)
+        if env_flag('LEADROUTER_SKIP_SITE_CHECK'):
+            print("Skipping WordPress site check (LEADROUTER_SKIP_SITE_CHECK)")
+        else:
+            errors += check_site(self.wp_url)
+        
+        for warning in warnings:
+            print(f"  ⚠️  {warning}")
+        if errors:
+            print(f"\nPre-flight found {len(errors)} problem(s):")
+            for error in errors:
+                print(f"  ✗ {error}")
+                logger.error(error)
+            print("Fix these and run the script again. No browser session was started.")
+            return False
+        print("✓ Pre-flight checks passed")
+        return True
+
+    def _row_numbers(self, sheet_data):
+        """Sheet row numbers of rows from the last read (None if some are not from it)."""
+        numbers = [self.sheet_row_numbers.get(id(row)) for row in sheet_data]
+        return None if None in numbers else numbers
+
+    def _report_conflicts(self, sheet_data, email_cols):
+        """Print rows that disagree about the same dealer, and drop later ones if deduping."""
+        row_numbers = self._row_numbers(sheet_data)
+        conflicts, shared_emails, later_rows = find_conflicts(sheet_data, 'FEED ID', 'DEALERSHIP NAME', email_cols,
+                                                              row_numbers=row_numbers, group_col=tag_column())
+        if conflicts:
+            print(f"\n⚠️  {len(conflicts)} conflicting dealer(s) in the sheet:")
+            for conflict in conflicts:
+                print(f"  • {conflict}")
+        if shared_emails:
+            print(f"ℹ️  {len(shared_emails)} email(s) receive leads for more than one dealer")
+            for email, row_numbers in shared_emails.items():
+                logger.info(f"{email} is used on rows {', '.join(str(n) for n in sorted(row_numbers))}")
+        if not later_rows:
+            return
+        if self.dedupe_rows:
+            sheet_data[:] = dedupe_rows(sheet_data, later_rows, row_numbers=row_numbers)
+            print(f"Dedupe: dropped rows {', '.join(str(n) for n in sorted(later_rows))} "
+                  f"(the first row for each FEED ID / dealership name wins); {len(sheet_data)} rows remain")
+        elif conflicts:
+            print("  Every conflicting row becomes its own routing rule. Fix the sheet, or run with --dedupe "
+                  "(LEADROUTER_DEDUPE=1) to keep only the first row for each dealer.")
+
+    def prompt_for_location_notifications(self, notification_name):
+        """Ask user once whether a notification (e.g. Text) should be configured on forms with location fields"""
+        if notification_name not in self.location_notification_answers and not self.interactive:
+            print(f"{notification_name} will be skipped for location-based forms (not requested for this job)")
+            self.location_notification_answers[notification_name] = False
+        if notification_name not in self.location_notification_answers:
+            drain_logs()  # Show everything logged so far before the question
             print("\n" + "="*60)
-            print("TEXT NOTIFICATIONS CONFIGURATION")
+            print(f"{notification_name.upper()} CONFIGURATION")
             print("="*60)
             print("For inventory forms that use location-based routing (Choose A Location),")
-            print("would you like to also configure Text Notifications?")
+            print(f"would you like to also configure the {notification_name}?")
             print("")
             while True:
-                response = input("Add Text Notifications to location-based forms? (y/n): ").lower().strip()
+                response = input(f"Add {notification_name} to location-based forms? (y/n): ").lower().strip()
                 if response in ['y', 'yes']:
-                    self.add_text_notifications = True
-                    print("✓ Text Notifications will be configured for location-based forms")
+                    self.location_notification_answers[notification_name] = True
+                    print(f"✓ {notification_name} will be configured for location-based forms")
                     break
                 elif response in ['n', 'no']:
-                    self.add_text_notifications = False
-                    print("✓ Text Notifications will be skipped for location-based forms")
+                    self.location_notification_answers[notification_name] = False
+                    print(f"✓ {notification_name} will be skipped for location-based forms")
                     break
                 else:
                     print("Please enter 'y' for yes or 'n' for no")
             print("="*60)
             
-        return self.add_text_notifications
+        return self.location_notification_answers[notification_name]
 
-    def check_form_has_dealer_id(self, driver, wait, form_id):
-        """Check if a form should use Dealer ID routing or location-based routing.
-        Location fields take PRIORITY over Dealer ID fields."""
-        try:
-            print(f"Checking routing priority for form {form_id}...")
-            
-            # Navigate to form notifications to check available fields
-            notifications_url = f"{self.wp_url.rstrip('/')}/wp/wp-admin/admin.php?page=gf_edit_forms&view=settings&subview=notification&id={form_id}"
-            driver.get(notifications_url)
-            wait.until(EC.presence_of_element_located((By.LINK_TEXT, "Notifications")))
-            
-            # Try to find ADF/XML notification to check available routing fields
-            notification_selectors = [
-                "//a[strong[text()='ADF/XML Formatted Notification']]",
-                "//strong[text()='ADF/XML Formatted Notification']/parent::a",
-                "//a[contains(@href, 'notification') and contains(., 'ADF/XML Formatted Notification')]"
-            ]
-            
-            notification_link = None
-            for selector in notification_selectors:
-                try:
-                    notification_link = wait.until(EC.element_to_be_clickable((By.XPATH, selector)))
-                    break
-                except:
-                    continue
-            
-            if not notification_link:
-                print(f"Could not find ADF/XML notification for form {form_id} - defaulting to Dealer ID routing")
-                return True  # Default to Dealer ID if we can't check
-            
-            # Click the notification
-            notification_link.click()
-            
-            # Ensure Configure Routing is selected
-            try:
-                routing_radio = wait.until(EC.presence_of_element_located((By.ID, "gform_notification_to_type_routing")))
-                if not routing_radio.is_selected():
-                    routing_radio.click()
-                    time.sleep(0.5)  # Wait for routing fields to load
-            except:
-                print(f"Could not find routing option for form {form_id}")
-                return True  # Default to Dealer ID if we can't configure routing
-            
-            # Check available routing fields with LOCATION PRIORITY
-            try:
-                # Look for the first routing field dropdown
-                if_dropdown = driver.find_element(By.ID, "routing_field_id_0")
-                from selenium.webdriver.support.ui import Select
-                select = Select(if_dropdown)
-                
-                # Check all available options
-                available_options = [option.text for option in select.options]
-                print(f"Available routing fields: {available_options}")
-                
-                # Check for location fields first (PRIORITY)
-                location_field_names = [
-                    "Choose A Location",
-                    "Location", 
-                    "Dealership Location",
-                    "Store Location",
-                    "Dealer Location"
-                ]
-                
-                has_location = False
-                location_field_found = None
-                for location_name in location_field_names:
-                    if location_name in available_options:
-                        has_location = True
-                        location_field_found = location_name
-                        break
-                
-                # Also check for any field containing "location" in the name
-                if not has_location:
-                    for option in available_options:
-                        if "location" in option.lower():
-                            has_location = True
-                            location_field_found = option
-                            break
-                
-                has_dealer_id = "Dealer ID" in available_options
-                
-                print(f"Form {form_id} field analysis:")
-                print(f"  - Has location field: {has_location} ({'(' + location_field_found + ')' if location_field_found else ''})")
-                print(f"  - Has Dealer ID field: {has_dealer_id}")
-                
-                # PRIORITY LOGIC: Location fields take precedence over Dealer ID
-                if has_location:
-                    print(f"  ➤ USING LOCATION-BASED ROUTING (Priority: {location_field_found})")
-                    return False  # Return False to indicate "don't use Dealer ID routing"
-                elif has_dealer_id:
-                    print(f"  ➤ USING DEALER-ID-BASED ROUTING (No location field found)")
-                    return True   # Return True to indicate "use Dealer ID routing"
-                else:
-                    print(f"  ➤ WARNING: Neither location nor Dealer ID field found - defaulting to Dealer ID")
-                    return True   # Default to Dealer ID if neither is found
-                
-            except Exception as e:
-                print(f"Could not check routing fields for form {form_id}: {e}")
-                return True  # Default to Dealer ID if we can't check
-                
-        except Exception as e:
-            print(f"Error checking form {form_id} routing priority: {e}")
-            return True  # Default to Dealer ID if we can't check
+    def confirm_prune(self):
+        """Prune mode deletes rules, so make sure the user meant it."""
+        if not self.interactive:
+            return True  # Service jobs ask for prune explicitly
+        print("\n" + "="*60)
+        print("PRUNE MODE")
+        print("="*60)
+        print("Routing rules that are not in the sheet will be REMOVED from every")
+        print("ADF/XML and Text notification, and blank or duplicate rows collapsed.")
+        print("Tip: run 'python main.py export backup.json' first to keep a copy.")
+        while True:
+            response = input("Continue with prune mode? (y/n): ").lower().strip()
+            if response in ['y', 'yes']:
+                print("="*60)
+                return True
+            elif response in ['n', 'no']:
+                print("Aborted - nothing was changed.")
+                return False
+            else:
+                print("Please enter 'y' for yes or 'n' for no")
 
     def automate_form_notifications(self, sheet_data):
         """
-        Automate Gravity Forms notification routing rules for ADF/XML Formatted Notification.
-        Only implements ADF/XML for now, using 'ADF Email' from sheet_data.
+        Automate Gravity Forms notification routing rules for every notification in the catalog
+        (ADF/XML and Text by default), using each entry's email column from sheet_data.
         """
         print("Starting form automation...")
         driver = self.driver
-        wait = WebDriverWait(driver, 10)
-        logger.info("Starting automation of ADF/XML Formatted Notification.")
+        wait = self._wait(driver)
+        logger.info(f"Starting automation of {', '.join(e['name'] for e in self.notification_catalog)}.")
 
         # Import Select at function level so it's available everywhere
         from selenium.webdriver.support.ui import Select
@@ -356,7 +614,8 @@ class LeadRouter:
                 # If we have windows, make sure we're using the right one
                 if window_handles:
                     print("Switching to the main browser window...")
-                    driver.switch_to.window(window_handles[0])
+                    main_window = self._admin_handle if self._admin_handle in window_handles else window_handles[0]
+                    driver.switch_to.window(main_window)
                     time.sleep(1)  # Give it a moment to switch
                 
                 # Try to get basic browser info
@@ -465,69 +724,7 @@ class LeadRouter:
             # Continue with the rest of the automation...
             logger.info("Looking for active forms...")
             
-            # Navigate directly to active forms page
-            print("Navigating directly to active forms...")
-            active_forms_url = f"{self.wp_url.rstrip('/')}/wp/wp-admin/admin.php?page=gf_edit_forms&active=1"
-            driver.get(active_forms_url)
-            
-            # Wait for either the page to complete loading or 10 seconds max
-            try:
-                WebDriverWait(driver, 10).until(
-                    lambda d: d.execute_script("return document.readyState") == "complete"
-                )
-            except TimeoutException:
-                print("Page load took too long, proceeding anyway")
-
-            # Then look for just the critical element we need
-            try:
-                WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".wp-list-table"))
-                )
-                print("Active forms page loaded")
-            except TimeoutException:
-                print("Forms table not found but proceeding anyway")
-            
-            # Now find all forms with a simpler, more reliable approach
-            print("Finding forms on the page...")
-            all_forms = []
-            
-            # Try the most reliable selector first - just look for edit links
-            try:
-                all_forms = driver.find_elements(By.XPATH, "//a[contains(@href, 'page=gf_edit_forms') and contains(@href, 'id=') and not(contains(@href, 'view='))]")
-                print(f"Found {len(all_forms)} forms with primary selector")
-            except Exception as e:
-                print(f"Primary form selector failed: {e}")
-            
-            # If that didn't work, try a broader search
-            if not all_forms:
-                try:
-                    print("Trying alternative form selector...")
-                    all_forms = driver.find_elements(By.XPATH, "//table//a[contains(@href, 'id=') and contains(text(), '') and not(contains(@href, 'view='))]")
-                    print(f"Found {len(all_forms)} forms with alternative selector")
-                except Exception as e:
-                    print(f"Alternative form selector failed: {e}")
-            
-            # Get all form IDs and titles at the start
-            all_form_info = []
-            for form_link in all_forms:
-                try:
-                    form_title = form_link.text.strip()
-                    form_href = form_link.get_attribute('href')
-                    
-                    # Extract form ID from the href
-                    import re
-                    form_id_match = re.search(r'[?&]id=(\d+)', form_href)
-                    form_id = form_id_match.group(1) if form_id_match else None
-                    
-                    if form_id and form_title:
-                        all_form_info.append({
-                            'id': form_id,
-                            'title': form_title,
-                            'href': form_href
-                        })
-                except Exception as e:
-                    print(f"Error getting form info: {e}")
-                    continue
+            all_form_info = self._list_active_forms(driver)
             
             total_forms = len(all_form_info)
             logger.info(f"Found {total_forms} active forms to process.")
@@ -546,8 +743,64 @@ class LeadRouter:
             forms_with_errors = []  # Track forms that had errors but were still processed
             skipped_forms = []  # Track forms that were skipped due to missing fields
             
+            form_queue = deque(all_form_info)
+            notification_results = {}  # form_id -> {notification name: "success"/"skipped"/"failed"}
+            form_positions = {f['id']: i for i, f in enumerate(all_form_info)}
+            session_retried_ids = set()  # Forms already re-queued after a lost session
+            
+            def form_url_for(info):
+                return self._notifications_url(info['id'])
+            
+            def on_save_settled(info, errors):
+                # A deferred save (tab mode) turned out to be rejected by Gravity Forms
+                if not errors:
+                    return
+                print(f"❌ Save for form {info['title']} (ID: {info['id']}) was rejected:")
+                for message in errors:
+                    print(f"   {message}")
+                completed_form_ids.discard(info['id'])
+                retrying = self._schedule_retry(info, VALIDATION_ERROR, form_queue)
+                finish_report(info, "retrying" if retrying else "failed", VALIDATION_ERROR)
+            
+            tab_pool = self._open_tab_pool(driver)
+            
+            report = RunReport(self.wp_url)
+            self.last_report = report
+            
+            self.progress.start(total_forms)
+            form_slicer = FormSlicer(sheet_data)
+            if form_slicer.tagged:
+                print(f"Form tags in the sheet: {', '.join(sorted(form_slicer.tags))} (tagged rows only go to forms with the tag in their title)")
+            
+            def finish_report(info, status, error_class=None):
+                if info['id'] in report.forms:
+                    attempt_open = report.finish_form(info['id'], status, error_class, self.retry_scheduler.retries(info['id']))
+                    self.metrics.form_finished(status, error_class, in_flight=attempt_open)
+                if status != "retrying":
+                    self.progress.form_done(info['id'])
+            
+            # One export shows which forms already match the sheet; only the others are opened
+            from admin_http import AdminHttpClient
+            exported = self._bulk_read(AdminHttpClient(self.wp_url, self.session_broker, latency=self.latency), all_form_info)
+            if exported:
+                for info in all_form_info:
+                    form = exported.get(info['id'])
+                    planned = self._plan_form_from_export(form, form_slicer.for_form(info['title'])) if form else None
+                    if not planned:
+                        continue
+                    notification_results[info['id']] = {name: result for name, (result, _) in planned.items()}
+                    if self._record_unchanged_form(report, info, planned) == "skipped":
+                        skipped_forms.append({'id': info['id'], 'title': info['title']})
+                    else:
+                        completed_form_ids.add(info['id'])
+                form_queue.clear()
+                form_queue.extend(info for info in all_form_info if info['id'] not in notification_results)
+                print(f"{total_forms - len(form_queue)} forms already match the sheet; opening the {len(form_queue)} that need changes")
+            
             # Process each form by ID
-            for form_index, form_info in enumerate(all_form_info):
+            while form_queue:
+                form_info = form_queue.popleft()
+                form_index = form_positions[form_info['id']]
                 try:
                     form_id = form_info['id']
                     form_title = form_info['title']
@@ -557,119 +810,134 @@ class LeadRouter:
                         print(f"Skipping form {form_index + 1}: {form_title} (ID: {form_id}) - already completed")
                         continue
                     
+                    # Retries wait for their backoff; work on anything that is due first
+                    retry_delay = self.retry_scheduler.remaining(form_id)
+                    if retry_delay > 0:
+                        if any(self.retry_scheduler.remaining(f['id']) == 0 for f in form_queue):
+                            form_queue.append(form_info)
+                            continue
+                        print(f"Waiting {retry_delay:.0f}s before retrying form {form_id}...")
+                        with self.progress.phase('retry_wait'):
+                            time.sleep(retry_delay)
+                    
+                    self.last_failure = None
+                    
+                    # Restart the browser between forms if it is due or has degraded
+                    restart_reason = self.watchdog.check(driver)
+                    if restart_reason:
+                        if tab_pool:
+                            tab_pool.settle_all(on_save_settled)
+                        with self.progress.phase('browser_restart'):
+                            self.recycle_browser(restart_reason)
+                        driver = self.driver
+                        wait = self._wait(driver)
+                        tab_pool = self._open_tab_pool(driver)
+                    
                     print(f"\n--- Processing Form {form_index + 1} of {total_forms} ---")
                     print(f"Form: {form_title} (ID: {form_id})")
                     
-                    # Navigate directly to the form using its ID
-                    form_url = f"{self.wp_url.rstrip('/')}/wp/wp-admin/admin.php?page=gf_edit_forms&id={form_id}"
-                    driver.get(form_url)
+                    report.start_form(form_id, form_title)
+                    self.metrics.form_started()
+                    self._apply_driver_timeouts()  # Follow the timings recorded so far this run
+                    wait = self._wait(driver)
+                    session_generation = self.session_broker.generation
                     
-                    # Wait for the form to load
+                    # Open the form's notification list (already loading in its own tab in tab mode)
+                    prefetched = False
+                    if tab_pool:
+                        upcoming = list(form_queue)[:tab_pool.size - 1]
+                        prefetched = tab_pool.start_form(form_id, upcoming, form_url_for, on_save_settled)
                     try:
-                        wait.until(EC.presence_of_element_located((By.LINK_TEXT, "Form Settings")))
+                        with self.progress.phase('notification_list'):
+                            notifications = self._list_notifications(driver, wait, form_id, navigate=not prefetched)
+                    except SessionExpired as e:
+                        # Log in once, then redo this form right away (still counted as a retry)
+                        print(f"Form {form_id}: {e}")
+                        try:
+                            self.session_broker.renew(session_generation, self._reauthenticate)
+                        except LoginFailed as login_error:
+                            print(f"❌ Stopping: {login_error}")
+                            logger.error(f"Re-authentication failed: {login_error}")
+                            self.retry_scheduler.record(form_id, SESSION_LOST)
+                            finish_report(form_info, "failed", SESSION_LOST)
+                            break
+                        if tab_pool:
+                            tab_pool.discard_prefetched()  # Those tabs loaded the login page too
+                        if not self.retry_scheduler.requeue(form_id, SESSION_LOST):
+                            print(f"   Failure class: {SESSION_LOST} - no retries left")
+                            finish_report(form_info, "failed", SESSION_LOST)
+                            continue
+                        finish_report(form_info, "retrying", SESSION_LOST)
+                        form_queue.appendleft(form_info)
+                        continue
                     except Exception as e:
                         print(f"Form {form_id} did not load properly: {e}")
+                        retrying = self._schedule_retry(form_info, classify_error(e), form_queue)
+                        finish_report(form_info, "retrying" if retrying else "failed", classify_error(e))
                         continue
-
-                    # Check if this form has Dealer ID field available
-                    has_dealer_id = self.check_form_has_dealer_id(driver, wait, form_id)
-                    use_location_routing = not has_dealer_id
+                    notification_links = {n['name']: n['href'] for n in notifications}
+                    form_rows = form_slicer.for_form(form_title)  # Untagged rows plus those tagged for this form
                     
-                    if use_location_routing:
-                        print(f"✓ Form {form_id} will use LOCATION-BASED routing (Choose A Location)")
-                        print(f"  - Field: Choose A Location")
-                        print(f"  - Condition: IS")  
-                        print(f"  - Value: Dealership Name from sheet")
-                        print(f"  - Email: Corresponding email from dropdown menu")
-                    else:
-                        print(f"✓ Form {form_id} will use DEALER-ID-BASED routing (standard)")
-                        print(f"  - Field: Dealer ID")
-                        print(f"  - Condition: IS")
-                        print(f"  - Value: Feed ID from sheet")
-
-                    # Go to Form Settings > Notifications
-                    driver.find_element(By.LINK_TEXT, "Form Settings").click()
-                    wait.until(EC.presence_of_element_located((By.LINK_TEXT, "Notifications")))
-                    driver.find_element(By.LINK_TEXT, "Notifications").click()
-
-                    # Track results for this form
-                    form_skipped = False
-                    form_failed = False
+                    # Process every catalog notification from this one list visit; each passes or fails on its own
+                    results = notification_results.setdefault(form_id, {})
+                    failure_classes = []
+                    todo = [entry for entry in self.notification_catalog if results.get(entry['name']) != "success"]
+                    for position, entry in enumerate(todo):
+                        name = entry['name']
+                        self.last_failure = None
+                        if name not in notification_links:
+                            print(f"❌ {name} not found on form {form_id}")
+                            results[name] = "failed"
+                            failure_classes.append(MISSING_FIELD)
+                            report.record_notification(form_id, name, "failed")
+                            continue
+                        # In tab mode the last save is confirmed later, while other tabs are being worked on
+                        defer = bool(tab_pool) and position == len(todo) - 1
+                        self.notification_stats = {}
+                        self.deferred_save = None
+                        result = self._process_notification(driver, wait, form_rows, name, entry['email_column'], form_title, form_id, Select, notification_href=notification_links[name], ask_for_location_forms=entry['ask_for_location_forms'], defer_save_check=defer)
+                        results[name] = result
+                        report.record_notification(form_id, name, result, self.notification_stats)
+                        self.metrics.rules_written(self.notification_stats)
+                        self.progress.rules_written(self.notification_stats)
+                        if result == "success" and defer and self.deferred_save:
+                            tab_pool.mark_pending(form_info, *self.deferred_save)
+                        elif result == "failed":
+                            failure_classes.append(self.last_failure or UNKNOWN)
                     
-                    # Process ADF/XML notification first
-                    adf_result = self._process_notification(driver, wait, sheet_data, "ADF/XML Formatted Notification", "ADF Email", form_title, form_id, Select, use_location_routing)
-                    if adf_result == "skipped":
-                        form_skipped = True
-                    elif adf_result == "failed":
-                        form_failed = True
+                    form_failed = any(r == "failed" for r in results.values())
+                    form_skipped = not form_failed and all(r == "skipped" for r in results.values())
+                    if form_failed:
+                        # Retry if anything transient went wrong; successful notifications are not redone
+                        transient = [c for c in failure_classes if is_transient(c)]
+                        self.last_failure = transient[0] if transient else failure_classes[0]
+                    for name, result in results.items():
+                        print(f"  {name}: {result}")
                     
-                    # Process Text notification second (only if ADF didn't fail/skip)
-                    if not form_skipped and not form_failed:
-                        text_result = self._process_notification(driver, wait, sheet_data, "Text Formatted Notification", "Text Email", form_title, form_id, Select, use_location_routing)
-                        if text_result == "skipped":
-                            form_skipped = True
-                        elif text_result == "failed":
-                            form_failed = True
+                    self.watchdog.form_done()
                     
                     # Categorize the form based on results
                     if form_skipped:
                         print(f"⏭️  Skipped form (missing required fields): {form_title} (ID: {form_id})")
                         skipped_forms.append({'id': form_id, 'title': form_title})
+                        finish_report(form_info, "skipped")
                     elif form_failed:
                         print(f"❌ Failed to process form: {form_title} (ID: {form_id})")
-                        # Don't add to any completion list - this is a true failure
+                        # Don't add to any completion list - retry it later if the error was transient
+                        retrying = self._schedule_retry(form_info, self.last_failure, form_queue)
+                        finish_report(form_info, "retrying" if retrying else "failed", self.last_failure)
                     else:
                         # Mark this form as completed successfully
                         completed_form_ids.add(form_id)
+                        self.retry_scheduler.succeeded(form_id)
+                        finish_report(form_info, "success")
                         print(f"✓ Successfully completed form: {form_title} (ID: {form_id})")
                     
-                    # Only navigate back if we have more forms to process and this form wasn't skipped/failed
+                    # Each form opens its own notification list directly, so there is no need to go back to the forms list
                     remaining_forms = [f for f in all_form_info if f['id'] not in completed_form_ids and f['id'] not in [sf['id'] for sf in skipped_forms]]
-                    if remaining_forms and not form_skipped and not form_failed:
-                        print(f"Returning to forms list... ({len(remaining_forms)} forms remaining)")
-                        
-                        # Check if we're already on the forms page before attempting navigation
-                        try:
-                            current_url = driver.current_url
-                            if 'page=gf_edit_forms' in current_url:
-                                print("Already on forms page - no navigation needed")
-                                time.sleep(0.5)  # Brief pause to ensure page is stable
-                            else:
-                                # Only navigate if we're not already there
-                                forms_list_url = self.wp_url.rstrip('/') + '/wp/wp-admin/admin.php?page=gf_edit_forms&active=1'
-                                print(f"Navigating to forms list from: {current_url}")
-                                driver.get(forms_list_url)
-                                
-                                # Quick check that navigation worked
-                                try:
-                                    wait.until(EC.presence_of_element_located((By.XPATH, "//h1[contains(text(), 'Forms')]")))
-                                    print("Successfully navigated to forms list")
-                                    time.sleep(1)  # Allow page to stabilize
-                                except Exception:
-                                    # If wait fails, just check if we're actually on the right page
-                                    final_url = driver.current_url
-                                    if 'page=gf_edit_forms' in final_url:
-                                        print("Navigation succeeded despite wait timeout")
-                                    else:
-                                        print(f"Navigation may have failed - current URL: {final_url}")
-                        
-                        except Exception as nav_error:
-                            print(f"Navigation check failed: {nav_error}")
-                            # Try to continue anyway
-                            try:
-                                current_url = driver.current_url
-                                if 'page=gf_edit_forms' in current_url:
-                                    print("On forms page despite navigation error - continuing...")
-                                else:
-                                    print(f"Not on forms page after error - URL: {current_url}")
-                            except:
-                                print("Could not determine current page state")
-                        
-                    else:
-                        if form_skipped or form_failed:
-                            print("Form was skipped/failed - moving to next form")
-                        else:
-                            print("No more forms to process - skipping navigation back")
+                    if tab_pool:
+                        # The next form is already loading in another tab
+                        print(f"Switching to next tab... ({len(remaining_forms)} forms remaining)")
                     
                 except Exception as e:
                     # Enhanced error reporting
@@ -677,6 +945,8 @@ class LeadRouter:
                     print(f"✗ Error processing form {form_index + 1} ({form_title}, ID: {form_id}): {error_msg}")
                     logger.error(f"Error processing form {form_index + 1} ({form_title}): {error_msg}")
                     
+                    error_class = classify_error(e)
+                    
                     # Try to recover gracefully
                     print("Attempting to recover from error...")
                     try:
@@ -692,13 +962,41 @@ class LeadRouter:
                         
                     except Exception as recovery_error:
                         print(f"Recovery failed: {recovery_error}")
-                        print("WebDriver session may be broken. Consider restarting the script.")
-                        break  # Exit the loop if we can't recover
+                        if form_id in session_retried_ids:
+                            print("WebDriver session may be broken. Consider restarting the script.")
+                            finish_report(form_info, "failed", SESSION_LOST)
+                            break  # Exit the loop if a fresh session didn't help either
+                        
+                        # Start a fresh browser session and continue from this form
+                        session_retried_ids.add(form_id)
+                        try:
+                            self.recycle_browser(f"session lost ({recovery_error})")
+                        except Exception as restart_error:
+                            print(f"Browser restart failed: {restart_error}")
+                            break
+                        driver = self.driver
+                        wait = self._wait(driver)
+                        tab_pool = self._open_tab_pool(driver)
+                        self.retry_scheduler.record(form_id, SESSION_LOST)
+                        finish_report(form_info, "retrying", SESSION_LOST)
+                        form_queue.appendleft(form_info)
+                        continue
+                    
+                    retrying = self._schedule_retry(form_info, error_class, form_queue)
+                    finish_report(form_info, "retrying" if retrying else "failed", error_class)
                     
                     continue  # Continue with next form
             
+            if tab_pool:
+                try:
+                    tab_pool.settle_all(on_save_settled)
+                except Exception as e:
+                    print(f"Could not confirm the last saves: {e}")
+            
+            self.progress.finish()
+            
             # Final summary
-            print(f"\n" + "="*60)
+            print("\n" + "="*60)
             print("AUTOMATION COMPLETE")
             print("="*60)
             print(f"Total forms found: {total_forms}")
@@ -728,7 +1026,9 @@ class LeadRouter:
                 print(f"\n❌ FAILED FORMS ({len(failed_forms)} total):")
                 print("These forms encountered errors during processing:")
                 for form_info in failed_forms:
-                    print(f"  • {form_info['title']} (ID: {form_info['id']})")
+                    error_class = self.retry_scheduler.last_error.get(form_info['id'], "not attempted")
+                    retries = self.retry_scheduler.retries(form_info['id'])
+                    print(f"  • {form_info['title']} (ID: {form_info['id']}) - {error_class}, {retries} retr{'y' if retries == 1 else 'ies'}")
                 print("\nCommon causes of form failures:")
                 print("  - WordPress/Gravity Forms interface errors")
                 print("  - Network connectivity issues")
@@ -763,8 +1063,16 @@ class LeadRouter:
                     print(f"   {len(failed_forms)} forms failed due to errors")
             
             print("="*60)
+            
+            try:
+                json_path, html_path = report.write()
+                print(f"Run report saved: {json_path}")
+                print(f"Slowest forms view: {html_path}")
+            except OSError as e:
+                print(f"Could not write run report: {e}")
                     
         except Exception as e:
+            self.run_error = f"{e.__class__.__name__}: {e}"
             driver.save_screenshot("debug_automation_error.png")
             logger.error(f"Error during form notification automation: {e}")
             print(f"ERROR during automation: {e}")
@@ -772,721 +1080,1263 @@ class LeadRouter:
             import traceback
             traceback.print_exc()
 
-    def _process_notification(self, driver, wait, sheet_data, notification_name, email_column, form_title, form_id, Select, use_location_routing=False):
-        """Helper method to process a single notification type"""
+    def automate_over_http(self, sheet_data):
+        """Pure-HTTP mode: same routing changes as automate_form_notifications, but every form is
+        read and saved with plain requests (LEADROUTER_HTTP_WORKERS at a time) using the browser's login."""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from admin_http import AdminHttpClient
+        
+        workers = max(1, env_int('LEADROUTER_HTTP_WORKERS', 8))
+        client = AdminHttpClient(self.wp_url, self.session_broker, workers=workers, latency=self.latency)
         try:
-            # 3c. Find and click the notification link directly
-            print(f"Looking for {notification_name} link...")
-            notification_link = None
-            
-            # Try multiple ways to find the notification link based on actual HTML structure
-            selectors = [
-                f"//a[strong[text()='{notification_name}']]",
-                f"//strong[text()='{notification_name}']/parent::a",
-                f"//a[contains(@href, 'notification') and contains(., '{notification_name}')]",
-                f"//a[strong[contains(text(), '{notification_name}')]]",
-                f"//strong[contains(text(), '{notification_name}')]/parent::a"
-            ]
-            
-            for i, selector in enumerate(selectors):
+            all_form_info = client.list_active_forms()
+        except SessionExpired:
+            try:
+                self.session_broker.renew(client.generation, self._reauthenticate)
+            except LoginFailed as e:
+                print(f"❌ Stopping: {e}")
+                return
+            all_form_info = client.list_active_forms()
+        total_forms = len(all_form_info)
+        print(f"Found {total_forms} active forms to process over HTTP with {workers} workers")
+        if not total_forms:
+            print("No forms found to process. Please check that there are active forms.")
+            return
+        
+        # Workers must not prompt, so questions the browser mode asks along the way are asked now
+        for entry in self.notification_catalog:
+            if entry['ask_for_location_forms']:
+                self.prompt_for_location_notifications(entry['name'])
+        
+        report = RunReport(self.wp_url)
+        self.last_report = report
+        outcomes = {}
+        self.progress.start(total_forms)
+        started = time.perf_counter()
+        form_slicer = FormSlicer(sheet_data)
+        exported = self._bulk_read(client, all_form_info) or {}
+        to_open = []
+        for info in all_form_info:
+            form = exported.get(info['id'])
+            planned = self._plan_form_from_export(form, form_slicer.for_form(info['title'])) if form else None
+            if planned:
+                outcomes[info['id']] = (self._record_unchanged_form(report, info, planned), None)
+            else:
+                to_open.append(info)
+        if exported:
+            print(f"{len(outcomes)} forms already match the sheet; updating the {len(to_open)} that need changes")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for info in to_open:
+                form = exported.get(info['id'])
+                links = {n['name']: n['href'] for n in form['notifications']} if form else None
+                futures[pool.submit(self._sync_form_http, client, info, form_slicer.for_form(info['title']), report, links)] = info
+            for future in as_completed(futures):
+                info = futures[future]
                 try:
-                    print(f"Trying notification link selector {i+1}: {selector}")
-                    notification_link = wait.until(EC.element_to_be_clickable((By.XPATH, selector)))
-                    print(f"Found {notification_name} notification link with selector {i+1}")
-                    break
+                    status, error_class = future.result()
                 except Exception as e:
-                    print(f"Selector {i+1} failed: {e}")
+                    status, error_class = "failed", classify_error(e)
+                    print(f"✗ Form {info['title']} (ID: {info['id']}): {e}")
+                outcomes[info['id']] = (status, error_class)
+                self.progress.form_done(info['id'])
+        elapsed = time.perf_counter() - started
+        self.progress.finish()
+        
+        print("\n" + "="*60)
+        print("AUTOMATION COMPLETE (HTTP mode)")
+        print("="*60)
+        for status in ("success", "skipped", "failed"):
+            forms = [f for f in all_form_info if outcomes.get(f['id'], ("failed",))[0] == status]
+            print(f"{status.capitalize()}: {len(forms)}")
+            if status == "failed":
+                for info in forms:
+                    print(f"  • {info['title']} (ID: {info['id']}) - {outcomes[info['id']][1]}")
+        print(f"{total_forms} forms in {elapsed:.0f}s ({total_forms / (elapsed / 60):.1f} forms/min)" if elapsed else "")
+        print("="*60)
+        try:
+            json_path, html_path = report.write()
+            print(f"Run report saved: {json_path}")
+            print(f"Slowest forms view: {html_path}")
+        except OSError as e:
+            print(f"Could not write run report: {e}")
+
+    def _sync_form_http(self, client, form_info, sheet_data, report, links=None):
+        """Apply the sheet to one form's catalog notifications over HTTP. Returns (status, error_class).
+        links ({name: edit page URL}, from the bulk read) saves loading the notification list."""
+        form_id, form_title = form_info['id'], form_info['title']
+        results = {}
+        while True:
+            report.start_form(form_id, form_title)
+            self.metrics.form_started()
+            generation = client.generation
+            failure = None
+            try:
+                if links is None:
+                    with self.progress.phase('notification_list'):
+                        links = {n['name']: n['href'] for n in client.list_notifications(form_id)}
+                for entry in self.notification_catalog:
+                    name = entry['name']
+                    if results.get(name) == "success":
+                        continue
+                    if name not in links:
+                        results[name], failure = "failed", MISSING_FIELD
+                        report.record_notification(form_id, name, "failed")
+                        continue
+                    with self.progress.phase('routing_edit'):
+                        result, stats, error_class = self._apply_routing_http(client, links[name], entry, sheet_data)
+                    results[name] = result
+                    failure = failure or error_class
+                    report.record_notification(form_id, name, result, stats)
+                    self.metrics.rules_written(stats)
+                    self.progress.rules_written(stats)
+            except SessionExpired as e:
+                print(f"Form {form_id}: {e}")
+                try:
+                    self.session_broker.renew(generation, self._reauthenticate)
+                    retrying = self.retry_scheduler.requeue(form_id, SESSION_LOST)
+                except LoginFailed as login_error:
+                    print(f"Form {form_id}: {login_error}")
+                    self.retry_scheduler.record(form_id, SESSION_LOST)
+                    retrying = False
+                if retrying:
+                    report.finish_form(form_id, "retrying", SESSION_LOST, self.retry_scheduler.retries(form_id))
+                    self.metrics.form_finished("retrying", SESSION_LOST)
+                    continue  # Redone right away with the new login
+                failure = SESSION_LOST
+                print(f"❌ {form_title} (ID: {form_id}): {failure} - not retrying")
+                report.finish_form(form_id, "failed", failure, self.retry_scheduler.retries(form_id))
+                self.metrics.form_finished("failed", failure)
+                return "failed", failure
+            except Exception as e:
+                failure = classify_error(e)
+                print(f"✗ Form {form_title} (ID: {form_id}): {e}")
+                results['_form'] = "failed"
+            
+            if any(r == "failed" for r in results.values()):
+                delay = self.retry_scheduler.schedule(form_id, failure or UNKNOWN)
+                if delay is not None:
+                    print(f"   Form {form_id}: {failure} - retry {self.retry_scheduler.retries(form_id)} in about {delay:.0f}s")
+                    report.finish_form(form_id, "retrying", failure, self.retry_scheduler.retries(form_id))
+                    self.metrics.form_finished("retrying", failure)
+                    results.pop('_form', None)
+                    with self.progress.phase('retry_wait'):
+                        time.sleep(delay)
                     continue
+                status = "failed"
+            elif all(r == "skipped" for r in results.values()):
+                status = "skipped"
+            else:
+                status = "success"
+            report.finish_form(form_id, status, failure if status == "failed" else None, self.retry_scheduler.retries(form_id))
+            self.metrics.form_finished(status, failure if status == "failed" else None)
+            print(f"{'✓' if status == 'success' else '⏭️ ' if status == 'skipped' else '❌'} {form_title} (ID: {form_id}): "
+                  + ", ".join(f"{name}: {result}" for name, result in results.items()))
+            return status, failure if status == "failed" else None
+
+    def _bulk_read(self, client, all_form_info):
+        """Current routing of every form from one Import/Export download (LEADROUTER_BULK_READ=0
+        turns it off). Returns {form_id: exported form}, or None to read each form's pages instead."""
+        if not env_flag('LEADROUTER_BULK_READ', True):
+            return None
+        start = time.perf_counter()
+        try:
+            with self.progress.phase('bulk_read'):
+                exported = client.export_forms([info['id'] for info in all_form_info])
+        except Exception as e:
+            print(f"Bulk read not available ({e}) - reading each form's pages instead")
+            return None
+        print(f"Read {len(exported)} forms' notifications in one export ({time.perf_counter() - start:.1f}s)")
+        return exported
+
+    def _plan_form_from_export(self, form, sheet_data):
+        """Plan every catalog notification of an exported form. Returns {name: (result, stats)} if
+        nothing on the form needs saving, or None if the form has to be opened (changes to make,
+        a missing notification or routing not switched on)."""
+        notifications = {n['name']: n['page'] for n in form['notifications']}
+        planned = {}
+        for entry in self.notification_catalog:
+            page = notifications.get(entry['name'])
+            if page is None:
+                return None  # Reported as missing by the normal path
+            strategy, _ = resolve_routing(label for _, label in page.field_options)
+            if strategy is LOCATION_STRATEGY and entry['ask_for_location_forms']:
+                self.prompt_for_location_notifications(entry['name'])
+            result, stats, rules = self._plan_routing_http(page, entry, sheet_data)
+            if rules is not None or (result == "success" and page.to_type != 'routing'):
+                return None
+            planned[entry['name']] = (result, stats)
+        return planned
+
+    def _record_unchanged_form(self, report, info, planned):
+        """Report a form the bulk read showed is already up to date (none of its pages were opened)."""
+        report.start_form(info['id'], info['title'])
+        self.metrics.form_started()
+        for name, (result, stats) in planned.items():
+            report.record_notification(info['id'], name, result, stats)
+        status = "skipped" if all(result == "skipped" for result, _ in planned.values()) else "success"
+        report.finish_form(info['id'], status)
+        self.metrics.form_finished(status)
+        self.progress.form_done(info['id'], timed=False)
+        return status
+
+    def _apply_routing_http(self, client, href, entry, sheet_data):
+        """Plan and post one notification's routing. Returns (result, stats, error_class).
+
+        The save is optimistic: just before posting, the notification is fetched again and
+        if its routing no longer matches what the plan was made from, it is planned again
+        from the fresh copy (LEADROUTER_CONFLICT_REPLANS times, default 2)."""
+        name = entry['name']
+        page = client.load_notification(href)
+        replans = env_int('LEADROUTER_CONFLICT_REPLANS', 2)
+        for attempt in range(replans + 1):
+            result, stats, rules = self._plan_routing_http(page, entry, sheet_data)
+            if rules is None:
+                return result, stats, None
+            fresh = client.load_notification(href)
+            if routing_fingerprint(fresh.routing) == routing_fingerprint(page.routing):
+                break
+            print(f"⚠️  {name} was changed on the server after it was read - re-planning ({attempt + 1}/{replans})")
+            logger.warning(f"Routing conflict on {name} at {href}")
+            page = fresh
+        else:
+            return "failed", stats, CONFLICT
+        
+        errors, saved = client.save_notification(fresh, rules)  # Fresh copy: current nonce and other settings
+        if errors:
+            print(f"❌ {name} was rejected by Gravity Forms: {'; '.join(errors)}")
+            return "failed", stats, VALIDATION_ERROR
+        normalize = lambda r: (r['field_id'], (r['operator'] or 'is').lower(), r['value'].lower(), r['email'].lower())
+        if [normalize(r) for r in saved.routing] != [normalize(r) for r in rules]:
+            print(f"❌ {name}: saved routing does not match what was posted")
+            return "failed", stats, UNKNOWN
+        return "success", stats, None
+
+    def _plan_routing_http(self, page, entry, sheet_data):
+        """Work out one notification's new routing from its page.
+        Returns (result, stats, rules); rules is None when nothing needs saving."""
+        name, email_column = entry['name'], entry['email_column']
+        strategy, field_label = resolve_routing(label for _, label in page.field_options)
+        if not strategy:
+            return "skipped", {}, None
+        stats = {'routing_type': strategy.name}
+        if strategy is LOCATION_STRATEGY and entry['ask_for_location_forms'] and not self.location_notification_answers.get(name):
+            return "skipped", stats, None
+        field_id = page.field_id(field_label)
+        
+        # Choice fields store the option value; match sheet names to option texts like the browser mode does
+        choices = page.choices.get(field_id, []) if strategy.choice_values else []
+        choice_texts = [text for _, text in choices]
+        
+        def rule_for(row):
+            value = strategy.rule_value(row)
+            email = str(row[email_column]).strip()
+            if choices:
+                text = self._match_option_text(choice_texts, value, email)
+                value = next((v for v, t in choices if t == text), value) if text else value
+            return {'field_id': field_id, 'field': field_label, 'operator': 'is', 'value': value, 'email': email}
+        
+        current = page.routing
+        if self.prune_rules:
+            rules = []
+            seen = set()
+            for row in sheet_data:
+                rule = rule_for(row)
+                key = (rule['value'].lower(), rule['email'].lower())
+                if key not in seen:
+                    seen.add(key)
+                    rules.append(rule)
+            desired_keys = {(r['value'].lower(), r['email'].lower()) for r in rules}
+            kept = sum(1 for r in current if r['field_id'] == field_id and (r['value'].lower(), r['email'].lower()) in desired_keys)
+            stats.update({'kept': kept, 'added': len(rules) - kept, 'removed': len(current) - kept})
+        else:
+            # Keep every existing rule, fill blank rows first, then append what is missing.
+            # In watch mode rules of changed or removed dealers are replaced (or dropped) as well.
+            retired_keys = self._retired_keys(lambda row: (rule_for(row)['value'].lower(), rule_for(row)['email'].lower()))
+            is_retired = lambda r: (r['email'] and r['value'] and strategy.matches_field(r['field'])
+                                    and (r['value'].lower(), r['email'].lower()) in retired_keys)
+            configured = {(r['value'], r['email']) for r in current
+                          if r['email'] and r['value'] and strategy.matches_field(r['field']) and r['operator'].lower() == "is"}
+            missing = []
+            kept_keys = set()
+            for row in sheet_data:
+                rule = rule_for(row)
+                key = (rule['value'], rule['email'])
+                if key in configured:
+                    kept_keys.add(key)
+                else:
+                    configured.add(key)  # Also drops repeated sheet rows
+                    missing.append(rule)
+            stats.update({'kept': len(kept_keys), 'added': len(missing), 'removed': 0})
+            rules = []
+            for rule in current:
+                retired = is_retired(rule)
+                stats['removed'] += 1 if retired else 0
+                if (retired or not rule['email'] or not rule['value']) and missing:
+                    rules.append(missing.pop(0))
+                elif not retired:
+                    rules.append(rule)
+            rules += missing
+        
+        normalize = lambda r: (r['field_id'], (r['operator'] or 'is').lower(), r['value'].lower(), r['email'].lower())
+        if [normalize(r) for r in rules] == [normalize(r) for r in current]:
+            return "success", stats, None
+        return "success", stats, rules
+
+    def _list_active_forms(self, driver):
+        """Load the active forms list and return [{'id', 'title', 'href'}] for every form."""
+        # Navigate directly to active forms page
+        print("Navigating directly to active forms...")
+        active_forms_url = f"{self.wp_url.rstrip('/')}/wp/wp-admin/admin.php?page=gf_edit_forms&active=1"
+        driver.get(active_forms_url)
+        
+        # Wait for either the page to complete loading or 10 seconds max
+        try:
+            self._wait(driver, 'forms_list_ready').until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
+        except TimeoutException:
+            print("Page load took too long, proceeding anyway")
+
+        # Then look for just the critical element we need
+        try:
+            self._wait(driver, 'forms_table', 5).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ".wp-list-table"))
+            )
+            print("Active forms page loaded")
+        except TimeoutException:
+            print("Forms table not found but proceeding anyway")
+        
+        # Now find all forms with a simpler, more reliable approach
+        print("Finding forms on the page...")
+        all_forms = []
+        
+        # Try the most reliable selector first - just look for edit links
+        try:
+            all_forms = driver.find_elements(By.XPATH, "//a[contains(@href, 'page=gf_edit_forms') and contains(@href, 'id=') and not(contains(@href, 'view='))]")
+            print(f"Found {len(all_forms)} forms with primary selector")
+        except Exception as e:
+            print(f"Primary form selector failed: {e}")
+        
+        # If that didn't work, try a broader search
+        if not all_forms:
+            try:
+                print("Trying alternative form selector...")
+                all_forms = driver.find_elements(By.XPATH, "//table//a[contains(@href, 'id=') and contains(text(), '') and not(contains(@href, 'view='))]")
+                print(f"Found {len(all_forms)} forms with alternative selector")
+            except Exception as e:
+                print(f"Alternative form selector failed: {e}")
+        
+        # Get all form IDs and titles at the start
+        all_form_info = []
+        for form_link in all_forms:
+            try:
+                form_title = form_link.text.strip()
+                form_href = form_link.get_attribute('href')
+                
+                # Extract form ID from the href
+                import re
+                form_id_match = re.search(r'[?&]id=(\d+)', form_href)
+                form_id = form_id_match.group(1) if form_id_match else None
+                
+                if form_id and form_title:
+                    all_form_info.append({
+                        'id': form_id,
+                        'title': form_title,
+                        'href': form_href
+                    })
+            except Exception as e:
+                print(f"Error getting form info: {e}")
+                continue
+        return all_form_info
+
+    def _open_tab_pool(self, driver):
+        """Open LEADROUTER_TABS tabs for interleaved processing, or return None for single-tab mode."""
+        tab_count = env_int('LEADROUTER_TABS', 1)
+        if tab_count <= 1:
+            return None
+        from tab_pool import TabPool
+        tab_pool = TabPool(driver, tab_count, self._find_validation_errors,
+                           page_timeout=self.latency.timeout('notification_list', 10))
+        tab_pool.open()
+        return tab_pool
+
+    def _schedule_retry(self, form_info, error_class, form_queue):
+        """Re-queue a failed form at the end of the queue if its error is transient."""
+        error_class = error_class or UNKNOWN
+        delay = self.retry_scheduler.schedule(form_info['id'], error_class)
+        if delay is None:
+            print(f"   Failure class: {error_class} - not retrying")
+            logger.info(f"Form {form_info['id']} failed permanently ({error_class})")
+            return False
+        attempt = self.retry_scheduler.retries(form_info['id'])
+        print(f"   Failure class: {error_class} - retry {attempt}/{self.retry_scheduler.max_retries} in about {delay:.0f}s")
+        logger.info(f"Form {form_info['id']} scheduled for retry {attempt} ({error_class})")
+        form_queue.append(form_info)
+        return True
+
+    def _process_notification(self, driver, wait, sheet_data, notification_name, email_column, form_title, form_id, Select, defer_save_check=False, notification_href=None, ask_for_location_forms=False):
+        """Process a single notification type. Saves are optimistic: if someone else changed the
+        notification after it was read, the changes are planned again from the saved version
+        (up to LEADROUTER_CONFLICT_REPLANS times, default 2) instead of overwriting theirs."""
+        replans = env_int('LEADROUTER_CONFLICT_REPLANS', 2)
+        for attempt in range(replans + 1):
+            with log_context(form_id=form_id, notification=notification_name), self.progress.phase('routing_edit'):
+                result = self._process_notification_once(driver, wait, sheet_data, notification_name, email_column, form_title, form_id, Select, defer_save_check, notification_href, ask_for_location_forms)
+            if result != "conflict":
+                return result
+            logger.warning(f"⚠️  {notification_name} on form {form_id} was changed on the server after it was read - re-planning ({attempt + 1}/{replans})")
+            notification_href = notification_href or driver.current_url  # Reload the edit page itself
+        self.last_failure = CONFLICT
+        return "failed"
+
+    def _process_notification_once(self, driver, wait, sheet_data, notification_name, email_column, form_title, form_id, Select, defer_save_check=False, notification_href=None, ask_for_location_forms=False):
+        """Helper method to process a single notification type.
+        With notification_href the edit page is opened directly instead of clicking through the list.
+        With defer_save_check the save is clicked but not waited for; the caller confirms it later."""
+        self.planned_fingerprint = None
+        try:
+            # 3c. Open the notification (directly by URL when the list page gave us its link)
+            if notification_href:
+                logger.debug(f"Opening {notification_name}...")
+                driver.get(notification_href)
+            else:
+                logger.debug(f"Looking for {notification_name} link...")
+                notification_link = None
             
-            if not notification_link:
-                print(f"Could not find {notification_name} notification link.")
-                print(f"Available {notification_name} links on this page:")
-                try:
-                    # List all notification links for debugging
-                    notification_links = driver.find_elements(By.XPATH, "//table//a[strong]")
-                    for link in notification_links:
-                        try:
-                            link_text = link.text.strip()
-                            if link_text:
-                                print(f"  - {link_text}")
-                        except:
-                            pass
+                # Try multiple ways to find the notification link based on actual HTML structure
+                selectors = [
+                    f"//a[strong[text()='{notification_name}']]",
+                    f"//strong[text()='{notification_name}']/parent::a",
+                    f"//a[contains(@href, 'notification') and contains(., '{notification_name}')]",
+                    f"//a[strong[contains(text(), '{notification_name}')]]",
+                    f"//strong[contains(text(), '{notification_name}')]/parent::a"
+                ]
+            
+                for i, selector in enumerate(selectors):
+                    try:
+                        logger.debug(f"Trying notification link selector {i+1}: {selector}")
+                        notification_link = wait.until(EC.element_to_be_clickable((By.XPATH, selector)))
+                        logger.debug(f"Found {notification_name} notification link with selector {i+1}")
+                        break
+                    except Exception as e:
+                        logger.debug(f"Selector {i+1} failed: {e}")
+                        continue
+            
+                if not notification_link:
+                    logger.error(f"Could not find {notification_name} notification link.")
+                    logger.info(f"Available {notification_name} links on this page:")
+                    try:
+                        # List all notification links for debugging
+                        notification_links = driver.find_elements(By.XPATH, "//table//a[strong]")
+                        for link in notification_links:
+                            try:
+                                link_text = link.text.strip()
+                                if link_text:
+                                    logger.info(f"  - {link_text}")
+                            except:
+                                pass
                     
-                    # Also check for links with href containing 'notification'
-                    print(f"Links with '{notification_name}' in href:")
-                    notif_href_links = driver.find_elements(By.XPATH, f"//a[contains(@href, 'notification') and contains(text(), '{notification_name}')]")
-                    for link in notif_href_links:
-                        try:
-                            link_text = link.text.strip()
-                            if link_text:
-                                print(f"  - {link_text}")
-                        except:
-                            pass
-                except Exception as e:
-                    print(f"Could not list {notification_name} links: {e}")
-                return "failed"
+                        # Also check for links with href containing 'notification'
+                        logger.info(f"Links with '{notification_name}' in href:")
+                        notif_href_links = driver.find_elements(By.XPATH, f"//a[contains(@href, 'notification') and contains(text(), '{notification_name}')]")
+                        for link in notif_href_links:
+                            try:
+                                link_text = link.text.strip()
+                                if link_text:
+                                    logger.info(f"  - {link_text}")
+                            except:
+                                pass
+                    except Exception as e:
+                        logger.warning(f"Could not list {notification_name} links: {e}")
+                    self.last_failure = MISSING_FIELD
+                    return "failed"
             
-            print(f"Clicking {notification_name} notification link...")
-            notification_link.click()
+                logger.debug(f"Clicking {notification_name} notification link...")
+                notification_link.click()
 
             # 3d. Ensure 'Configure Routing' is selected
-            print(f"Checking if Configure Routing is selected for {notification_name}...")
+            logger.debug(f"Checking if Configure Routing is selected for {notification_name}...")
             try:
-                routing_radio = wait.until(EC.presence_of_element_located((By.ID, f"gform_notification_to_type_routing")))
+                routing_radio = wait.until(EC.presence_of_element_located((By.ID, "gform_notification_to_type_routing")))
                 if not routing_radio.is_selected():
-                    print(f"Selecting Configure Routing for {notification_name}...")
+                    logger.debug(f"Selecting Configure Routing for {notification_name}...")
                     routing_radio.click()
                     time.sleep(0.5)  # Wait for routing options to load
                 else:
-                    print(f"{notification_name} Configure Routing is already selected")
+                    logger.debug(f"{notification_name} Configure Routing is already selected")
             except Exception as e:
-                print(f"Could not find Configure Routing radio button for {notification_name}: {e}")
+                logger.error(f"Could not find Configure Routing radio button for {notification_name}: {e}")
+                self.last_failure = classify_error(e)
                 return "failed"
 
-            # Check what fields are actually available in THIS notification and determine routing type
-            print(f"Checking available fields for {notification_name}...")
+            # Check what fields are actually available in THIS notification and pick the routing strategy once
+            logger.debug(f"Checking available fields for {notification_name}...")
             try:
-                # Check the first routing field dropdown to see what's available
-                if_dropdown = driver.find_element(By.ID, "routing_field_id_0")
-                from selenium.webdriver.support.ui import Select
-                select = Select(if_dropdown)
-                available_options = [option.text.strip() for option in select.options if option.text.strip()]
-                
-                print(f"Available routing fields: {available_options}")
+                available_options = driver.execute_script("""
+                    var field = document.getElementById('routing_field_id_0');
+                    if (!field) { return null; }
+                    return Array.prototype.map.call(field.options, function (o) { return o.text.trim(); })
+                        .filter(function (text) { return text; });
+                """)
+                if available_options is None:
+                    raise NoSuchElementException("Routing field dropdown routing_field_id_0 not found")
                 
-                # Check for location fields first (PRIORITY)
-                location_fields = ["Choose A Location", "Location", "Dealership Location", "Store Location", "Dealer Location"]
-                has_location_field = any(field in available_options for field in location_fields)
+                logger.debug(f"Available routing fields: {available_options}")
                 
-                if not has_location_field:
-                    # Also check for any field containing "location"
-                    has_location_field = any("location" in opt.lower() for opt in available_options)
-                
-                # Check for Dealer ID field
-                dealer_id_fields = ["Dealer ID", "Dealership ID", "Dealer", "ID"]
-                has_dealer_id_field = any(field in available_options for field in dealer_id_fields)
-                
-                # DETERMINE ROUTING FOR THIS SPECIFIC NOTIFICATION
-                if has_location_field:
-                    # Location fields take priority
-                    actual_use_location_routing = True
-                    print(f"✓ {notification_name} will use LOCATION-BASED routing")
-                elif has_dealer_id_field:
-                    # Fall back to Dealer ID routing
-                    actual_use_location_routing = False
-                    print(f"✓ {notification_name} will use DEALER-ID-BASED routing")
-                else:
+                strategy, field_label = resolve_routing(available_options)
+                if not strategy:
                     # No suitable fields found - skip
-                    print(f"❌ SKIPPING {notification_name}: No suitable routing fields found")
-                    print(f"   Available fields: {available_options}")
+                    logger.info(f"❌ SKIPPING {notification_name}: No suitable routing fields found")
+                    logger.info(f"   Available fields: {available_options}")
                     return "skipped"
+                logger.info(f"✓ {notification_name} will use {strategy.name.upper()} routing (field: {field_label})")
+                self.notification_stats['routing_type'] = strategy.name
                 
-                # For Text notifications on location-based forms, ask user preference
-                if actual_use_location_routing and notification_name == "Text Formatted Notification":
-                    if not self.prompt_for_text_notifications():
-                        print(f"Skipping {notification_name} for location-based form as requested by user")
+                # For notifications like Text on location-based forms, ask user preference
+                if strategy is LOCATION_STRATEGY and ask_for_location_forms:
+                    if not self.prompt_for_location_notifications(notification_name):
+                        logger.info(f"Skipping {notification_name} for location-based form as requested by user")
                         return "skipped"
                 
-                print(f"✓ Required fields are available for {notification_name}")
+                logger.debug(f"✓ Required fields are available for {notification_name}")
                 
             except Exception as e:
-                print(f"Error checking available fields for {notification_name}: {e}")
+                logger.error(f"Error checking available fields for {notification_name}: {e}")
+                self.last_failure = classify_error(e)
                 return "failed"
 
-            # Use the actual routing type determined for this notification
-            use_location_routing = actual_use_location_routing
+            if self.prune_rules:
+                return self._compact_notification(driver, wait, sheet_data, notification_name, email_column, form_title, form_id, Select, strategy, field_label, defer_save_check)
 
             # 3e. Fill blank rules first, then add new ones if needed
-            print(f"Configuring {notification_name} routing rules...")
-            routing_type = "location-based" if use_location_routing else "dealer-id-based"
-            print(f"Using {routing_type} routing strategy")
-            
+            logger.debug(f"Configuring {notification_name} routing rules...")
             try:
-                # Find all existing email fields and check which are blank
-                all_email_fields = driver.find_elements(By.XPATH, f"//input[starts-with(@id, 'routing_email_')]")
-                existing_count = len(all_email_fields)
-                needed_count = len(sheet_data)
-                
-                print(f"Found {existing_count} existing rule slots")
-                print(f"Need to configure {needed_count} rules")
+                rows = self._read_routing_rules(driver)
+                self.planned_fingerprint = routing_fingerprint(rows)
+                logger.debug(f"Found {len(rows)} existing rule slots")
+                logger.debug(f"Need to configure {len(sheet_data)} rules")
                 
-                # Check which existing rules are blank, incomplete, or already match our data
+                # Index the rules that are already set up so each sheet row is checked once
                 blank_rules = []
-                filled_rules = []
-                duplicate_rules = []
-                
-                for i in range(existing_count):
-                    try:
-                        email_field = driver.find_element(By.ID, f"routing_email_{i}")
-                        value_field = driver.find_element(By.ID, f"routing_value_{i}")
-                        if_dropdown = driver.find_element(By.ID, f"routing_field_id_{i}")
-                        is_dropdown = driver.find_element(By.ID, f"routing_operator_{i}")
-                        
-                        email_value = email_field.get_attribute('value').strip()
-                        routing_value = value_field.get_attribute('value').strip()
-                        
-                        # Get current field and operator selections
-                        current_field_selection = Select(if_dropdown).first_selected_option.text.strip()
-                        current_operator_selection = Select(is_dropdown).first_selected_option.text.strip()
-                        
-                        if not email_value or not routing_value:
-                            blank_rules.append(i)
-                            print(f"  Rule {i} is blank/incomplete")
-                        else:
-                            # Check if this rule matches any of our data
-                            rule_is_duplicate = False
-                            for row in sheet_data:
-                                expected_email = row[email_column]
-                                expected_value = row['DEALERSHIP NAME'] if use_location_routing else row['FEED ID']
-                                
-                                # Check if this rule matches the current row's data
-                                email_matches = email_value == expected_email
-                                value_matches = routing_value == expected_value
-                                
-                                # Check field selection matches
-                                field_matches = False
-                                if use_location_routing:
-                                    location_field_names = ["Choose A Location", "Location", "Dealership Location", "Store Location", "Dealer Location"]
-                                    field_matches = (current_field_selection in location_field_names or 
-                                                   "location" in current_field_selection.lower())
-                                else:
-                                    dealer_id_fields = ["Dealer ID", "Dealership ID", "Dealer", "ID"]
-                                    field_matches = current_field_selection in dealer_id_fields
-                                
-                                # Check operator matches
-                                operator_matches = current_operator_selection.lower() == "is"
-                                
-                                # If all match, this rule is already set up correctly
-                                if email_matches and value_matches and field_matches and operator_matches:
-                                    rule_is_duplicate = True
-                                    print(f"  Rule {i} already matches data: {expected_email} -> {expected_value} (SKIPPING)")
-                                    break
-                            
-                            if rule_is_duplicate:
-                                duplicate_rules.append(i)
-                            else:
-                                filled_rules.append(i)
-                                print(f"  Rule {i} is filled but doesn't match our data: {email_value} -> {routing_value}")
-                    except Exception as e:
-                        print(f"  Error checking rule {i}: {e}")
-                        blank_rules.append(i)  # If we can't check it, consider it blank
-                
-                print(f"Found {len(blank_rules)} blank rules, {len(filled_rules)} filled rules (different data), {len(duplicate_rules)} duplicate rules (skipped)")
+                configured = set()
+                for row in rows:
+                    if not row['email'] or not row['value']:
+                        blank_rules.append(row['index'])
+                    elif strategy.matches_field(row['field']) and row['operator'].lower() == "is":
+                        configured.add((row['value'], row['email']))
+                logger.debug(f"Found {len(blank_rules)} blank rules, {len(rows) - len(blank_rules)} filled rules ({len(configured)} matching this routing type)")
                 
-                # Remove duplicates from our data to process
                 remaining_data = []
-                for row in sheet_data:
-                    expected_email = row[email_column]
-                    expected_value = row['DEALERSHIP NAME'] if use_location_routing else row['FEED ID']
-                    
-                    # Check if this data is already configured in any rule
-                    already_configured = False
-                    for i in duplicate_rules:
-                        try:
-                            email_field = driver.find_element(By.ID, f"routing_email_{i}")
-                            value_field = driver.find_element(By.ID, f"routing_value_{i}")
-                            
-                            existing_email = email_field.get_attribute('value').strip()
-                            existing_value = value_field.get_attribute('value').strip()
-                            
-                            if existing_email == expected_email and existing_value == expected_value:
-                                already_configured = True
-                                break
-                        except:
-                            continue
-                    
-                    if not already_configured:
-                        remaining_data.append(row)
+                kept_keys = set()
+                for sheet_row in sheet_data:
+                    key = (strategy.rule_value(sheet_row), str(sheet_row[email_column]).strip())
+                    if key in configured:
+                        kept_keys.add(key)
+                    else:
+                        remaining_data.append(sheet_row)
+                        configured.add(key)  # Also drops repeated sheet rows
+                self.notification_stats['kept'] = len(kept_keys)
+                
+                # Watch mode: rules of dealers that changed or left the sheet are replaced or removed
+                retired_keys = self._retired_keys(lambda r: (strategy.rule_value(r).lower(), str(r[email_column]).strip().lower()))
+                retired = {row['index'] for row in rows if row['email'] and row['value'] and strategy.matches_field(row['field'])
+                           and (row['value'].lower(), row['email'].lower()) in retired_keys}
+                if retired:
+                    new_rules = [{'field_id': '', 'field': field_label, 'operator': 'is',
+                                  'value': strategy.rule_value(r), 'email': str(r[email_column]).strip()} for r in remaining_data]
+                    rules = []
+                    for row in rows:
+                        if row['index'] in retired or not row['email'] or not row['value']:
+                            if new_rules:
+                                rules.append(new_rules.pop(0))
+                            continue  # Leftover retired and blank rows are dropped
+                        rules.append(row)
+                    rules += new_rules
+                    self.notification_stats.update({'added': len(remaining_data), 'removed': len(retired)})
+                    logger.info(f"Retiring {len(retired)} rule(s) of changed or removed dealers and adding {len(remaining_data)}")
+                    self._write_routing_rules(driver, wait, rules, Select)
+                    return self._submit_notification(driver, wait, notification_name, form_title, form_id, defer_save_check)
                 
                 needed_count = len(remaining_data)
-                print(f"Need to configure {needed_count} rules (after removing duplicates)")
+                logger.debug(f"Need to configure {needed_count} rules (after removing duplicates)")
                 
                 if needed_count == 0:
-                    print(f"All data is already configured! No changes needed for {notification_name}")
+                    logger.info(f"All data is already configured! No changes needed for {notification_name}")
                     return "success"
                 
-                # Fill blank rules first with our data
-                data_index = 0
+                # Fill blank rules first with our data, then create new rules for the rest
                 rules_configured = 0
-                
-                print(f"Filling blank rules with our data...")
-                for rule_index in blank_rules:
-                    if data_index >= needed_count:
-                        break  # No more data to fill
-                        
-                    row = remaining_data[data_index]
-                    print(f"Filling blank rule {rule_index} with: {row['DEALERSHIP NAME']} -> {row[email_column]}")
-                    
+                value_options = None  # Dropdown choices for the value field, read once per notification
+                for sheet_row in remaining_data:
+                    if blank_rules:
+                        rule_index = blank_rules.pop(0)
+                        logger.debug(f"Filling blank rule {rule_index} with: {sheet_row['DEALERSHIP NAME']} -> {sheet_row[email_column]}")
+                    else:
+                        logger.debug(f"Creating new rule for: {sheet_row['DEALERSHIP NAME']} -> {sheet_row[email_column]}")
+                        try:
+                            rule_index = self._add_routing_row(driver, wait)
+                        except Exception as e:
+                            logger.warning(f"  Could not add a new rule, stopping new rule creation: {e}")
+                            break
                     try:
-                        # Fill email field
-                        email_field = driver.find_element(By.ID, f"routing_email_{rule_index}")
-                        email_field.clear()
-                        email_field.send_keys(row[email_column])
-                        
-                        # Set dropdown fields based on routing type
-                        if_dropdown = driver.find_element(By.ID, f"routing_field_id_{rule_index}")
-                        
-                        if use_location_routing:
-                            # Use location-based routing - try priority fields first
-                            location_field_names = ["Choose A Location", "Location", "Dealership Location", "Store Location", "Dealer Location"]
-                            
-                            field_selected = False
-                            for location_name in location_field_names:
-                                try:
-                                    Select(if_dropdown).select_by_visible_text(location_name)
-                                    field_selected = True
-                                    print(f"  ✓ Selected location field: {location_name}")
-                                    break
-                                except:
-                                    continue
-                            
-                            # If none of the priority fields worked, try any field containing "location"
-                            if not field_selected:
-                                select_obj = Select(if_dropdown)
-                                for option in select_obj.options:
-                                    if "location" in option.text.lower():
-                                        try:
-                                            select_obj.select_by_visible_text(option.text)
-                                            field_selected = True
-                                            print(f"  ✓ Selected location field: {option.text}")
-                                            break
-                                        except:
-                                            continue
-                        else:
-                            # Use dealer ID routing - try priority fields first
-                            dealer_id_fields = ["Dealer ID", "Dealership ID", "Dealer", "ID"]
-                            
-                            field_selected = False
-                            for dealer_field in dealer_id_fields:
-                                try:
-                                    Select(if_dropdown).select_by_visible_text(dealer_field)
-                                    field_selected = True
-                                    print(f"  ✓ Selected dealer field: {dealer_field}")
-                                    break
-                                except:
-                                    continue
-                        
-                        is_dropdown = driver.find_element(By.ID, f"routing_operator_{rule_index}")
-                        Select(is_dropdown).select_by_visible_text("is")
-                        
-                        value_field = driver.find_element(By.ID, f"routing_value_{rule_index}")
-                        
-                        if use_location_routing:
-                            # For location routing, use dealership name from Google Sheet
-                            dealership_name = row['DEALERSHIP NAME']
-                            corresponding_email = row[email_column]
-                            
-                            print(f"  Looking for dealership: '{dealership_name}' (email: {corresponding_email})")
-                            
-                            # Ensure the value field is visible and interactable
-                            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", value_field)
-                            time.sleep(0.5)
-                            
-                            # Try to select the dealership name from dropdown
-                            try:
-                                # Wait for element to be clickable and check if it's a select element
-                                wait.until(EC.element_to_be_clickable(value_field))
-                                
-                                if value_field.tag_name.lower() == 'select':
-                                    # It's a dropdown - use Select
-                                    value_dropdown = Select(value_field)
-                                    available_options = []
-                                    
-                                    # Get all option texts safely
-                                    for option in value_dropdown.options:
-                                        option_text = option.text.strip()
-                                        if option_text:  # Only add non-empty options
-                                            available_options.append(option_text)
-                                    
-                                    print(f"  Available location options ({len(available_options)}): {available_options[:10]}{'...' if len(available_options) > 10 else ''}")
-                                    
-                                    # First priority: Try to find exact dealership name match
-                                    dealership_found = False
-                                    for option_text in available_options:
-                                        if option_text == dealership_name:
-                                            try:
-                                                value_dropdown.select_by_visible_text(option_text)
-                                                print(f"  ✓ Selected exact dealership match: '{option_text}'")
-                                                dealership_found = True
-                                                break
-                                            except Exception as select_error:
-                                                print(f"  ! Error selecting exact match '{option_text}': {select_error}")
-                                                continue
-                                    
-                                    # Second priority: Try partial dealership name match
-                                    if not dealership_found:
-                                        for option_text in available_options:
-                                            if (dealership_name.lower() in option_text.lower() or 
-                                                option_text.lower() in dealership_name.lower()):
-                                                try:
-                                                    value_dropdown.select_by_visible_text(option_text)
-                                                    print(f"  ✓ Selected partial dealership match: '{option_text}' (for '{dealership_name}')")
-                                                    dealership_found = True
-                                                    break
-                                                except Exception as select_error:
-                                                    print(f"  ! Error selecting partial match '{option_text}': {select_error}")
-                                                    continue
-                                    
-                                    # Third priority: Try to find the corresponding email in dropdown
-                                    if not dealership_found:
-                                        for option_text in available_options:
-                                            if corresponding_email.lower() in option_text.lower():
-                                                try:
-                                                    value_dropdown.select_by_visible_text(option_text)
-                                                    print(f"  ✓ Selected email match in dropdown: '{option_text}'")
-                                                    dealership_found = True
-                                                    break
-                                                except Exception as select_error:
-                                                    print(f"  ! Error selecting email match '{option_text}': {select_error}")
-                                                    continue
-                                    
-                                    # If nothing found, warn user but don't change selection
-                                    if not dealership_found:
-                                        print(f"  ⚠️  WARNING: Could not find '{dealership_name}' in dropdown options")
-                                        print(f"  ⚠️  Available options (first 10): {available_options[:10]}")
-                                        print(f"  ⚠️  Leaving current selection unchanged")
-                                        
-                                else:
-                                    # It's a text field, not dropdown - clear and type the dealership name
-                                    value_field.clear()
-                                    value_field.send_keys(dealership_name)
-                                    print(f"  ✓ Entered dealership name in text field: '{dealership_name}'")
-                                    
-                            except Exception as dropdown_error:
-                                print(f"  ! Error interacting with value field: {dropdown_error}")
-                                # Try fallback approach - clear and type
-                                try:
-                                    value_field.clear()
-                                    value_field.send_keys(dealership_name)
-                                    print(f"  ✓ Fallback: Entered dealership name as text: '{dealership_name}'")
-                                except Exception as fallback_error:
-                                    print(f"  ✗ Fallback also failed: {fallback_error}")
-                        else:
-                            # Use Feed ID for Dealer ID routing
-                            value_field.clear()
-                            value_field.send_keys(row['FEED ID'])
-                        
-                        # Verify the fields were actually populated
-                        time.sleep(0.2)  # Brief pause for field updates
-                        actual_email = email_field.get_attribute('value')
-                        actual_value = value_field.get_attribute('value')
-                        
-                        if actual_email != row[email_column]:
-                            print(f"  ! Warning: Email field shows '{actual_email}' instead of '{row[email_column]}'")
-                        
-                        expected_value = row['DEALERSHIP NAME'] if use_location_routing else row['FEED ID']
-                        if actual_value != expected_value:
-                            print(f"  ! Warning: Value field shows '{actual_value}' instead of '{expected_value}'")
-                            # Try again if it didn't work
-                            value_field.clear()
-                            if use_location_routing:
-                                value_field.send_keys(row['DEALERSHIP NAME'])
-                            else:
-                                value_field.send_keys(row['FEED ID'])
-                            time.sleep(0.1)
-                            actual_value = value_field.get_attribute('value')
-                            print(f"  ! Retry result: Value field now shows '{actual_value}'")
-                        
-                        print(f"  ✓ Filled rule {rule_index}: Email='{actual_email}', Value='{actual_value}'")
+                        value_options = self._fill_strategy_rule(driver, wait, rule_index, sheet_row, email_column, strategy, field_label, value_options, Select)
                         rules_configured += 1
-                        data_index += 1
-                        
                     except Exception as e:
-                        print(f"  ✗ Error filling rule {rule_index}: {e}")
-                        data_index += 1  # Skip this data row
+                        logger.warning(f"  ✗ Error filling rule {rule_index}: {e}")
                         continue
                 
-                # If we still have more data, create new rules
-                remaining_data_count = needed_count - data_index
-                if remaining_data_count > 0:
-                    print(f"Creating {remaining_data_count} new rules for remaining data...")
-                    
-                    for i in range(remaining_data_count):
-                        if data_index >= needed_count:
-                            break
-                            
-                        row = remaining_data[data_index]
-                        print(f"Creating new rule for: {row['DEALERSHIP NAME']} -> {row[email_column]}")
-                        
-                        # Add a new rule
-                        try:
-                            add_buttons = driver.find_elements(By.XPATH, "//a[contains(@onclick, 'InsertRouting')]")
-                            if add_buttons:
-                                last_add_button = add_buttons[-1]
-                                
-                                # Scroll to the add button and try to clear any overlays
-                                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", last_add_button)
-                                time.sleep(0.3)
-                                
-                                # Try to dismiss WordPress admin bar if it's covering the button
-                                try:
-                                    driver.execute_script("window.scrollBy(0, -50);")  # Scroll up a bit
-                                    time.sleep(0.2)
-                                except:
-                                    pass
-                                
-                                # Try regular click first
-                                click_successful = False
-                                try:
-                                    last_add_button.click()
-                                    click_successful = True
-                                except Exception as e:
-                                    print(f"    Regular click failed: {e}")
-                                    
-                                    # Try JavaScript click as fallback
-                                    try:
-                                        driver.execute_script("arguments[0].click();", last_add_button)
-                                        click_successful = True
-                                        print("    JavaScript click succeeded")
-                                    except Exception as e2:
-                                        print(f"    JavaScript click also failed: {e2}")
-                                
-                                if click_successful:
-                                    time.sleep(0.5)
-                                    
-                                    # Calculate the new rule index
-                                    new_rule_index = existing_count + i
-                                    
-                                    # Fill the new rule with duplicate checking logic applied earlier
-                                    email_field = driver.find_element(By.ID, f"routing_email_{new_rule_index}")
-                                    email_field.clear()
-                                    email_field.send_keys(row[email_column])
-                                    
-                                    if_dropdown = driver.find_element(By.ID, f"routing_field_id_{new_rule_index}")
-                                    
-                                    if use_location_routing:
-                                        # Use location-based routing - try priority fields first
-                                        location_field_names = ["Choose A Location", "Location", "Dealership Location", "Store Location", "Dealer Location"]
-                                        
-                                        field_selected = False
-                                        for location_name in location_field_names:
-                                            try:
-                                                Select(if_dropdown).select_by_visible_text(location_name)
-                                                field_selected = True
-                                                print(f"  ✓ Selected location field: {location_name}")
-                                                break
-                                            except:
-                                                continue
-                                        
-                                        # If none of the priority fields worked, try any field containing "location"
-                                        if not field_selected:
-                                            select_obj = Select(if_dropdown)
-                                            for option in select_obj.options:
-                                                if "location" in option.text.lower():
-                                                    try:
-                                                        select_obj.select_by_visible_text(option.text)
-                                                        field_selected = True
-                                                        print(f"  ✓ Selected location field: {option.text}")
-                                                        break
-                                                    except:
-                                                        continue
-                                    else:
-                                        # Use dealer ID routing - try priority fields first
-                                        dealer_id_fields = ["Dealer ID", "Dealership ID", "Dealer", "ID"]
-                                        
-                                        field_selected = False
-                                        for dealer_field in dealer_id_fields:
-                                            try:
-                                                Select(if_dropdown).select_by_visible_text(dealer_field)
-                                                field_selected = True
-                                                print(f"  ✓ Selected dealer field: {dealer_field}")
-                                                break
-                                            except:
-                                                continue
-                                    
-                                    is_dropdown = driver.find_element(By.ID, f"routing_operator_{new_rule_index}")
-                                    Select(is_dropdown).select_by_visible_text("is")
-                                    
-                                    value_field = driver.find_element(By.ID, f"routing_value_{new_rule_index}")
-                                    
-                                    if use_location_routing:
-                                        # For location routing, use dealership name from Google Sheet
-                                        dealership_name = row['DEALERSHIP NAME']
-                                        corresponding_email = row[email_column]
-                                        
-                                        print(f"  Looking for dealership: '{dealership_name}' (email: {corresponding_email})")
-                                        
-                                        # Ensure the value field is visible and interactable
-                                        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", value_field)
-                                        time.sleep(0.5)
-                                        
-                                        # Try to select the dealership name from dropdown
-                                        try:
-                                            # Wait for element to be clickable and check if it's a select element
-                                            wait.until(EC.element_to_be_clickable(value_field))
-                                            
-                                            if value_field.tag_name.lower() == 'select':
-                                                # It's a dropdown - use Select
-                                                value_dropdown = Select(value_field)
-                                                available_options = []
-                                                
-                                                # Get all option texts safely
-                                                for option in value_dropdown.options:
-                                                    option_text = option.text.strip()
-                                                    if option_text:  # Only add non-empty options
-                                                        available_options.append(option_text)
-                                                
-                                                print(f"  Available location options ({len(available_options)}): {available_options[:10]}{'...' if len(available_options) > 10 else ''}")
-                                                
-                                                # First priority: Try to find exact dealership name match
-                                                dealership_found = False
-                                                for option_text in available_options:
-                                                    if option_text == dealership_name:
-                                                        try:
-                                                            value_dropdown.select_by_visible_text(option_text)
-                                                            print(f"  ✓ Selected exact dealership match: '{option_text}'")
-                                                            dealership_found = True
-                                                            break
-                                                        except Exception as select_error:
-                                                            print(f"  ! Error selecting exact match '{option_text}': {select_error}")
-                                                            continue
-                                                
-                                                # Second priority: Try partial dealership name match
-                                                if not dealership_found:
-                                                    for option_text in available_options:
-                                                        if (dealership_name.lower() in option_text.lower() or 
-                                                            option_text.lower() in dealership_name.lower()):
-                                                            try:
-                                                                value_dropdown.select_by_visible_text(option_text)
-                                                                print(f"  ✓ Selected partial dealership match: '{option_text}' (for '{dealership_name}')")
-                                                                dealership_found = True
-                                                                break
-                                                            except Exception as select_error:
-                                                                print(f"  ! Error selecting partial match '{option_text}': {select_error}")
-                                                                continue
-                                                
-                                                # Third priority: Try to find the corresponding email in dropdown
-                                                if not dealership_found:
-                                                    for option_text in available_options:
-                                                        if corresponding_email.lower() in option_text.lower():
-                                                            try:
-                                                                value_dropdown.select_by_visible_text(option_text)
-                                                                print(f"  ✓ Selected email match in dropdown: '{option_text}'")
-                                                                dealership_found = True
-                                                                break
-                                                            except Exception as select_error:
-                                                                print(f"  ! Error selecting email match '{option_text}': {select_error}")
-                                                                continue
-                                                
-                                                # If nothing found, warn user but don't change selection
-                                                if not dealership_found:
-                                                    print(f"  ⚠️  WARNING: Could not find '{dealership_name}' in dropdown options")
-                                                    print(f"  ⚠️  Available options (first 10): {available_options[:10]}")
-                                                    print(f"  ⚠️  Leaving current selection unchanged")
-                                                    
-                                            else:
-                                                # It's a text field, not dropdown - clear and type the dealership name
-                                                value_field.clear()
-                                                value_field.send_keys(dealership_name)
-                                                print(f"  ✓ Entered dealership name in text field: '{dealership_name}'")
-                                                
-                                        except Exception as dropdown_error:
-                                            print(f"  ! Error interacting with value field: {dropdown_error}")
-                                            # Try fallback approach - clear and type
-                                            try:
-                                                value_field.clear()
-                                                value_field.send_keys(dealership_name)
-                                                print(f"  ✓ Fallback: Entered dealership name as text: '{dealership_name}'")
-                                            except Exception as fallback_error:
-                                                print(f"  ✗ Fallback also failed: {fallback_error}")
-                                    else:
-                                        # Use Feed ID for Dealer ID routing
-                                        value_field.clear()
-                                        value_field.send_keys(row['FEED ID'])
-                                    
-                                    # Verify the new rule fields were actually populated
-                                    time.sleep(0.2)  # Brief pause for field updates
-                                    actual_email = email_field.get_attribute('value')
-                                    actual_value = value_field.get_attribute('value')
-                                    
-                                    if actual_email != row[email_column]:
-                                        print(f"  ! Warning: New rule email field shows '{actual_email}' instead of '{row[email_column]}'")
-                                    
-                                    expected_value = row['DEALERSHIP NAME'] if use_location_routing else row['FEED ID']
-                                    if actual_value != expected_value:
-                                        print(f"  ! Warning: New rule value field shows '{actual_value}' instead of '{expected_value}'")
-                                        # Try again if it didn't work
-                                        value_field.clear()
-                                        if use_location_routing:
-                                            value_field.send_keys(row['DEALERSHIP NAME'])
-                                        else:
-                                            value_field.send_keys(row['FEED ID'])
-                                        time.sleep(0.1)
-                                        actual_value = value_field.get_attribute('value')
-                                        print(f"  ! Retry result: New rule value field now shows '{actual_value}'")
-                                    
-                                    print(f"  ✓ Created rule {new_rule_index}: Email='{actual_email}', Value='{actual_value}'")
-                                    rules_configured += 1
-                                    data_index += 1
-                                else:
-                                    print(f"  Could not click add button, stopping new rule creation")
-                                    break
-                                
-                        except Exception as e:
-                            print(f"  ✗ Error creating new rule: {e}")
-                            data_index += 1
-                            continue
-                
-                print(f"{notification_name} routing configuration complete! Configured {rules_configured} rules total")
+                logger.info(f"{notification_name} routing configuration complete! Configured {rules_configured} rules total")
+                self.notification_stats['added'] = rules_configured
                         
             except Exception as e:
-                print(f"Error configuring {notification_name} routing rules: {e}")
+                logger.error(f"Error configuring {notification_name} routing rules: {e}")
+                self.last_failure = classify_error(e)
                 return "failed"
 
             # Save the notification settings
-            print(f"Saving {notification_name} notification settings...")
-            try:
-                save_btn = driver.find_element(By.XPATH, "//input[@type='submit' and (@value='Update Notification' or @value='Save Notification')]")
-                save_btn.click()
-                time.sleep(2)  # Wait for save to complete
-                print(f"{notification_name} notification saved successfully")
-            except Exception as e:
-                print(f"Could not find or click save button for {notification_name}: {e}")
-                return "failed"
-            
-            logger.info(f"{notification_name} updated for form: {form_title}")
-            
-            # Navigate back to notifications list for this form
-            if notification_name != "Text Formatted Notification":  # Don't navigate back after the last notification
-                print(f"Returning to notifications list for {notification_name}...")
-                driver.get(f"{self.wp_url.rstrip('/')}/wp/wp-admin/admin.php?page=gf_edit_forms&view=settings&subview=notification&id={form_id}")
-                wait.until(EC.presence_of_element_located((By.LINK_TEXT, "Notifications")))
-            
-            return "success"
+            return self._submit_notification(driver, wait, notification_name, form_title, form_id, defer_save_check)
                 
         except Exception as e:
-            print(f"Error processing {notification_name}: {e}")
             logger.error(f"Error processing {notification_name}: {e}")
+            self.last_failure = classify_error(e)
             return "failed"
 
-    def run(self):
+    def _compact_notification(self, driver, wait, sheet_data, notification_name, email_column, form_title, form_id, Select, strategy, field_label, defer_save_check=False):
+        """Prune mode: rewrite the routing table as exactly one rule per sheet row, in sheet order.
+        Rules for dealers no longer in the sheet, blank rows and duplicates are removed."""
         try:
-            # Read data from Google Sheet
-            sheet_data = self.read_google_sheet()
-            if not sheet_data:
-                print("Error: Missing or empty values detected in the sheet. Please check your data and try again.")
-                logger.error("Aborting due to missing or empty values in the sheet.")
-                return
+            # Location dropdowns may spell dealership names differently from the sheet, and the
+            # routing rows store each choice's value, which can differ from its label
+            location_options = {}
+            if strategy.choice_values:
+                location_options = dict(driver.execute_script("""
+                    var value = document.getElementById('routing_value_0');
+                    if (!value || value.tagName.toLowerCase() !== 'select') { return []; }
+                    return Array.prototype.map.call(value.options, function (o) { return [o.text.trim(), o.value]; });
+                """) or [])
             
-            # Browser setup already navigated to WordPress admin and handled authentication
-            print(f"\nFound {len(sheet_data)} rows of data to process.")
+            desired = []
+            seen = set()
+            for row in sheet_data:
+                value = strategy.rule_value(row)
+                email = str(row[email_column]).strip()
+                if location_options:
+                    option_text = self._match_option_text(list(location_options), value, email)
+                    if option_text is None:
+                        logger.warning(f"  ✗ No {field_label} option matches {value} - skipping its rule")
+                        continue
+                    value = location_options[option_text]
+                key = (value.lower(), email.lower())
+                if key in seen:
+                    continue
+                seen.add(key)
+                desired.append({'field_id': '', 'field': field_label, 'operator': 'is', 'value': value, 'email': email})
             
-            # Automate Gravity Forms notification routing rules
-            self.automate_form_notifications(sheet_data)
+            current = self._read_routing_rules(driver)
+            self.planned_fingerprint = routing_fingerprint(current)
+            filled = [r for r in current if r['email'] or r['value']]
+            current_keys = [(r['field'], r['operator'], r['value'].lower(), r['email'].lower()) for r in filled]
+            desired_keys = [(r['field'], r['operator'], r['value'].lower(), r['email'].lower()) for r in desired]
+            # Gravity Forms always shows one row, so an empty rule set is one blank row
+            if current_keys == desired_keys and len(current) == max(len(desired), 1):
+                self.notification_stats['kept'] = len(desired)
+                logger.info(f"{notification_name} already has the minimal rule set ({len(desired)} rules) - no changes needed")
+                return "success"
             
-            print("\nAutomation completed successfully!")
+            desired_set = set(desired_keys)
+            kept = sum(1 for key in set(current_keys) if key in desired_set)
+            removed = len(filled) - kept
+            self.notification_stats.update({'kept': kept, 'added': len(desired) - kept, 'removed': removed})
+            logger.info(f"Compacting {notification_name}: {len(current)} rows -> {len(desired)} rules "
+                  f"({kept} kept, {len(desired) - kept} added, {removed} stale/duplicate removed, "
+                  f"{len(current) - len(filled)} blank rows dropped)")
+            self._write_routing_rules(driver, wait, desired, Select)
+        except Exception as e:
+            logger.error(f"Error compacting {notification_name} routing rules: {e}")
+            self.last_failure = classify_error(e)
+            return "failed"
+        
+        return self._submit_notification(driver, wait, notification_name, form_title, form_id, defer_save_check)
+
+    def _add_routing_row(self, driver, wait):
+        """Click the last "add rule" button and return the index of the new routing row."""
+        row_count = len(self._read_routing_rules(driver))
+        add_buttons = driver.find_elements(By.XPATH, "//a[contains(@onclick, 'InsertRouting')]")
+        if not add_buttons:
+            raise NoSuchElementException("Could not find the add routing rule button")
+        # JavaScript click avoids the WordPress admin bar intercepting the click
+        driver.execute_script("arguments[0].click();", add_buttons[-1])
+        wait.until(lambda d: len(self._read_routing_rules(d)) > row_count)
+        return self._read_routing_rules(driver)[-1]['index']
+
+    def _fill_strategy_rule(self, driver, wait, index, sheet_row, email_column, strategy, field_label, value_options, Select):
+        """Fill one routing row from a sheet row using the notification's routing strategy.
+        Returns the value dropdown's option texts so later rows can reuse them."""
+        email = str(sheet_row[email_column]).strip()
+        value = strategy.rule_value(sheet_row)
+        
+        email_field = driver.find_element(By.ID, f"routing_email_{index}")
+        email_field.clear()
+        email_field.send_keys(email)
+        
+        Select(driver.find_element(By.ID, f"routing_field_id_{index}")).select_by_visible_text(field_label)
+        Select(driver.find_element(By.ID, f"routing_operator_{index}")).select_by_visible_text("is")
+        
+        # Selecting the field can re-render the value input, so look it up afterwards
+        value_field = driver.find_element(By.ID, f"routing_value_{index}")
+        if strategy.choice_values and value_field.tag_name.lower() == 'select':
+            wait.until(EC.element_to_be_clickable(value_field))
+            if value_options is None:
+                value_options = driver.execute_script(
+                    "return Array.prototype.map.call(arguments[0].options, function (o) { return o.text.trim(); })"
+                    ".filter(function (text) { return text; });", value_field)
+                logger.debug(f"  Available {strategy.name} options ({len(value_options)}): {value_options[:10]}{'...' if len(value_options) > 10 else ''}")
+            option_text = self._match_option_text(value_options, value, email)
+            if option_text:
+                Select(value_field).select_by_visible_text(option_text)
+                logger.debug(f"  ✓ Selected '{option_text}' for '{value}'")
+            else:
+                logger.warning(f"  Could not find '{value}' in the {strategy.name} dropdown options")
+                logger.warning(f"  Available options (first 10): {value_options[:10]}")
+                logger.warning("  Leaving current selection unchanged")
+        else:
+            value_field.clear()
+            value_field.send_keys(value)
+        
+        # Verify the fields were actually populated
+        actual_email, actual_value = driver.execute_script(
+            "return [arguments[0].value, arguments[1].value];", email_field, value_field)
+        if actual_email != email:
+            logger.warning(f"  Email field shows '{actual_email}' instead of '{email}'")
+        if actual_value != value and value_field.tag_name.lower() != 'select':
+            logger.warning(f"  Value field shows '{actual_value}' instead of '{value}', retrying")
+            value_field.clear()
+            value_field.send_keys(value)
+            actual_value = value_field.get_attribute('value')
+        
+        logger.debug(f"  ✓ Filled rule {index}: Email='{actual_email}', Value='{actual_value}'")
+        return value_options
+
+    def _match_option_text(self, options, dealership_name, email=None):
+        """Find the dropdown option for a dealership: exact name, then partial name, then email."""
+        for option_text in options:
+            if option_text == dealership_name:
+                return option_text
+        name = dealership_name.lower()
+        for option_text in options:
+            if option_text and (name in option_text.lower() or option_text.lower() in name):
+                return option_text
+        if email:
+            for option_text in options:
+                if email.lower() in option_text.lower():
+                    return option_text
+        return None
+
+    def _submit_notification(self, driver, wait, notification_name, form_title, form_id, defer_save_check=False):
+        """Save the open notification and return "success", "failed" or "conflict" (changed on the
+        server since it was read; nothing was saved)."""
+        with self.progress.phase('conflict_check'):
+            if self._routing_changed_on_server(driver):
+                return "conflict"
+        logger.debug(f"Saving {notification_name} notification settings...")
+        try:
+            with self.progress.phase('save'):
+                save_btn = driver.find_element(By.XPATH, "//input[@type='submit' and (@value='Update Notification' or @value='Save Notification')]")
+                url_before_save = driver.current_url if defer_save_check else None
+                save_btn.click()
+                if defer_save_check:
+                    self.deferred_save = (save_btn, url_before_save)  # Lets the tab pool tell when the save has landed
+                    logger.info(f"{notification_name} save submitted for form: {form_title}")
+                    return "success"
+                self._wait_for_page_reload(driver, save_btn)
+        except Exception as e:
+            logger.error(f"Could not find or click save button for {notification_name}: {e}")
+            self.last_failure = classify_error(e)
+            return "failed"
+        
+        # Gravity Forms re-renders the page with an error notice if validation failed
+        validation_errors = self._find_validation_errors(driver)
+        if validation_errors:
+            logger.error(f"❌ {notification_name} was rejected by Gravity Forms:")
+            for message in validation_errors:
+                logger.error(f"   {message}")
+            self.last_failure = VALIDATION_ERROR
+            return "failed"
+        logger.debug(f"{notification_name} notification saved successfully")
+        
+        logger.info(f"{notification_name} updated for form: {form_title}")
+        return "success"
+
+    def _routing_changed_on_server(self, driver):
+        """Fetch the notification again in the background (the edited page stays as it is) and
+        compare its saved routing with the fingerprint the changes were planned against."""
+        if not self.planned_fingerprint:
+            return False
+        try:
+            html = driver.execute_async_script("""
+                var done = arguments[arguments.length - 1];
+                fetch(window.location.href, {credentials: 'same-origin', cache: 'no-store'})
+                    .then(function (response) { return response.ok ? response.text() : null; })
+                    .then(done, function () { done(null); });
+            """)
+        except Exception as e:
+            print(f"Could not re-check the notification before saving: {e}")
+            return False
+        if not html:
+            return False
+        from gf_parser import parse_notification_page
+        saved = parse_notification_page(html, driver.current_url)
+        if saved.submit is None:
+            return False  # Not the edit page (e.g. logged out); the save itself will show what is wrong
+        return routing_fingerprint(saved.routing) != self.planned_fingerprint
+
+    def _wait_for_page_reload(self, driver, old_element, timeout=10):
+        """Wait until a submit has replaced the page (old element goes stale) and the new page is loaded."""
+        start = time.perf_counter()
+        try:
+            self._wait(driver, 'save', timeout).until(EC.staleness_of(old_element))
+            self._wait(driver, 'save_ready', timeout).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
+            self.metrics.page_loaded('notification_save', time.perf_counter() - start)
+        except TimeoutException:
+            print("Page did not reload after save within the timeout, proceeding anyway")
+        if self.recorder:
+            self.recorder.checkpoint(driver, driver.current_url)
+
+    def _find_validation_errors(self, driver):
+        """Return the text of any Gravity Forms / WordPress error notices on the page."""
+        try:
+            messages = driver.execute_script("""
+                var nodes = document.querySelectorAll(
+                    '.gform_validation_error, .gform-settings-validation__error, ' +
+                    '.notice-error, div.error, .gform-alert--error');
+                return Array.prototype.map.call(nodes, function (n) { return n.innerText.trim(); });
+            """)
+        except Exception:
+            return []
+        return [m for m in (messages or []) if m]
+
+    def _notifications_url(self, form_id):
+        return f"{self.wp_url.rstrip('/')}/wp/wp-admin/admin.php?page=gf_edit_forms&view=settings&subview=notification&id={form_id}"
+
+    def _list_notifications(self, driver, wait, form_id, navigate=True):
+        """Open a form's notification list and return [{'name', 'href', 'nid'}] for each notification.
+        Pass navigate=False if the list page is already loaded."""
+        if navigate:
+            driver.get(self._notifications_url(form_id))
+        try:
+            wait.until(EC.presence_of_element_located((By.LINK_TEXT, "Notifications")))
+        except TimeoutException:
+            if self.session_broker.is_login_url(driver.current_url):
+                raise SessionExpired(f"redirected to login page {driver.current_url}")
+            raise
+        links = driver.execute_script("""
+            return Array.prototype.map.call(
+                document.querySelectorAll("a[href*='nid='] strong"),
+                function (strong) {
+                    var link = strong.closest('a');
+                    return {name: strong.innerText.trim(), href: link.href};
+                });
+        """) or []
+        notifications = []
+        seen = set()
+        for link in links:
+            nid_match = re.search(r'[?&]nid=([^&#]+)', link['href'])
+            if not nid_match or nid_match.group(1) in seen:
+                continue
+            seen.add(nid_match.group(1))
+            notifications.append({'name': link['name'], 'href': link['href'], 'nid': nid_match.group(1)})
+        return notifications
+
+    def _open_notification(self, driver, wait, href, ensure_routing=True):
+        """Open a notification's edit page, optionally switching it to Configure Routing.
+        Returns True if the notification is in routing mode."""
+        driver.get(href)
+        routing_radio = wait.until(EC.presence_of_element_located((By.ID, "gform_notification_to_type_routing")))
+        if routing_radio.is_selected():
+            return True
+        if not ensure_routing:
+            return False
+        routing_radio.click()
+        wait.until(EC.presence_of_element_located((By.ID, "routing_email_0")))
+        return True
+
+    def _read_routing_rules(self, driver):
+        """Read every routing row on the open notification page in a single script call."""
+        return driver.execute_script("""
+            var rows = [];
+            var emails = document.querySelectorAll("input[id^='routing_email_']");
+            for (var i = 0; i < emails.length; i++) {
+                var index = emails[i].id.replace('routing_email_', '');
+                var field = document.getElementById('routing_field_id_' + index);
+                var operator = document.getElementById('routing_operator_' + index);
+                var value = document.getElementById('routing_value_' + index);
+                var option = field && field.selectedIndex >= 0 ? field.options[field.selectedIndex] : null;
+                rows.push({
+                    index: index,
+                    field_id: option ? option.value : '',
+                    field: option ? option.text.trim() : '',
+                    operator: operator ? operator.value : '',
+                    value: value ? value.value.trim() : '',
+                    email: emails[i].value.trim()
+                });
+            }
+            return rows;
+        """) or []
+
+    def _write_routing_rules(self, driver, wait, rules, Select):
+        """Make the open notification's routing table exactly match rules (same order)."""
+        rows = self._read_routing_rules(driver)
+        
+        # Add rows until there is one per rule
+        while len(rows) < len(rules):
+            self._add_routing_row(driver, wait)
+            rows = self._read_routing_rules(driver)
+        
+        # Remove surplus rows from the end (Gravity Forms always keeps one row)
+        while len(rows) > max(len(rules), 1):
+            delete_buttons = driver.find_elements(By.XPATH, "//a[contains(@onclick, 'DeleteRouting')]")
+            if not delete_buttons:
+                raise NoSuchElementException("Could not find the delete routing rule button")
+            row_count = len(rows)
+            driver.execute_script("arguments[0].click();", delete_buttons[-1])
+            wait.until(lambda d: len(self._read_routing_rules(d)) < row_count)
+            rows = self._read_routing_rules(driver)
+        
+        for row, rule in zip(rows, rules):
+            self._fill_routing_row(driver, row['index'], rule, Select)
+
+    def _fill_routing_row(self, driver, index, rule, Select):
+        """Set one routing row's field, operator, value and email."""
+        field_select = Select(driver.find_element(By.ID, f"routing_field_id_{index}"))
+        try:
+            if not rule['field_id']:
+                raise NoSuchElementException("No field id")
+            field_select.select_by_value(rule['field_id'])
+        except NoSuchElementException:
+            field_select.select_by_visible_text(rule['field'])
+        
+        operator_select = Select(driver.find_element(By.ID, f"routing_operator_{index}"))
+        try:
+            operator_select.select_by_value(rule['operator'] or "is")
+        except NoSuchElementException:
+            operator_select.select_by_visible_text(rule['operator'] or "is")
+        
+        # Changing the field can re-render the value input, so look it up afterwards
+        value_field = driver.find_element(By.ID, f"routing_value_{index}")
+        if value_field.tag_name.lower() == 'select':
+            value_select = Select(value_field)
+            try:
+                value_select.select_by_value(rule['value'])
+            except NoSuchElementException:
+                option_texts = [option.text.strip() for option in value_select.options]
+                value_select.select_by_visible_text(
+                    self._match_option_text(option_texts, rule['value'], rule['email']) or rule['value'])
+        else:
+            value_field.clear()
+            value_field.send_keys(rule['value'])
+        
+        email_field = driver.find_element(By.ID, f"routing_email_{index}")
+        email_field.clear()
+        email_field.send_keys(rule['email'])
+
+    def _save_notification(self, driver):
+        """Click the notification save button, wait for the reload and return any validation errors."""
+        save_btn = driver.find_element(By.XPATH, "//input[@type='submit' and (@value='Update Notification' or @value='Save Notification')]")
+        save_btn.click()
+        self._wait_for_page_reload(driver, save_btn)
+        return self._find_validation_errors(driver)
+
+    def export_routing(self, path):
+        """Write every active form's catalog notification routing (ADF/XML, Text, ...) to a JSON/NDJSON file."""
+        driver = self.driver
+        wait = self._wait(driver)
+        document = new_document(self.wp_url)
+        
+        forms = []
+        for form_info in self._list_active_forms(driver):
+            if form_info['id'] not in [f['id'] for f in forms]:
+                forms.append(form_info)
+        
+        failed_forms = []
+        rule_count = 0
+        for i, form_info in enumerate(forms, start=1):
+            print(f"Exporting form {i} of {len(forms)}: {form_info['title']} (ID: {form_info['id']})")
+            try:
+                for notification in self._list_notifications(driver, wait, form_info['id']):
+                    if notification['name'] not in [entry['name'] for entry in self.notification_catalog]:
+                        continue
+                    rules = []
+                    if self._open_notification(driver, wait, notification['href'], ensure_routing=False):
+                        rules = [r for r in self._read_routing_rules(driver) if r['email'] or r['value']]
+                    add_notification(document, form_info['id'], form_info['title'],
+                                     notification['nid'], notification['name'], rules)
+                    rule_count += len(rules)
+                    print(f"  ✓ {notification['name']}: {len(rules)} rules")
+            except Exception as e:
+                print(f"  ✗ Could not export form {form_info['id']}: {e}")
+                logger.error(f"Could not export form {form_info['id']}: {e}")
+                failed_forms.append(form_info)
+        
+        write_document(path, document)
+        print(f"\nExported {rule_count} rules from {len(document['forms'])} forms to {path}")
+        if failed_forms:
+            print(f"⚠️  {len(failed_forms)} forms could not be exported:")
+            for form_info in failed_forms:
+                print(f"  • {form_info['title']} (ID: {form_info['id']})")
+
+    def import_routing(self, path):
+        """Apply a routing document written by export_routing to this site.
+        Notifications are matched by notification id, then by name; unchanged ones are not saved."""
+        from selenium.webdriver.support.ui import Select
+        
+        document = read_document(path)
+        driver = self.driver
+        wait = self._wait(driver)
+        if document.get('site') and document['site'].rstrip('/') != self.wp_url.rstrip('/'):
+            print(f"Note: document was exported from {document['site']}, importing into {self.wp_url}")
+        
+        updated = unchanged = 0
+        failures = []
+        total_forms = len(document['forms'])
+        for i, form in enumerate(document['forms'], start=1):
+            print(f"Importing form {i} of {total_forms}: {form.get('title', '')} (ID: {form['form_id']})")
+            try:
+                notifications = self._list_notifications(driver, wait, form['form_id'])
+            except Exception as e:
+                print(f"  ✗ Could not open notifications for form {form['form_id']}: {e}")
+                failures.append((form['form_id'], "form not found"))
+                continue
+            by_id = {n['nid']: n for n in notifications}
+            by_name = {n['name']: n for n in notifications}
             
-        finally:
-            if self.driver:
+            for notification in form['notifications']:
+                name = notification['name']
+                if not notification['rules']:
+                    print(f"  - {name}: no rules in document, left as is")
+                    continue
+                target = by_id.get(notification.get('notification_id')) or by_name.get(name)
+                if not target:
+                    print(f"  ✗ {name}: notification not found on this form")
+                    failures.append((form['form_id'], f"{name} not found"))
+                    continue
+                try:
+                    self._open_notification(driver, wait, target['href'])
+                    # Blank rows are left out, as in the export
+                    current = [normalize_rule(r) for r in self._read_routing_rules(driver) if r['email'] or r['value']]
+                    if current == notification['rules']:
+                        print(f"  = {name}: already up to date")
+                        unchanged += 1
+                        continue
+                    self._write_routing_rules(driver, wait, notification['rules'], Select)
+                    errors = self._save_notification(driver)
+                    if errors:
+                        print(f"  ✗ {name}: rejected by Gravity Forms: {'; '.join(errors)}")
+                        failures.append((form['form_id'], f"{name} rejected"))
+                        continue
+                    print(f"  ✓ {name}: wrote {len(notification['rules'])} rules")
+                    updated += 1
+                except Exception as e:
+                    print(f"  ✗ {name}: {e}")
+                    logger.error(f"Could not import {name} for form {form['form_id']}: {e}")
+                    failures.append((form['form_id'], f"{name} failed"))
+        
+        print(f"\nImport complete: {updated} notifications updated, {unchanged} already up to date, {len(failures)} problems")
+        for form_id, problem in failures:
+            print(f"  • Form {form_id}: {problem}")
+
+    def close_browser(self):
+        self.latency.save()
+        if self.recorder and self.driver:
+            self.recorder.write(self.driver)
+        if self.driver and self.attached:
+            # Leave the shared Chrome and its logged-in tab for the next run; close only this run's extra tabs
+            try:
+                for handle in self.driver.window_handles:
+                    if handle not in self._attached_handles and handle != self._admin_handle:
+                        self.driver.switch_to.window(handle)
+                        self.driver.close()
+                if self._admin_handle:
+                    self.driver.switch_to.window(self._admin_handle)
+            except Exception:
+                pass
+            self.driver.service.stop()
+            print(f"\nLeft Chrome running on debugging port {self.attach_port} for the next run.")
+        elif self.driver:
+            if self.interactive:
                 input("\nPress Enter to close the browser and exit...")
-                self.driver.quit()
+            self.driver.quit()
+
+    def ensure_browser(self):
+        """Open and log in the browser unless this router still has a live one (service mode)."""
+        if self.driver is not None:
+            try:
+                self.driver.window_handles
+                return
+            except Exception:
+                print("The browser session is gone - opening a new one")
+                self.driver = None
+        self.setup_browser()
+
+    def sync(self, sheet_data=None):
+        """Read (unless given), check and apply the sheet. Returns False if stopped before changing anything."""
+        # Read data from Google Sheet
+        if sheet_data is None:
+            sheet_data = self.read_google_sheet()
+        if not sheet_data:
+            print("Error: Missing or empty values detected in the sheet. Please check your data and try again.")
+            logger.error("Aborting due to missing or empty values in the sheet.")
+            return False
+        
+        print(f"\nFound {len(sheet_data)} rows of data to process.")
+        
+        if not self.preflight(sheet_data):
+            return False
+        
+        if self.prune_rules and not self.confirm_prune():
+            return False
+        
+        self.last_sheet_data = sheet_data
+        self.apply_sheet(sheet_data)
+        return True
+
+    def apply_sheet(self, sheet_data):
+        """Apply already-checked rows to every active form (also used by watch mode for changed rows)."""
+        self.retry_scheduler = RetryScheduler()
+        self.last_failure = None
+        self.session_broker.forget_failed_login()  # A login that timed out in an earlier run may be done now
+        self.last_report = None
+        self.run_error = None
+        
+        # Only now that the sheet is known to be good, open Chrome and wait for the SSO login
+        self.ensure_browser()
+        
+        # Automate Gravity Forms notification routing rules
+        try:
+            if self.http_mode:
+                self.automate_over_http(sheet_data)
+            else:
+                self.automate_form_notifications(sheet_data)
+        finally:
+            self.progress.finish()
+            self.latency.save()
+            if self.recorder:
+                self.recorder.write(self.driver)
+            for line in self.latency.describe():
+                logger.info(f"Latency {line}")
+
+    def _retired_keys(self, key_for):
+        """Lower-cased (value, email) keys of rules to remove in watch mode: those of changed or
+        removed sheet rows that no current row still needs. key_for(row) gives a row's key."""
+        if not self.retired_rows:
+            return set()
+        return {key_for(row) for row in self.retired_rows} - {key_for(row) for row in self.full_sheet or []}
+
+    def run(self):
+        try:
+            if self.sync():
+                print("\nAutomation completed successfully!")
+        finally:
+            self.close_browser()
+            self.metrics.stop()
 
 if __name__ == "__main__":
-    # Prompt user for Google Sheet URL or ID
-    sheet_url = input("Enter the Google Sheet URL or ID: ").strip()
-    sheet_id = get_sheet_id_from_url(sheet_url)
-    # Prompt user for WordPress site URL
-    wp_url = input("Enter the WordPress site URL (e.g., https://yoursite.com): ").strip()
-    # Set headless=False for debugging, True for normal runs
-    router = LeadRouter(sheet_id=sheet_id, wp_url=wp_url, headless=False)
-    router.run() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Configure Gravity Forms notification routing from a Google Sheet.")
+    subparsers = parser.add_subparsers(dest="command")
+    parser.add_argument("--prune", action="store_true", help="Remove routing rules that are not in the sheet and compact the rest")
+    sync_parser = subparsers.add_parser("sync", help="Apply the Google Sheet to every active form (default)")
+    sync_parser.add_argument("--prune", action="store_true", default=argparse.SUPPRESS, help="Remove routing rules that are not in the sheet and compact the rest")
+    parser.add_argument("--dedupe", action="store_true", help="Keep only the first sheet row for each FEED ID / dealership name")
+    sync_parser.add_argument("--dedupe", action="store_true", default=argparse.SUPPRESS, help="Keep only the first sheet row for each FEED ID / dealership name")
+    parser.add_argument("--http", action="store_true", help="Read and save notifications with direct HTTP requests (browser only used to log in)")
+    sync_parser.add_argument("--http", action="store_true", default=argparse.SUPPRESS, help="Read and save notifications with direct HTTP requests (browser only used to log in)")
+    parser.add_argument("--attach", nargs="?", type=int, const=9222, metavar="PORT", help="Use the long-lived Chrome on this remote debugging port (default 9222), starting it if needed")
+    sync_parser.add_argument("--attach", nargs="?", type=int, const=9222, metavar="PORT", default=argparse.SUPPRESS, help="Use the long-lived Chrome on this remote debugging port (default 9222), starting it if needed")
+    parser.add_argument("--record", metavar="DIR", help="Record the run's admin traffic (HAR) and page snapshots to DIR for offline replay")
+    sync_parser.add_argument("--record", metavar="DIR", default=argparse.SUPPRESS, help="Record the run's admin traffic (HAR) and page snapshots to DIR for offline replay")
+    export_parser = subparsers.add_parser("export", help="Save all forms' notification routing to a JSON/NDJSON file")
+    export_parser.add_argument("path", help="Output file (.json, or .ndjson for one line per notification)")
+    import_parser = subparsers.add_parser("import", help="Apply notification routing from an exported JSON/NDJSON file")
+    import_parser.add_argument("path", help="File written by the export command")
+    watch_parser = subparsers.add_parser("watch", help="Apply the sheet, then keep applying its edits as they happen")
+    for option, help_text in (("--prune", "Remove routing rules that are not in the sheet and compact the rest"),
+                              ("--dedupe", "Keep only the first sheet row for each FEED ID / dealership name"),
+                              ("--http", "Read and save notifications with direct HTTP requests")):
+        watch_parser.add_argument(option, action="store_true", default=argparse.SUPPRESS, help=help_text)
+    watch_parser.add_argument("--attach", nargs="?", type=int, const=9222, metavar="PORT", default=argparse.SUPPRESS, help="Use the long-lived Chrome on this remote debugging port")
+    serve_parser = subparsers.add_parser("serve", help="Run as a service that keeps sessions warm and runs queued sync jobs")
+    serve_parser.add_argument("--port", type=int, help="API port on 127.0.0.1 (default 8765, LEADROUTER_SERVICE_PORT)")
+    submit_parser = subparsers.add_parser("submit", help="Queue a sync job on a running service")
+    submit_parser.add_argument("site", help="WordPress site URL")
+    submit_parser.add_argument("sheet", help="Google Sheet URL or ID")
+    submit_parser.add_argument("--port", type=int, help="Service port (default 8765, LEADROUTER_SERVICE_PORT)")
+    submit_parser.add_argument("--wait", action="store_true", help="Poll until the job has finished")
+    submit_parser.add_argument("--location-notification", action="append", default=[], metavar="NAME", help="Also configure this notification on location-based forms (repeatable)")
+    for option, help_text in (("--prune", "Remove routing rules that are not in the sheet"),
+                              ("--dedupe", "Keep only the first row per FEED ID / dealership name"),
+                              ("--http", "Save notifications with direct HTTP requests")):
+        submit_parser.add_argument(option, action="store_true", default=argparse.SUPPRESS, help=help_text)
+    args = parser.parse_args()
+    
+    if args.command == "serve":
+        from service import SyncService
+        
+        def make_router(site, metrics):
+            router = LeadRouter(sheet_id=None, wp_url=site, headless=False, metrics=metrics)
+            if args.attach:
+                router.attach_port = args.attach
+            return router
+        
+        SyncService(make_router, get_sheet_id_from_url, port=args.port).serve_forever()
+    elif args.command == "submit":
+        from service import submit_job
+        options = {'prune': args.prune, 'dedupe': args.dedupe, 'http': args.http,
+                   'location_notifications': {name: True for name in args.location_notification}}
+        job = submit_job(args.site, args.sheet, options, port=args.port, wait=args.wait)
+        sys.exit(1 if job['status'] == 'failed' else 0)
+    elif args.command in ("export", "import"):
+        wp_url = input("Enter the WordPress site URL (e.g., https://yoursite.com): ").strip()
+        router = LeadRouter(sheet_id=None, wp_url=wp_url, headless=False)
+        if args.attach:
+            router.attach_port = args.attach
+        if not router.preflight():
+            sys.exit(1)
+        try:
+            router.setup_browser()
+            if args.command == "export":
+                router.export_routing(args.path)
+            else:
+                router.import_routing(args.path)
+        finally:
+            router.close_browser()
+    else:
+        # Prompt user for Google Sheet URL or ID
+        sheet_url = input("Enter the Google Sheet URL or ID: ").strip()
+        sheet_id = get_sheet_id_from_url(sheet_url)
+        # Prompt user for WordPress site URL
+        wp_url = input("Enter the WordPress site URL (e.g., https://yoursite.com): ").strip()
+        # Set headless=False for debugging, True for normal runs
+        router = LeadRouter(sheet_id=sheet_id, wp_url=wp_url, headless=False)
+        if args.prune:
+            router.prune_rules = True
+        if args.dedupe:
+            router.dedupe_rows = True
+        if args.http:
+            router.http_mode = True
+        if args.attach:
+            router.attach_port = args.attach
+        if args.record:
+            router.record_dir = args.record
+        if args.command == "watch":
+            from sheet_watch import SheetWatcher
+            try:
+                SheetWatcher(router).run()
+            except KeyboardInterrupt:
+                print("\nStopped watching.")
+            finally:
+                router.close_browser()
+                router.metrics.stop()
+        else:
+            router.run()
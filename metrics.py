@@ -0,0 +1,264 @@
+"""
+Prometheus/OpenMetrics metrics for scheduled and fleet runs.
+
+Off by default. Set one (or both) of these in .env:
+    LEADROUTER_METRICS_PORT=9464              serve /metrics on 127.0.0.1:9464
+    LEADROUTER_METRICS_TEXTFILE=/var/lib/node_exporter/leadrouter.prom
+                                              rewrite a textfile after every form
+                                              (for node_exporter's textfile collector)
+
+Every series carries a "site" label so several runs can be scraped side by side.
+Service mode keeps one registry for all its sites (see for_site), so one
+endpoint and one textfile cover every site.
+Only the standard library is used; the text exposition format is written directly.
+"""
+
+import copy
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from env_config import env_int
+
+COMMAND_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PAGE_LOAD_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Family:
+    """One metric name with its labelled series."""
+
+    def __init__(self, name, kind, help_text, buckets=None):
+        self.name = name
+        self.kind = kind  # counter, gauge or histogram
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # tuple of (label, value) pairs -> value or histogram state
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help_text}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for labels, value in sorted(self.series.items()):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                bucket_labels = labels + (("le", _format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+
+
+class RunMetrics:
+    """Counters, gauges and histograms for one Lead Router process."""
+
+    def __init__(self, site, port=0, textfile=None):
+        self.site = urlparse(site).netloc or site or "unknown"
+        self.port = port
+        self.textfile = textfile
+        self.enabled = bool(port or textfile)
+        self._lock = threading.Lock()
+        self._server = None
+        self._shared = False  # True for for_site() views: the registry's owner starts and stops the endpoint
+        self._families = {}
+        self._define("leadrouter_forms_processed_total", "counter", "Forms finished, by outcome")
+        self._define("leadrouter_forms_in_flight", "gauge", "Forms started but not finished yet")
+        self._define("leadrouter_rules_written_total", "counter", "Routing rules added or removed")
+        self._define("leadrouter_retries_total", "counter", "Form retries scheduled, by failure class")
+        self._define("leadrouter_errors_total", "counter", "Form failures, by failure class")
+        self._define("leadrouter_browser_restarts_total", "counter", "Browser sessions recycled")
+        self._define("leadrouter_webdriver_command_seconds", "histogram",
+                     "WebDriver command latency", COMMAND_BUCKETS)
+        self._define("leadrouter_page_load_seconds", "histogram",
+                     "Page load latency, by page type", PAGE_LOAD_BUCKETS)
+        self._define("leadrouter_last_form_timestamp_seconds", "gauge",
+                     "Unix time the last form finished")
+
+    @classmethod
+    def from_env(cls, site):
+        return cls(site, port=env_int('LEADROUTER_METRICS_PORT', 0),
+                   textfile=os.getenv('LEADROUTER_METRICS_TEXTFILE') or None)
+
+    def for_site(self, site):
+        """A view of this registry that records under another site label. Views share the
+        series, endpoint and textfile; only the owner starts and stops the endpoint."""
+        view = copy.copy(self)
+        view.site = urlparse(site).netloc or site or "unknown"
+        view._shared = True
+        view._server = None
+        return view
+
+    def _define(self, name, kind, help_text, buckets=None):
+        self._families[name] = _Family(name, kind, help_text, buckets)
+
+    def _labels(self, **labels):
+        return (("site", self.site),) + tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = self._labels(**labels)
+        with self._lock:
+            series = self._families[name].series
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._families[name].series[self._labels(**labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        family = self._families[name]
+        key = self._labels(**labels)
+        with self._lock:
+            counts, total, count = family.series.get(key) or ([0] * (len(family.buckets) + 1), 0.0, 0)
+            for i, bound in enumerate(family.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            family.series[key] = (counts, total + seconds, count + 1)
+
+    # Run events
+
+    def form_started(self):
+        self.inc("leadrouter_forms_in_flight", 1)
+
+    def form_finished(self, status, error_class=None, in_flight=True):
+        """status is success, skipped, failed or retrying (an attempt that will be retried).
+        in_flight is False for outcomes learned after the form's attempt ended."""
+        if in_flight:
+            self.inc("leadrouter_forms_in_flight", -1)
+        if status == "retrying":
+            self.inc("leadrouter_retries_total", error_class=error_class or "unknown")
+        else:
+            self.inc("leadrouter_forms_processed_total", status=status)
+            self.set("leadrouter_last_form_timestamp_seconds", time.time())
+        if error_class:
+            self.inc("leadrouter_errors_total", error_class=error_class)
+        self.write_textfile()
+
+    def rules_written(self, stats):
+        if stats.get('added'):
+            self.inc("leadrouter_rules_written_total", stats['added'], action="added")
+        if stats.get('removed'):
+            self.inc("leadrouter_rules_written_total", stats['removed'], action="removed")
+
+    def browser_restarted(self):
+        self.inc("leadrouter_browser_restarts_total")
+
+    def page_loaded(self, page, seconds):
+        self.observe("leadrouter_page_load_seconds", seconds, page=page)
+
+    def instrument(self, driver):
+        """Time every WebDriver command; navigations also count as page loads."""
+        if not self.enabled:
+            return driver
+        execute = driver.execute
+
+        def timed_execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.observe("leadrouter_webdriver_command_seconds", elapsed, command=driver_command)
+                if driver_command == "get" and params:
+                    self.page_loaded(page_type(params.get('url', '')), elapsed)
+
+        driver.execute = timed_execute
+        return driver
+
+    # Exposition
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for family in self._families.values():
+                family.render(lines)
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """Start the HTTP endpoint if a port is configured."""
+        if not self.port or self._server or self._shared:
+            return
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the console
+
+        try:
+            self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        except OSError as e:
+            print(f"Could not start metrics endpoint on port {self.port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://127.0.0.1:{self.port}/metrics")
+
+    def stop(self):
+        self.write_textfile()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def write_textfile(self):
+        """Atomically rewrite the textfile so a collector never reads half a file."""
+        if not self.textfile:
+            return
+        tmp_path = f"{self.textfile}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp_path, self.textfile)
+        except OSError as e:
+            print(f"Could not write metrics textfile {self.textfile}: {e}")
+
+
+def page_type(url):
+    """Coarse page label for page-load metrics (keeps label cardinality low)."""
+    if 'subview=notification' in url:
+        return 'notification_edit' if 'nid=' in url else 'notification_list'
+    if 'page=gf_edit_forms' in url:
+        return 'forms_list'
+    if '/wp-admin' in url:
+        return 'wp_admin'
+    return 'other'
@@ -0,0 +1,64 @@
+"""
+Which Gravity Forms notifications Lead Router manages, and which sheet column
+holds the routing email for each.
+
+The default catalog covers the ADF/XML and Text notifications. To manage a
+different set, point LEADROUTER_NOTIFICATIONS at a JSON file such as:
+
+    {"notifications": [
+        {"name": "ADF/XML Formatted Notification", "email_column": "ADF Email"},
+        {"name": "Text Formatted Notification", "email_column": "Text Email",
+         "ask_for_location_forms": true},
+        {"name": "Service Notification", "email_column": "Service Email"}
+    ]}
+
+"ask_for_location_forms" makes the run ask once whether that notification
+should be configured on location-based forms.
+"""
+
+import json
+import os
+
+DEFAULT_NOTIFICATION_CATALOG = [
+    {"name": "ADF/XML Formatted Notification", "email_column": "ADF Email"},
+    {"name": "Text Formatted Notification", "email_column": "Text Email", "ask_for_location_forms": True},
+]
+
+
+def load_notification_catalog(path=None):
+    """Return the list of managed notifications, from path/LEADROUTER_NOTIFICATIONS or the default."""
+    path = path or os.getenv('LEADROUTER_NOTIFICATIONS')
+    if not path:
+        entries = DEFAULT_NOTIFICATION_CATALOG
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('notifications', []) if isinstance(data, dict) else data
+
+    catalog = []
+    names = set()
+    for entry in entries:
+        name = str(entry.get('name', '')).strip()
+        email_column = str(entry.get('email_column', '')).strip()
+        if not name or not email_column:
+            raise ValueError(f"Notification catalog entry needs 'name' and 'email_column': {entry}")
+        if name in names:
+            raise ValueError(f"Notification '{name}' is listed twice in the catalog")
+        names.add(name)
+        catalog.append({
+            'name': name,
+            'email_column': email_column,
+            'ask_for_location_forms': bool(entry.get('ask_for_location_forms', False)),
+        })
+    if not catalog:
+        raise ValueError("Notification catalog is empty")
+    return catalog
+
+
+def email_columns(catalog):
+    """Sheet columns referenced by the catalog, in order, without repeats."""
+    columns = []
+    for entry in catalog:
+        if entry['email_column'] not in columns:
+            columns.append(entry['email_column'])
+    return columns
@@ -0,0 +1,147 @@
+"""
+Pre-flight checks run before Chrome is opened: the sheet rows are checked for
+values Gravity Forms would reject, and the WordPress site is checked for
+reachability and the /wp/wp-admin/ path. Problems are reported all at once so
+they can be fixed before spending a login cycle.
+"""
+
+import re
+import urllib.error
+import urllib.request
+
+CHANGEME_EMAIL = "CHANGEME@CHANGEME.COM"
+EMAIL_PATTERN = re.compile(r"^[^@\s,;]+@[^@\s,;]+\.[^@\s,;]+$")
+
+
+def _numbered(rows, first_row, row_numbers):
+    """(sheet row number, row) pairs: consecutive from first_row, or the given numbers
+    when rows are a slice of the sheet (one site's rows of a multi-site sheet)."""
+    return zip(row_numbers, rows) if row_numbers is not None else enumerate(rows, start=first_row)
+
+
+def check_sheet_rows(rows, email_cols, key_cols, first_row=2, row_numbers=None):
+    """Check extracted sheet rows; returns (errors, warnings) as lists of messages.
+
+    email_cols   columns holding routing emails (syntax and CHANGEME format)
+    key_cols     columns that together identify a dealer, for duplicate rows
+    first_row    sheet row number of rows[0] (row 1 is the header)
+    row_numbers  sheet row number of each row, instead of first_row
+    """
+    errors = []
+    warnings = []
+    seen = {}
+    for row_number, row in _numbered(rows, first_row, row_numbers):
+        for col in email_cols:
+            value = str(row.get(col, '')).strip()
+            if not value:
+                continue  # Reported by the missing-value check
+            for email in (part.strip() for part in value.split(',')):
+                if 'changeme' in email.lower():
+                    if email != CHANGEME_EMAIL:
+                        errors.append(f"Row {row_number}, Column '{col}': '{email}' must be written exactly as {CHANGEME_EMAIL}")
+                elif not EMAIL_PATTERN.match(email):
+                    errors.append(f"Row {row_number}, Column '{col}': '{email}' is not a valid email address")
+
+        key = tuple(str(row.get(col, '')).strip().lower() for col in key_cols + email_cols)
+        if key in seen:
+            warnings.append(f"Row {row_number} repeats row {seen[key]} (only one routing rule will be written)")
+        else:
+            seen[key] = row_number
+    return errors, warnings
+
+
+def normalize_name(name):
+    """Dealership name key: case, punctuation and spacing differences are ignored."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(name).lower()).split())
+
+
+def _normalize_value(value):
+    return str(value).strip().lower()
+
+
+def _index(numbered, column, normalize, group_col=None):
+    """Hash index: normalized column value (within its group_col value) -> row numbers that have it."""
+    index = {}
+    for row_number, row in numbered:
+        key = normalize(row.get(column, ''))
+        if key:
+            group = _normalize_value(row.get(group_col, '')) if group_col else ''
+            index.setdefault((group, key), []).append(row_number)
+    return index
+
+
+def find_conflicts(rows, id_col, name_col, email_cols, first_row=2, row_numbers=None, group_col=None):
+    """Find rows that disagree about the same dealer.
+
+    Rows are indexed by id_col (FEED ID), normalized name_col (DEALERSHIP NAME)
+    and every email. With group_col (FORM TAG) a dealer may have one row per
+    group. Returns (conflicts, shared_emails, later_rows):
+      conflicts      messages for a FEED ID or name whose rows differ
+      shared_emails  {email: row numbers} for emails used by more than one dealer
+      later_rows     row numbers that repeat an earlier row's FEED ID or name
+                     (dropped by dedupe, so the first row wins)
+    """
+    by_number = dict(_numbered(rows, first_row, row_numbers))
+
+    def signature(row_number):
+        row = by_number[row_number]
+        return (_normalize_value(row.get(id_col, '')), normalize_name(row.get(name_col, ''))) + \
+            tuple(_normalize_value(row.get(col, '')) for col in email_cols)
+
+    conflicts = []
+    later_rows = set()
+    for column, normalize in ((id_col, _normalize_value), (name_col, normalize_name)):
+        for numbers in _index(by_number.items(), column, normalize, group_col).values():
+            if len(numbers) < 2:
+                continue
+            later_rows.update(numbers[1:])
+            if len({signature(n) for n in numbers}) > 1:
+                differing = [col for i, col in enumerate([id_col, name_col] + list(email_cols))
+                             if len({signature(n)[i] for n in numbers}) > 1]
+                rows_text = ", ".join(str(n) for n in numbers)
+                conflicts.append(f"{column} '{by_number[numbers[0]].get(column, '')}' is on rows {rows_text} "
+                                 f"with different {', '.join(differing)}")
+
+    shared_emails = {}
+    for col in email_cols:
+        for (_, email), numbers in _index(by_number.items(), col, _normalize_value).items():
+            dealers = {_normalize_value(by_number[n].get(id_col, '')) for n in numbers}
+            if len(dealers) > 1 and email != CHANGEME_EMAIL.lower():
+                shared_emails.setdefault(email, set()).update(numbers)
+    return conflicts, shared_emails, later_rows
+
+
+def dedupe_rows(rows, later_rows, first_row=2, row_numbers=None):
+    """Drop the rows listed in later_rows, keeping sheet order."""
+    return [row for row_number, row in _numbered(rows, first_row, row_numbers) if row_number not in later_rows]
+
+
+def check_site(wp_url, timeout=10):
+    """Check the WordPress site answers and has a /wp/wp-admin/ path; returns a list of errors."""
+    if not re.match(r'^https?://[^/\s]+', wp_url or ''):
+        return [f"WordPress URL '{wp_url}' must start with http:// or https://"]
+
+    base = wp_url.rstrip('/')
+    errors = []
+    for url, what in ((base + '/', "site"), (base + '/wp/wp-admin/', "wp-admin path")):
+        status, detail = _probe(url, timeout)
+        if status is None:
+            errors.append(f"Could not reach the {what} at {url}: {detail}")
+            break  # Nothing else will answer either
+        if status == 404:
+            errors.append(f"The {what} {url} returned 404 - check the site URL (wp-admin is expected under /wp/)")
+        elif status >= 500:
+            errors.append(f"The {what} {url} returned HTTP {status}")
+    return errors
+
+
+def _probe(url, timeout):
+    """Return (HTTP status, detail). 401/403 count as reachable: the login or WAF answered."""
+    request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0 (lead-router pre-flight)'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.geturl()
+    except urllib.error.HTTPError as e:
+        return e.code, str(e)
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        return None, getattr(e, 'reason', e)
@@ -0,0 +1,218 @@
+"""
+Live progress for long runs: forms/min, rules/min, rolling time per form, ETA
+and the slowest phase.
+
+On a terminal the figures stay on one status line at the bottom, redrawn at
+most every LEADROUTER_PROGRESS_REFRESH seconds (default 1) below the normal
+output. Every LEADROUTER_PROGRESS_LOG_INTERVAL seconds (default 60) and at the
+end the same figures are also logged as a "Progress" record, with the numbers
+as fields in the JSON log (see log_setup), for unattended runs.
+LEADROUTER_PROGRESS=0 turns the status line off.
+
+Phases are timed exclusively: a save inside a notification edit counts as
+save time only, so "slowest phase" shows where the time actually goes.
+"""
+
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from env_config import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class _StatusStdout:
+    """Stands in for sys.stdout while a status line is shown: the line is cleared
+    before anything else is written and drawn again after each complete line."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.RLock()
+        self.status = ''
+        self._shown = False
+
+    def write(self, text):
+        with self._lock:
+            if self._shown:
+                self._stream.write('\r\x1b[2K')
+                self._shown = False
+            written = self._stream.write(text)
+            if self.status and text.endswith('\n'):
+                self._draw()
+            return written
+
+    def set_status(self, status):
+        with self._lock:
+            self.status = status
+            if self._shown:
+                self._stream.write('\r\x1b[2K')
+            self._draw()
+            self._stream.flush()
+
+    def _draw(self):
+        width = shutil.get_terminal_size((120, 20)).columns - 1
+        self._stream.write(self.status[:width])
+        self._shown = True
+
+    def clear(self):
+        with self._lock:
+            if self._shown:
+                self._stream.write('\r\x1b[2K')
+                self._stream.flush()
+            self.status = ''
+            self._shown = False
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class RunProgress:
+    """Progress of one sync run; start() it once the number of forms is known."""
+
+    def __init__(self):
+        self.window = env_int('LEADROUTER_PROGRESS_WINDOW', 20)  # Forms in the rolling average
+        self.refresh = env_float('LEADROUTER_PROGRESS_REFRESH', 1)
+        self.log_interval = env_float('LEADROUTER_PROGRESS_LOG_INTERVAL', 60)
+        self.total = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._console = None
+        self._reset()
+
+    def _reset(self):
+        self.started = time.monotonic()
+        self.forms_done = 0
+        self.rules_done = 0
+        self._done_ids = set()
+        self._last_done = self.started
+        self._form_seconds = deque(maxlen=self.window)
+        self._phases = {}  # name -> deque of recent exclusive durations
+        self._last_draw = self._last_log = 0.0
+
+    def start(self, total):
+        """Begin a run of total forms (also resets the figures of any previous run)."""
+        with self._lock:
+            self.total = total
+            self._reset()
+            self._last_log = self.started
+        interactive = (sys.stdout.isatty() and env_flag('LEADROUTER_PROGRESS', True)
+                       and os.getenv('LEADROUTER_LOG_FORMAT', '').lower() != 'json')
+        if interactive and self._console is None:
+            self._console = _StatusStdout(sys.stdout)
+            sys.stdout = self._console
+            from log_setup import redirect_console
+            redirect_console(self._console)
+
+    def finish(self):
+        """Log the final figures and remove the status line."""
+        if self.total:
+            self._log()
+            self.total = 0
+        if self._console is not None:
+            self._console.clear()
+            sys.stdout = self._console._stream
+            from log_setup import redirect_console
+            redirect_console(sys.stdout)
+            self._console = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase of the work; time in nested phases is not counted twice."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        now = time.monotonic()
+        if stack:
+            stack[-1][2] += now - stack[-1][1]  # Pause the enclosing phase
+        entry = [name, now, 0.0]
+        stack.append(entry)
+        try:
+            yield
+        finally:
+            now = time.monotonic()
+            stack.pop()
+            with self._lock:
+                self._phases.setdefault(name, deque(maxlen=50)).append(entry[2] + now - entry[1])
+            if stack:
+                stack[-1][1] = now  # Resume the enclosing phase
+
+    def rules_written(self, stats):
+        with self._lock:
+            self.rules_done += stats.get('added', 0) + stats.get('removed', 0)
+        self.update()
+
+    def form_done(self, form_id, timed=True):
+        """A form reached a final status (success, skipped or failed). Forms finished without
+        being worked on (timed=False, e.g. already up to date) count as done but are left out
+        of the average time per form."""
+        now = time.monotonic()
+        with self._lock:
+            if form_id in self._done_ids:
+                return
+            self._done_ids.add(form_id)
+            self.forms_done += 1
+            if timed:
+                self._form_seconds.append(now - self._last_done)
+            self._last_done = now
+        self.update()
+
+    def snapshot(self):
+        """The current figures as a dict (also the fields of the logged record)."""
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-6)
+            average = sum(self._form_seconds) / len(self._form_seconds) if self._form_seconds else None
+            phases = {name: sum(d) / len(d) for name, d in self._phases.items() if d}
+            remaining = max(self.total - self.forms_done, 0)
+            slowest = max(phases, key=phases.get) if phases else None
+            return {
+                'forms_done': self.forms_done,
+                'forms_total': self.total,
+                'rules_done': self.rules_done,
+                'elapsed_s': round(elapsed, 1),
+                'forms_per_min': round(self.forms_done / elapsed * 60, 2),
+                'rules_per_min': round(self.rules_done / elapsed * 60, 1),
+                'avg_form_s': round(average, 2) if average is not None else None,
+                'eta_s': round(remaining * average) if average is not None else None,
+                'slowest_phase': slowest,
+                'slowest_phase_s': round(phases[slowest], 2) if slowest else None,
+            }
+
+    def describe(self, figures=None):
+        f = figures or self.snapshot()
+        percent = f"{f['forms_done'] / f['forms_total']:.0%}" if f['forms_total'] else "-"
+        line = (f"{f['forms_done']}/{f['forms_total']} forms ({percent}) | {f['forms_per_min']:.1f} forms/min"
+                f" | {f['rules_per_min']:.0f} rules/min")
+        if f['avg_form_s'] is not None:
+            line += f" | {f['avg_form_s']:.1f}s/form (last {len(self._form_seconds)}) | ETA {_duration(f['eta_s'])}"
+        if f['slowest_phase']:
+            line += f" | slowest: {f['slowest_phase']} {f['slowest_phase_s']:.1f}s"
+        return line
+
+    def update(self):
+        """Redraw the status line and log a record when they are due."""
+        now = time.monotonic()
+        if self._console is not None and now - self._last_draw >= self.refresh:
+            self._last_draw = now
+            self._console.set_status("⏱  " + self.describe())
+        if now - self._last_log >= self.log_interval:
+            self._log()
+
+    def _log(self):
+        self._last_log = time.monotonic()
+        figures = self.snapshot()
+        logger.info(f"Progress {self.describe(figures)}", extra={'progress': figures})
@@ -0,0 +1,119 @@
+"""
+Portable routing documents: every form's notification routing rules in one
+JSON (or NDJSON) file, used for backups and for re-applying routing in bulk.
+
+JSON layout:
+    {
+      "format": "lead-router-routing",
+      "version": 1,
+      "site": "https://example.com",
+      "exported_at": "2024-01-01T12:00:00Z",
+      "forms": [
+        {"form_id": "12", "title": "Contact Us", "notifications": [
+          {"notification_id": "5f0c...", "name": "ADF/XML Formatted Notification",
+           "rules": [{"field_id": "7", "field": "Dealer ID", "operator": "is",
+                      "value": "1234", "email": "leads@example.com"}]}
+        ]}
+      ]
+    }
+
+NDJSON layout: a header line ({"format", "version", "site", "exported_at"})
+followed by one line per notification with "form_id" and "title" added.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+
+DOCUMENT_FORMAT = "lead-router-routing"
+DOCUMENT_VERSION = 1
+RULE_KEYS = ("field_id", "field", "operator", "value", "email")
+
+
+def normalize_rule(rule):
+    """Return a rule with exactly the document keys, as stripped strings."""
+    return {key: str(rule.get(key) or '').strip() for key in RULE_KEYS}
+
+
+def routing_fingerprint(rules):
+    """Short hash of a notification's routing, for spotting changes made by someone else.
+    Blank rows are ignored (the editor shows one even when nothing is saved), and so is
+    letter case, like everywhere else rules are compared."""
+    keys = [(str(rule.get('field_id') or ''), (rule.get('operator') or 'is').lower(),
+             str(rule.get('value') or '').strip().lower(), str(rule.get('email') or '').strip().lower())
+            for rule in rules]
+    keys = [key for key in keys if key[2] or key[3]]
+    return hashlib.sha1(json.dumps(keys).encode('utf-8')).hexdigest()[:16]
+
+
+def new_document(site):
+    return {
+        'format': DOCUMENT_FORMAT,
+        'version': DOCUMENT_VERSION,
+        'site': site,
+        'exported_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'forms': [],
+    }
+
+
+def add_notification(document, form_id, title, notification_id, name, rules):
+    """Append one notification's rules, grouping by form."""
+    for form in document['forms']:
+        if form['form_id'] == str(form_id):
+            break
+    else:
+        form = {'form_id': str(form_id), 'title': title, 'notifications': []}
+        document['forms'].append(form)
+    form['notifications'].append({
+        'notification_id': notification_id,
+        'name': name,
+        'rules': [normalize_rule(rule) for rule in rules],
+    })
+
+
+def is_ndjson(path):
+    return str(path).lower().endswith(('.ndjson', '.jsonl'))
+
+
+def write_document(path, document):
+    """Write a routing document as JSON, or NDJSON if the path ends in .ndjson/.jsonl."""
+    with open(path, 'w', encoding='utf-8') as f:
+        if not is_ndjson(path):
+            json.dump(document, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+            return
+        header = {key: document[key] for key in ('format', 'version', 'site', 'exported_at')}
+        f.write(json.dumps(header, ensure_ascii=False) + '\n')
+        for form in document['forms']:
+            for notification in form['notifications']:
+                line = {'form_id': form['form_id'], 'title': form['title']}
+                line.update(notification)
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+
+def read_document(path):
+    """Read a JSON or NDJSON routing document. Raises ValueError if it is not one."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if is_ndjson(path):
+            lines = [json.loads(line) for line in f if line.strip()]
+            if not lines or lines[0].get('format') != DOCUMENT_FORMAT:
+                raise ValueError(f"{path} is not a {DOCUMENT_FORMAT} document")
+            header = lines[0]
+            document = new_document(header.get('site'))
+            document.update({k: header[k] for k in ('version', 'exported_at') if k in header})
+            for line in lines[1:]:
+                add_notification(document, line['form_id'], line.get('title', ''),
+                                 line.get('notification_id'), line.get('name', ''),
+                                 line.get('rules', []))
+        else:
+            document = json.load(f)
+            if document.get('format') != DOCUMENT_FORMAT:
+                raise ValueError(f"{path} is not a {DOCUMENT_FORMAT} document")
+
+    if document.get('version', 0) > DOCUMENT_VERSION:
+        raise ValueError(f"{path} was written by a newer version (v{document['version']})")
+    for form in document['forms']:
+        form['form_id'] = str(form['form_id'])
+        for notification in form['notifications']:
+            notification['rules'] = [normalize_rule(rule) for rule in notification.get('rules', [])]
+    return document
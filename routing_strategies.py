@@ -0,0 +1,140 @@
+"""
+Routing strategies: how a notification's routing rules pick a form field and
+which sheet column supplies the rule value.
+
+Strategies are tried in registry order and the first one whose field exists on
+the notification wins, so location routing takes priority over Dealer ID
+routing. Extra strategies can be registered in code with
+register_routing_strategy() or listed in a JSON file named by
+LEADROUTER_ROUTING_STRATEGIES:
+
+    {"strategies": [
+        {"name": "department", "field_names": ["Department"],
+         "value_column": "DEPARTMENT", "priority": 0}
+    ]}
+"""
+
+import json
+import os
+
+
+class RoutingStrategy:
+    """One way of routing leads: a routing field on the form plus a sheet column.
+
+    field_names    exact field labels, in priority order
+    field_keyword  fallback: any field whose label contains this word
+    value_column   sheet column holding the rule value
+    choice_values  rule values are picked from the field's dropdown options
+    """
+
+    def __init__(self, name, field_names, value_column, field_keyword=None, choice_values=False):
+        self.name = name
+        self.field_names = list(field_names)
+        self.value_column = value_column
+        self.field_keyword = field_keyword.lower() if field_keyword else None
+        self.choice_values = choice_values
+        self._field_name_set = set(self.field_names)
+
+    def resolve_field(self, field_options):
+        """Return the field label to route on, or None if the form has no such field.
+
+        field_options is the list of routing field labels in page order.
+        """
+        option_set = set(field_options)
+        for name in self.field_names:
+            if name in option_set:
+                return name
+        if self.field_keyword:
+            for option in field_options:
+                if self.field_keyword in option.lower():
+                    return option
+        return None
+
+    def matches_field(self, label):
+        """True if an existing rule's field label belongs to this strategy."""
+        return label in self._field_name_set or bool(self.field_keyword and self.field_keyword in label.lower())
+
+    def rule_value(self, row):
+        return str(row[self.value_column]).strip()
+
+    def __repr__(self):
+        return f"RoutingStrategy({self.name!r})"
+
+
+LOCATION_STRATEGY = RoutingStrategy(
+    "location",
+    ["Choose A Location", "Location", "Dealership Location", "Store Location", "Dealer Location"],
+    "DEALERSHIP NAME",
+    field_keyword="location",
+    choice_values=True,
+)
+
+DEALER_ID_STRATEGY = RoutingStrategy(
+    "dealer-id",
+    ["Dealer ID", "Dealership ID", "Dealer", "ID"],
+    "FEED ID",
+)
+
+# Priority order: location fields take precedence over Dealer ID fields
+ROUTING_STRATEGIES = [LOCATION_STRATEGY, DEALER_ID_STRATEGY]
+
+
+def register_routing_strategy(strategy, priority=None):
+    """Add a strategy; priority is its index in the registry (default: lowest priority)."""
+    for existing in ROUTING_STRATEGIES:
+        if existing.name == strategy.name:
+            raise ValueError(f"Routing strategy '{strategy.name}' is already registered")
+    if priority is None:
+        ROUTING_STRATEGIES.append(strategy)
+    else:
+        ROUTING_STRATEGIES.insert(priority, strategy)
+    return strategy
+
+
+def load_custom_strategies(path=None):
+    """Register strategies from path/LEADROUTER_ROUTING_STRATEGIES, if set."""
+    path = path or os.getenv('LEADROUTER_ROUTING_STRATEGIES')
+    if not path:
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data.get('strategies', []) if isinstance(data, dict) else data
+    loaded = []
+    for entry in entries:
+        if not entry.get('name') or not entry.get('value_column'):
+            raise ValueError(f"Routing strategy needs 'name' and 'value_column': {entry}")
+        if not entry.get('field_names') and not entry.get('field_keyword'):
+            raise ValueError(f"Routing strategy '{entry['name']}' needs 'field_names' or 'field_keyword'")
+        strategy = RoutingStrategy(
+            entry['name'],
+            entry.get('field_names', []),
+            entry['value_column'],
+            field_keyword=entry.get('field_keyword'),
+            choice_values=bool(entry.get('choice_values', False)),
+        )
+        # Loading again (e.g. a second LeadRouter) replaces the earlier definition
+        ROUTING_STRATEGIES[:] = [s for s in ROUTING_STRATEGIES if s.name != strategy.name]
+        loaded.append(register_routing_strategy(strategy, entry.get('priority')))
+    return loaded
+
+
+def resolve_routing(field_options):
+    """Pick the first registered strategy whose field exists.
+
+    Returns (strategy, field_label), or (None, None) if no strategy applies.
+    """
+    field_options = list(field_options)
+    for strategy in ROUTING_STRATEGIES:
+        field_label = strategy.resolve_field(field_options)
+        if field_label:
+            return strategy, field_label
+    return None, None
+
+
+def value_columns():
+    """Sheet columns needed by the registered strategies, in registry order."""
+    columns = []
+    for strategy in ROUTING_STRATEGIES:
+        if strategy.value_column not in columns:
+            columns.append(strategy.value_column)
+    return columns
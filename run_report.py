@@ -0,0 +1,144 @@
+"""
+Structured run reports: one JSON file and one static HTML page per run, with
+per-form routing type, rule counts, duration, retries and failure class.
+"""
+
+import html
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+
+class RunReport:
+    """Collects per-form results during a run and writes them to disk."""
+
+    def __init__(self, site, report_dir=None):
+        self.site = site
+        self.report_dir = report_dir or os.getenv('LEADROUTER_REPORT_DIR', 'reports')
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.monotonic()
+        self.forms = {}  # form_id -> record
+        self._attempt_started = {}
+
+    def start_form(self, form_id, title):
+        """Start timing an attempt at a form (retries add to the same record)."""
+        record = self.forms.setdefault(form_id, {
+            'form_id': form_id,
+            'title': title,
+            'status': 'pending',
+            'routing_type': None,
+            'rules_added': 0,
+            'rules_kept': 0,
+            'rules_removed': 0,
+            'duration_s': 0.0,
+            'attempts': 0,
+            'retries': 0,
+            'error_class': None,
+            'notifications': {},
+        })
+        record['attempts'] += 1
+        self._attempt_started[form_id] = time.monotonic()
+        return record
+
+    def record_notification(self, form_id, name, result, stats=None):
+        """Store one notification's outcome; stats has routing_type/added/kept/removed."""
+        record = self.forms[form_id]
+        stats = dict(stats or {})
+        stats['result'] = result
+        record['notifications'][name] = stats
+        if stats.get('routing_type'):
+            record['routing_type'] = stats['routing_type']
+        record['rules_added'] = sum(n.get('added', 0) for n in record['notifications'].values())
+        record['rules_kept'] = sum(n.get('kept', 0) for n in record['notifications'].values())
+        record['rules_removed'] = sum(n.get('removed', 0) for n in record['notifications'].values())
+
+    def finish_form(self, form_id, status, error_class=None, retries=0):
+        """Close the current attempt: status is success, skipped, failed or retrying.
+        Returns False if no attempt was open (e.g. a deferred save rejected later)."""
+        record = self.forms[form_id]
+        started = self._attempt_started.pop(form_id, None)
+        if started is not None:
+            record['duration_s'] = round(record['duration_s'] + time.monotonic() - started, 3)
+        record['status'] = status
+        record['error_class'] = error_class
+        record['retries'] = retries
+        return started is not None
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started
+        counts = {}
+        for record in self.forms.values():
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+        done = counts.get('success', 0) + counts.get('skipped', 0)
+        return {
+            'site': self.site,
+            'started_at': self.started_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'duration_s': round(elapsed, 1),
+            'forms': len(self.forms),
+            'status_counts': counts,
+            'rules_added': sum(r['rules_added'] for r in self.forms.values()),
+            'rules_kept': sum(r['rules_kept'] for r in self.forms.values()),
+            'rules_removed': sum(r['rules_removed'] for r in self.forms.values()),
+            'forms_per_minute': round(done / (elapsed / 60), 2) if elapsed > 0 else 0,
+        }
+
+    def write(self):
+        """Write the JSON and HTML report files and return their paths."""
+        os.makedirs(self.report_dir, exist_ok=True)
+        host = re.sub(r'[^A-Za-z0-9.-]+', '_', urlparse(self.site).netloc or self.site or 'site')
+        stem = os.path.join(self.report_dir, f"run-{host}-{self.started_at.strftime('%Y%m%d-%H%M%S')}")
+        document = {'summary': self.summary(), 'forms': list(self.forms.values())}
+
+        json_path = stem + '.json'
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+
+        html_path = stem + '.html'
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(render_html(document))
+        return json_path, html_path
+
+
+def render_html(document):
+    """Static HTML view of a report, slowest forms first."""
+    summary = document['summary']
+    e = html.escape
+    rows = []
+    for record in sorted(document['forms'], key=lambda r: r['duration_s'], reverse=True):
+        rows.append(
+            f"<tr class=\"{e(record['status'])}\"><td>{e(str(record['form_id']))}</td>"
+            f"<td>{e(record['title'])}</td><td>{e(record['status'])}</td>"
+            f"<td>{e(record['routing_type'] or '')}</td>"
+            f"<td class=\"n\">{record['duration_s']:.1f}</td>"
+            f"<td class=\"n\">{record['rules_added']}</td><td class=\"n\">{record['rules_kept']}</td>"
+            f"<td class=\"n\">{record['rules_removed']}</td><td class=\"n\">{record['retries']}</td>"
+            f"<td>{e(record['error_class'] or '')}</td></tr>"
+        )
+    counts = ", ".join(f"{e(k)}: {v}" for k, v in sorted(summary['status_counts'].items()))
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Lead Router run - {e(summary['site'] or '')}</title>
+<style>
+body {{ font-family: -apple-system, Helvetica, Arial, sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; }}
+td.n {{ text-align: right; }}
+tr.failed {{ background: #fde2e2; }}
+tr.skipped {{ background: #f3f3f3; }}
+</style></head><body>
+<h1>Lead Router run</h1>
+<p><b>Site:</b> {e(summary['site'] or '')}<br>
+<b>Started:</b> {e(summary['started_at'])} &middot; <b>Duration:</b> {summary['duration_s']:.0f}s
+&middot; <b>Throughput:</b> {summary['forms_per_minute']} forms/min<br>
+<b>Forms:</b> {summary['forms']} ({counts})<br>
+<b>Rules:</b> {summary['rules_added']} added, {summary['rules_kept']} kept, {summary['rules_removed']} removed</p>
+<h2>Forms, slowest first</h2>
+<table>
+<tr><th>ID</th><th>Form</th><th>Status</th><th>Routing</th><th>Seconds</th>
+<th>Added</th><th>Kept</th><th>Removed</th><th>Retries</th><th>Error</th></tr>
+{chr(10).join(rows)}
+</table>
+</body></html>
+"""
@@ -0,0 +1,282 @@
+"""
+Long-running service mode: keep logged-in browsers and the Google Sheets client
+warm, and run "sync site X from sheet Y" jobs posted to a local HTTP API.
+
+    python main.py serve                 listen on 127.0.0.1:8765 (LEADROUTER_SERVICE_PORT)
+    python main.py submit SITE SHEET     queue a job (add --wait to follow it)
+
+API (JSON):
+    POST /jobs        {"site": ..., "sheet": ..., "prune": false, "dedupe": false,
+                       "http": false, "location_notifications": {"Text Notification": true}}
+                      -> 202 {"job": {...}}
+    GET  /jobs        -> {"jobs": [...]}, newest first
+    GET  /jobs/<id>   -> {"job": {...}}: status is queued, running, succeeded or failed
+                         (failed if the run stopped early or any form was not synced)
+    GET  /health      -> warm sites and queue length
+
+Jobs run one at a time in submission order. They are kept in
+LEADROUTER_SERVICE_DIR/jobs.json (default .leadrouter-service), so status
+survives a restart; jobs that were running when the service stopped are queued
+again (a sync can safely be repeated). Logins that cannot be restored from the
+saved session are done in the service's own terminal and Chrome window.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from env_config import env_int
+from metrics import RunMetrics
+
+DEFAULT_PORT = 8765
+JOB_OPTIONS = ('prune', 'dedupe', 'http')
+FINISHED = ('succeeded', 'failed')
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class JobStore:
+    """Jobs persisted to one JSON file, rewritten atomically on every change."""
+
+    def __init__(self, path):
+        self.path = path
+        self.jobs = {}  # id -> job dict, in submission order
+        self._cond = threading.Condition()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for job in json.load(f).get('jobs', []):
+                    if job['status'] == 'running':
+                        job['status'] = 'queued'
+                        job['note'] = 'requeued after a service restart'
+                    self.jobs[job['id']] = job
+
+    def create(self, site, sheet, options, location_notifications=None):
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'site': site.rstrip('/'),
+            'sheet': sheet,
+            'options': {name: bool(options.get(name)) for name in JOB_OPTIONS},
+            'location_notifications': dict(location_notifications or {}),
+            'status': 'queued',
+            'created_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+            'summary': None,
+        }
+        with self._cond:
+            self.jobs[job['id']] = job
+            self._save()
+            self._cond.notify_all()
+        return dict(job)
+
+    def update(self, job_id, **fields):
+        with self._cond:
+            self.jobs[job_id].update(fields)
+            self._save()
+
+    def get(self, job_id):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self._cond:
+            return [dict(job) for job in reversed(list(self.jobs.values()))]
+
+    def queued(self):
+        with self._cond:
+            return sum(1 for job in self.jobs.values() if job['status'] == 'queued')
+
+    def next_queued(self, stop):
+        """Block until a job is queued (or stop is set); mark it running and return it."""
+        with self._cond:
+            while not stop.is_set():
+                job = next((j for j in self.jobs.values() if j['status'] == 'queued'), None)
+                if job:
+                    job.update(status='running', started_at=_now(), error=None)
+                    self._save()
+                    return dict(job)
+                self._cond.wait(timeout=1)
+        return None
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'jobs': list(self.jobs.values())}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class SyncService:
+    """Runs queued jobs with one warm LeadRouter (browser + login) per site.
+
+    router_factory(site, metrics) builds a LeadRouter; it is passed in by main.py so this
+    module does not import it. Every router records into the service's one metrics
+    registry under its own site label.
+    """
+
+    def __init__(self, router_factory, get_sheet_id, port=None, service_dir=None):
+        self.router_factory = router_factory
+        self.get_sheet_id = get_sheet_id
+        self.port = port or env_int('LEADROUTER_SERVICE_PORT', DEFAULT_PORT)
+        self.service_dir = service_dir or os.getenv('LEADROUTER_SERVICE_DIR', '.leadrouter-service')
+        self.store = JobStore(os.path.join(self.service_dir, 'jobs.json'))
+        self.routers = {}  # site -> LeadRouter with a live, logged-in browser
+        self.sheets_service = None  # Google Sheets client shared by every router
+        self.metrics = RunMetrics.from_env('service')  # One endpoint/textfile for all sites
+        self._stop = threading.Event()
+        self._server = None
+
+    def run_job(self, job):
+        router = self.routers.get(job['site'])
+        if router is None:
+            print(f"\nStarting a session for {job['site']}")
+            router = self.router_factory(job['site'], self.metrics.for_site(job['site']))
+            router.sheets_service = self.sheets_service
+            self.routers[job['site']] = router
+        router.sheet_id = self.get_sheet_id(job['sheet'])
+        router.prune_rules = job['options']['prune']
+        router.dedupe_rows = job['options']['dedupe']
+        router.http_mode = job['options']['http']
+        router.interactive = False
+        router.location_notification_answers = dict(job['location_notifications'])
+        router.last_report = None
+        router.run_error = None
+
+        completed = router.sync()
+        self.sheets_service = router.sheets_service
+        if not completed:
+            raise RuntimeError("Stopped before any change (sheet or pre-flight problems - see the service log)")
+        if router.run_error:
+            raise RuntimeError(f"Sync stopped early: {router.run_error}")
+        if router.last_report is None:
+            raise RuntimeError("Sync stopped before processing any form (not logged in, or no active forms - see the service log)")
+        summary = router.last_report.summary()
+        unfinished = {status: count for status, count in summary['status_counts'].items()
+                      if status not in ('success', 'skipped')}
+        if unfinished:
+            raise RuntimeError("Forms not synced: " + ", ".join(f"{count} {status}" for status, count in sorted(unfinished.items())))
+        return summary
+
+    def _worker(self):
+        while not self._stop.is_set():
+            job = self.store.next_queued(self._stop)
+            if job is None:
+                break
+            print(f"\n=== Job {job['id']}: sync {job['site']} from {job['sheet']} ===")
+            try:
+                summary = self.run_job(job)
+                self.store.update(job['id'], status='succeeded', finished_at=_now(), summary=summary)
+                print(f"=== Job {job['id']} finished ===")
+            except (Exception, SystemExit) as e:
+                # SystemExit: the browser helpers exit on a missing Chrome/ChromeDriver
+                router = self.routers.get(job['site'])
+                summary = router.last_report.summary() if router and router.last_report else None
+                self.store.update(job['id'], status='failed', finished_at=_now(),
+                                  error=f"{e.__class__.__name__}: {e}", summary=summary)
+                print(f"=== Job {job['id']} failed: {e} ===")
+
+    def health(self):
+        return {'status': 'ok', 'sites': sorted(self.routers), 'queued': self.store.queued()}
+
+    def serve_forever(self):
+        service = self
+        self.metrics.start()
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status, payload):
+                body = json.dumps(payload, indent=2).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split('?')[0].rstrip('/')
+                if path == '/health':
+                    self._send(200, service.health())
+                elif path == '/jobs':
+                    self._send(200, {'jobs': service.store.list()})
+                elif path.startswith('/jobs/'):
+                    job = service.store.get(path[len('/jobs/'):])
+                    if job:
+                        self._send(200, {'job': job})
+                    else:
+                        self._send(404, {'error': 'no such job'})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if self.path.split('?')[0].rstrip('/') != '/jobs':
+                    self._send(404, {'error': 'not found'})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                    site, sheet = request['site'], request['sheet']
+                    if not str(site).startswith(('http://', 'https://')) or not sheet:
+                        raise ValueError("site must be an http(s) URL and sheet a Google Sheet URL or ID")
+                except (KeyError, ValueError) as e:
+                    self._send(400, {'error': f"bad job request: {e}"})
+                    return
+                job = service.store.create(site, sheet, request, request.get('location_notifications'))
+                print(f"Queued job {job['id']}: {job['site']}")
+                self._send(202, {'job': job})
+
+            def log_message(self, format, *args):
+                pass  # Job progress is printed by the worker
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        worker = threading.Thread(target=self._worker, name='leadrouter-jobs')
+        worker.start()
+        print(f"Lead Router service listening on http://127.0.0.1:{self.port} "
+              f"({self.store.queued()} queued job(s)). Press Ctrl+C to stop.")
+        try:
+            while worker.is_alive():
+                worker.join(timeout=1)
+        except KeyboardInterrupt:
+            print("\nStopping after the current job...")
+            self._stop.set()
+            self.store.wake()
+            worker.join()
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+            for router in self.routers.values():
+                router.interactive = False
+                router.close_browser()
+            self.metrics.stop()
+
+
+def submit_job(site, sheet, options, port=None, wait=False, poll_seconds=5):
+    """Client side of `main.py submit`: queue a job and optionally poll until it finishes."""
+    import urllib.request
+    base = f"http://127.0.0.1:{port or env_int('LEADROUTER_SERVICE_PORT', DEFAULT_PORT)}"
+    payload = dict(options, site=site, sheet=sheet)
+    request = urllib.request.Request(base + '/jobs', data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request, timeout=10) as response:
+        job = json.loads(response.read())['job']
+    print(f"Queued job {job['id']} - status: {base}/jobs/{job['id']}")
+    while wait and job['status'] not in FINISHED:
+        time.sleep(poll_seconds)
+        with urllib.request.urlopen(f"{base}/jobs/{job['id']}", timeout=10) as response:
+            job = json.loads(response.read())['job']
+    if wait:
+        print(f"Job {job['id']} {job['status']}" + (f": {job['error']}" if job['error'] else ""))
+        if job['summary']:
+            print(json.dumps(job['summary'], indent=2))
+    return job
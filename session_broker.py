@@ -0,0 +1,286 @@
+"""
+One SSO login shared by every browser session and HTTP client.
+
+After the manual login the broker captures all cookies (including the SSO
+provider's, via CDP) and the site's localStorage, and keeps them encrypted on
+disk until they expire, so later runs and browser restarts skip the login.
+Workers that hit the login page call renew(): the first one runs the single
+re-authentication while the others wait for it instead of failing. If nobody
+logs in again, renew() raises LoginFailed for that worker, the waiting ones
+and every later caller still holding the expired session.
+
+Files live in LEADROUTER_SESSION_DIR (default .leadrouter-sessions): one
+<host>.session file per site plus the encryption key (or set
+LEADROUTER_SESSION_KEY to a Fernet key). Sessions are kept for at most
+LEADROUTER_SESSION_TTL_HOURS (default 8) or until the WordPress login cookie
+expires, whichever is sooner. Encryption needs the cryptography package;
+without it the session is only kept in memory.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from env_config import env_float
+
+LOCAL_STORAGE_SCRIPT = """
+    var items = {};
+    for (var i = 0; i < window.localStorage.length; i++) {
+        var key = window.localStorage.key(i);
+        items[key] = window.localStorage.getItem(key);
+    }
+    return items;
+"""
+
+
+class SessionExpired(Exception):
+    """The site redirected to a login page: the shared session needs renewing."""
+
+
+class LoginFailed(Exception):
+    """Re-authentication ended without a logged-in session (e.g. nobody logged in before the timeout)."""
+
+
+class SessionBroker:
+    def __init__(self, site, session_dir=None, ttl_hours=None):
+        self.site = site.rstrip('/')
+        self.host = urlparse(self.site).hostname or ''
+        self.session_dir = session_dir or os.getenv('LEADROUTER_SESSION_DIR', '.leadrouter-sessions')
+        self.ttl = (ttl_hours if ttl_hours is not None else env_float('LEADROUTER_SESSION_TTL_HOURS', 8)) * 3600
+        self.path = os.path.join(self.session_dir, re.sub(r'[^A-Za-z0-9.-]+', '_', self.host or 'site') + '.session')
+        self.cookies = []
+        self.local_storage = {}
+        self.expires_at = 0
+        self.generation = 0  # Bumped on every capture; workers compare it to spot stale sessions
+        self._cond = threading.Condition()
+        self._renewing = False
+        self._failed_generation = None  # Generation whose re-authentication failed
+
+    # State
+
+    def is_valid(self):
+        return bool(self.cookies) and time.time() < self.expires_at
+
+    def is_login_url(self, url):
+        """True for wp-login.php or any page off the site (the SSO provider)."""
+        if not url or url.startswith(('data:', 'about:', 'chrome:')):
+            return False
+        if 'wp-login.php' in url:
+            return True
+        host = urlparse(url).hostname or ''
+        return bool(self.host) and host != self.host and not host.endswith('.' + self.host)
+
+    def capture(self, driver):
+        """Take the cookies and localStorage of a logged-in browser and persist them."""
+        try:
+            cookies = driver.execute_cdp_cmd('Network.getAllCookies', {}).get('cookies', [])
+            cookies = [_from_cdp(cookie) for cookie in cookies]
+        except Exception:
+            cookies = driver.get_cookies()  # Current domain only
+        try:
+            local_storage = driver.execute_script(LOCAL_STORAGE_SCRIPT) or {}
+        except Exception:
+            local_storage = {}
+
+        expires_at = time.time() + self.ttl
+        login_expiry = [c['expiry'] for c in cookies
+                        if c['name'].startswith('wordpress_logged_in') and c.get('expiry')]
+        if login_expiry:
+            expires_at = min(expires_at, min(login_expiry))
+
+        with self._cond:
+            self.cookies = cookies
+            self.local_storage = local_storage
+            self.expires_at = expires_at
+            self.generation += 1
+            self._cond.notify_all()
+        self.save()
+        return len(cookies)
+
+    # Handing the session out
+
+    def apply_to_driver(self, driver):
+        """Load the shared session into a browser. Returns False if the site still wants a login."""
+        if not self.cookies:
+            return False
+        try:
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': [_to_cdp(c) for c in self.cookies]})
+            driver.get(self.site + '/')
+        except Exception:
+            # Without CDP cookies can only be set for the page currently loaded
+            driver.get(self.site + '/')
+            for cookie in self.cookies:
+                cookie = dict(cookie)
+                cookie.pop('sameSite', None)
+                try:
+                    driver.add_cookie(cookie)
+                except Exception:
+                    continue  # Cookie for another domain (e.g. SSO provider)
+        if self.local_storage:
+            driver.execute_script(
+                "var items = arguments[0]; for (var key in items) { window.localStorage.setItem(key, items[key]); }",
+                self.local_storage)
+        driver.get(self.site + '/wp/wp-admin/')
+        return not self.is_login_url(driver.current_url)
+
+    def apply_to_session(self, session):
+        """Copy the site cookies into a requests.Session (or anything with a compatible cookie jar)."""
+        for cookie in self.cookies:
+            if self._for_site(cookie):
+                session.cookies.set(cookie['name'], cookie['value'],
+                                    domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+        return session
+
+    def cookie_header(self):
+        """Cookie header value for plain HTTP clients."""
+        return '; '.join(f"{c['name']}={c['value']}" for c in self.cookies if self._for_site(c))
+
+    def _for_site(self, cookie):
+        domain = cookie.get('domain', '').lstrip('.')
+        return not domain or self.host == domain or self.host.endswith('.' + domain)
+
+    # Expiry handling
+
+    def renew(self, seen_generation, reauthenticate):
+        """Called by a worker whose session (generation seen_generation) hit a login page.
+
+        The first caller runs reauthenticate() (which must end with capture(), or raise
+        LoginFailed); everyone else blocks until it is done. Returns the new generation.
+        """
+        with self._cond:
+            if self.generation != seen_generation:
+                return self.generation  # Someone already renewed it
+            if self._renewing:
+                self._cond.wait_for(lambda: not self._renewing)
+            if self._failed_generation == seen_generation:
+                raise LoginFailed("the login session expired and nobody logged in again")
+            if self.generation != seen_generation:
+                return self.generation
+            self._renewing = True
+        try:
+            reauthenticate()
+        except LoginFailed:
+            with self._cond:
+                self._failed_generation = seen_generation
+            raise
+        finally:
+            with self._cond:
+                self._renewing = False
+                self._cond.notify_all()
+        return self.generation
+
+    def forget_failed_login(self):
+        """Let the next renew() ask for a login again (called at the start of each run)."""
+        with self._cond:
+            self._failed_generation = None
+
+    def wait_until_ready(self, timeout=None):
+        """Block while a re-authentication is in progress."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._renewing, timeout)
+
+    # Encrypted storage
+
+    def save(self):
+        fernet = self._fernet()
+        if fernet is None:
+            return False
+        payload = json.dumps({
+            'site': self.site,
+            'cookies': self.cookies,
+            'local_storage': self.local_storage,
+            'expires_at': self.expires_at,
+        }).encode('utf-8')
+        _write_private(self.path, fernet.encrypt(payload))
+        return True
+
+    def load(self):
+        """Load a saved session for this site. Returns True if one was found and has not expired."""
+        if not os.path.exists(self.path):
+            return False
+        fernet = self._fernet()
+        if fernet is None:
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                data = json.loads(fernet.decrypt(f.read()))
+        except Exception as e:
+            print(f"Ignoring saved session {self.path}: {e.__class__.__name__}")
+            return False
+        if data.get('site') != self.site or time.time() >= data.get('expires_at', 0):
+            return False
+        with self._cond:
+            self.cookies = data['cookies']
+            self.local_storage = data.get('local_storage', {})
+            self.expires_at = data['expires_at']
+            self.generation += 1
+        return True
+
+    def forget(self):
+        """Drop the saved session, e.g. when the site no longer accepts it."""
+        self.cookies = []
+        self.expires_at = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _fernet(self):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            print("cryptography is not installed - the login session will not be saved to disk")
+            return None
+        key = os.getenv('LEADROUTER_SESSION_KEY')
+        if not key:
+            key_path = os.path.join(self.session_dir, 'key')
+            if os.path.exists(key_path):
+                with open(key_path, 'rb') as f:
+                    key = f.read().strip()
+            else:
+                key = Fernet.generate_key()
+                _write_private(key_path, key)
+        return Fernet(key)
+
+
+def _write_private(path, data):
+    """Write bytes to a file only the current user can read."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+
+
+def _from_cdp(cookie):
+    """CDP cookie -> Selenium cookie dict."""
+    converted = {
+        'name': cookie['name'],
+        'value': cookie['value'],
+        'domain': cookie.get('domain', ''),
+        'path': cookie.get('path', '/'),
+        'secure': cookie.get('secure', False),
+        'httpOnly': cookie.get('httpOnly', False),
+    }
+    if cookie.get('sameSite'):
+        converted['sameSite'] = cookie['sameSite']
+    if not cookie.get('session') and cookie.get('expires', -1) > 0:
+        converted['expiry'] = int(cookie['expires'])
+    return converted
+
+
+def _to_cdp(cookie):
+    """Selenium cookie dict -> CDP Network.CookieParam."""
+    converted = {
+        'name': cookie['name'],
+        'value': cookie['value'],
+        'domain': cookie.get('domain', ''),
+        'path': cookie.get('path', '/'),
+        'secure': cookie.get('secure', False),
+        'httpOnly': cookie.get('httpOnly', False),
+    }
+    if cookie.get('sameSite') in ('Strict', 'Lax', 'None'):
+        converted['sameSite'] = cookie['sameSite']
+    if cookie.get('expiry'):
+        converted['expires'] = cookie['expiry']
+    return converted
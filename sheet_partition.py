@@ -0,0 +1,101 @@
+"""
+Multi-site sheets: one "Combined Feed Info" tab for many sites and forms.
+
+Two optional columns narrow where a row applies:
+    SITE      the site's domain (e.g. smithford.com, with or without https://
+              and www.), or a brand name given to the run as LEADROUTER_SITE_NAME.
+              Rows with a blank SITE apply to every site.
+    FORM TAG  text that must appear in a form's title (case-insensitive), e.g.
+              "Service" or "Trade-In". Rows with a blank FORM TAG apply to every form.
+The column names can be changed with LEADROUTER_SITE_COLUMN and
+LEADROUTER_FORM_TAG_COLUMN. Sheets without these columns work as before.
+
+The sheet is partitioned once per read. A site's run gets only its own
+rows, and each form gets only the rows for its tags, so the rules
+compared and written on every form are only the ones that belong there.
+"""
+
+import os
+import re
+from urllib.parse import urlparse
+
+
+def site_column():
+    return os.getenv('LEADROUTER_SITE_COLUMN', 'SITE')
+
+
+def tag_column():
+    return os.getenv('LEADROUTER_FORM_TAG_COLUMN', 'FORM TAG')
+
+
+def site_key(value):
+    """Normalized site: bare lower-case host for URLs and domains, lower-case text for brand names."""
+    text = str(value or '').strip().lower()
+    if not text:
+        return ''
+    host = urlparse(text if '://' in text else f"//{text}").hostname or text
+    return re.sub(r'^www\.', '', host)
+
+
+def run_site_keys(wp_url):
+    """The SITE values that mean this run's site: its domain and LEADROUTER_SITE_NAME."""
+    keys = {site_key(wp_url)}
+    if os.getenv('LEADROUTER_SITE_NAME'):
+        keys.add(site_key(os.getenv('LEADROUTER_SITE_NAME')))
+    return keys - {''}
+
+
+class SheetPartition:
+    """Rows indexed by site in one pass; positions keep every slice in sheet order."""
+
+    def __init__(self, rows, row_numbers=None):
+        self.rows = rows
+        self.row_numbers = row_numbers or list(range(2, len(rows) + 2))
+        self.by_site = {}  # site key ('' = every site) -> row positions
+        for position, row in enumerate(rows):
+            self.by_site.setdefault(site_key(row.get(site_column())), []).append(position)
+
+    @property
+    def partitioned(self):
+        return any(self.by_site)
+
+    def sites(self):
+        """{site key: row count} for the sites named in the sheet."""
+        return {site: len(positions) for site, positions in self.by_site.items() if site}
+
+    def for_site(self, wp_url):
+        """(rows, sheet row numbers) for one site: its own rows plus the shared ones, in sheet order."""
+        positions = list(self.by_site.get('', []))
+        for key in run_site_keys(wp_url):
+            positions += self.by_site.get(key, [])
+        positions.sort()
+        return [self.rows[p] for p in positions], [self.row_numbers[p] for p in positions]
+
+
+class FormSlicer:
+    """Per-form rows for tagged sheets: the untagged rows plus those whose FORM TAG is in
+    the form's title. Forms that match the same tags share one cached list."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        column = tag_column()
+        self.tags = {}  # lower-case tag -> positions
+        for position, row in enumerate(rows):
+            tag = str(row.get(column) or '').strip().lower()
+            if tag:
+                self.tags.setdefault(tag, []).append(position)
+        self._cache = {}
+
+    @property
+    def tagged(self):
+        return bool(self.tags)
+
+    def for_form(self, title):
+        if not self.tags:
+            return self.rows
+        title = str(title or '').lower()
+        matched = frozenset(tag for tag in self.tags if tag in title)
+        if matched not in self._cache:
+            excluded = {p for tag, positions in self.tags.items() if tag not in matched for p in positions}
+            self._cache[matched] = [row for p, row in enumerate(self.rows) if p not in excluded]
+        return self._cache[matched]
@@ -0,0 +1,162 @@
+"""
+Watch mode: poll the spreadsheet's modified time and apply sheet edits as they happen.
+
+Polling asks the Drive API only for the file's modifiedTime (a few hundred
+bytes), so it is cheap to do every LEADROUTER_WATCH_INTERVAL seconds (default
+60). After a change the sheet must stay unchanged for LEADROUTER_WATCH_DEBOUNCE
+seconds (default 30) so a burst of edits is applied once. Then the
+"Combined Feed Info" tab is read again and compared with the last applied rows:
+only changed or new rows are applied, and the rules of the rows they replaced
+(or of removed rows) are retired. Rows are only counted as applied once every
+form took them; if forms failed, they are applied again after the next interval
+even without a new edit.
+
+Reading the modified time needs the drive.metadata.readonly scope; the first
+watch run asks to sign in to Google again to grant it.
+"""
+
+import time
+
+from env_config import env_float
+
+DRIVE_SCOPE = 'https://www.googleapis.com/auth/drive.metadata.readonly'
+
+
+def _row_signature(row):
+    return tuple(sorted((col, str(value).strip()) for col, value in row.items()))
+
+
+def dealer_key(row):
+    """Which dealer a row is about, for reporting changes."""
+    return str(row.get('FEED ID') or row.get('DEALERSHIP NAME', '')).strip().lower()
+
+
+def diff_rows(old_rows, new_rows):
+    """Compare two sheet reads. Returns (changed, retired, dealers):
+      changed  new rows that were not in the old read (new dealers or edited rows)
+      retired  old rows that are gone (edited or removed): their rules must go
+      dealers  {'added', 'changed', 'removed'} -> sorted dealer keys, for messages
+    """
+    old_signatures = {_row_signature(row) for row in old_rows}
+    new_signatures = {_row_signature(row) for row in new_rows}
+    changed = [row for row in new_rows if _row_signature(row) not in old_signatures]
+    retired = [row for row in old_rows if _row_signature(row) not in new_signatures]
+
+    old_keys = {dealer_key(row) for row in old_rows}
+    new_keys = {dealer_key(row) for row in new_rows}
+    changed_keys = {dealer_key(row) for row in changed}
+    retired_keys = {dealer_key(row) for row in retired}
+    dealers = {
+        'added': sorted(changed_keys - old_keys),
+        'changed': sorted((changed_keys | retired_keys) & old_keys & new_keys),
+        'removed': sorted(retired_keys - new_keys),
+    }
+    return changed, retired, dealers
+
+
+class SheetWatcher:
+    """Keeps one LeadRouter's site in step with its sheet."""
+
+    def __init__(self, router, interval=None, debounce=None):
+        self.router = router
+        self.interval = interval or env_float('LEADROUTER_WATCH_INTERVAL', 60)
+        self.debounce = debounce if debounce is not None else env_float('LEADROUTER_WATCH_DEBOUNCE', 30)
+        self.drive = None
+        self.applied_rows = None
+        self.retry_pending = False  # The last apply left forms failed; apply again without waiting for an edit
+
+    def revision(self):
+        """The spreadsheet's modifiedTime (changes on every edit, in any tab)."""
+        if self.drive is None:
+            from googleapiclient.discovery import build
+            self.router.setup_google_credentials(extra_scopes=[DRIVE_SCOPE])
+            self.drive = build('drive', 'v3', credentials=self.router.google_creds)
+        meta = self.drive.files().get(fileId=self.router.sheet_id, fields='modifiedTime',
+                                      supportsAllDrives=True).execute()
+        return meta['modifiedTime']
+
+    def wait_for_edit(self, last_revision):
+        """Poll until the revision moves on and then stays put for the debounce period."""
+        revision = last_revision
+        while revision == last_revision:
+            time.sleep(self.interval)
+            revision = self._poll(revision)
+        print(f"\nSheet edited ({revision}) - waiting for edits to settle...")
+        settled_since = time.monotonic()
+        while time.monotonic() - settled_since < self.debounce:
+            time.sleep(min(self.interval, self.debounce))
+            latest = self._poll(revision)
+            if latest != revision:
+                revision = latest
+                settled_since = time.monotonic()
+        return revision
+
+    def _poll(self, revision):
+        try:
+            return self.revision()
+        except Exception as e:
+            print(f"Could not check the sheet for edits: {e}")
+            return revision  # Try again next interval
+
+    def run(self):
+        router = self.router
+        revision = self.revision()  # Taken before the first read so edits made during it are not missed
+        print("\nWatch mode: applying the whole sheet once, then only what changes.")
+        if router.sync():
+            self._applied(router.last_sheet_data)
+        else:
+            print("Fix the sheet; watching for the next edit...")
+
+        while True:
+            if self.retry_pending:
+                time.sleep(self.interval)
+                revision = self._poll(revision)
+            else:
+                revision = self.wait_for_edit(revision)
+            rows = router.read_google_sheet()
+            if not rows or not router.preflight(rows):
+                print("Sheet has problems - nothing applied. Watching for the next edit...")
+                self.retry_pending = False
+                continue
+            if self.applied_rows is None or router.prune_rules:
+                # Nothing applied yet, or prune mode (which needs the whole sheet to compact)
+                if router.sync(rows):
+                    self._applied(router.last_sheet_data)
+                else:
+                    self.retry_pending = False
+                continue
+
+            changed, retired, dealers = diff_rows(self.applied_rows, rows)
+            if not changed and not retired:
+                print("No routing rows changed (edit was elsewhere in the spreadsheet)")
+                self.retry_pending = False
+                continue
+            print(f"Sheet changes: {len(dealers['added'])} dealer(s) added, {len(dealers['changed'])} changed, "
+                  f"{len(dealers['removed'])} removed")
+            for kind in ('added', 'changed', 'removed'):
+                if dealers[kind]:
+                    print(f"  {kind}: {', '.join(dealers[kind][:20])}{' ...' if len(dealers[kind]) > 20 else ''}")
+
+            router.retired_rows, router.full_sheet = retired, rows
+            try:
+                router.apply_sheet(changed)
+            finally:
+                router.retired_rows, router.full_sheet = [], None
+            if self._applied(rows):
+                print(f"Applied. Watching for the next edit (every {self.interval:g}s)...")
+
+    def _applied(self, rows):
+        """Take rows as the applied snapshot if the run finished every form. Otherwise keep
+        the old snapshot, so the next pass applies the same changes again, and retry it
+        after the interval. Returns True if the rows were taken."""
+        router = self.router
+        report = router.last_report
+        unfinished = report is None or any(status not in ('success', 'skipped')
+                                           for status in report.summary()['status_counts'])
+        if router.run_error or unfinished:
+            self.retry_pending = True
+            print(f"Some forms did not take the changes - trying again in {self.interval:g}s...")
+            return False
+        self.applied_rows = rows
+        self.retry_pending = False
+        return True
@@ -0,0 +1,134 @@
+"""
+Interleave forms across several tabs of the one authenticated Chrome window.
+While one tab is saving or loading, the next form is already loading in
+another tab, so page loads overlap with form filling without extra Chrome
+processes or another SSO login.
+"""
+
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+class TabPool:
+    """A fixed set of browser tabs that forms are rotated through.
+
+    Each tab is in one of three states:
+      idle     - free to load the next form
+      loading  - prefetching a form that has not started yet
+      pending  - holds a save whose result has not been checked yet
+    """
+
+    def __init__(self, driver, size, error_probe, page_timeout=10):
+        self.driver = driver
+        self.size = max(1, size)
+        self.error_probe = error_probe  # callable(driver) -> list of error messages
+        self.page_timeout = page_timeout
+        self.handles = []
+        self.form_tabs = {}   # form_id -> handle prefetching it
+        self.pending = {}     # handle -> (form_info, clicked save button, URL before the click)
+        self.active = None
+
+    def open(self):
+        """Open the extra tabs next to the current (authenticated) one."""
+        self.handles = [self.driver.current_window_handle]
+        while len(self.handles) < self.size:
+            self.driver.switch_to.new_window('tab')
+            self.handles.append(self.driver.current_window_handle)
+        self.active = self.handles[0]
+        self.driver.switch_to.window(self.active)
+        print(f"Opened {len(self.handles)} tabs for interleaved form processing")
+
+    def start_form(self, form_id, upcoming, url_for, on_settled):
+        """Make a tab active for form_id and start loading the next forms.
+
+        Returns True if the form's page was prefetched (and is now loaded),
+        False if the caller still has to navigate the active tab itself.
+        """
+        handle = self.form_tabs.pop(form_id, None)
+        prefetched = handle is not None
+        if handle is None:
+            handle = self._idle_tab(exclude=None) or self._pending_tab()
+            if handle is None:
+                # Every tab is prefetching some other form (queue was reordered by retries)
+                handle = self.form_tabs.pop(next(iter(self.form_tabs)))
+            self._settle(handle, on_settled)
+        self.active = handle
+
+        # Kick off the next forms in the other tabs before blocking on this one. Tabs with a
+        # save still in flight are left alone: navigating them could cancel the save.
+        for form_info in upcoming:
+            if form_info['id'] in self.form_tabs or form_info['id'] == form_id:
+                continue
+            other = self._idle_tab(exclude=handle)
+            if other is None:
+                break
+            self.driver.switch_to.window(other)
+            self.driver.execute_script("window.location.href = arguments[0];", url_for(form_info))
+            self.form_tabs[form_info['id']] = other
+
+        self.driver.switch_to.window(handle)
+        if prefetched:
+            self._wait_ready()
+        return prefetched
+
+    def mark_pending(self, form_info, clicked, url):
+        """The active tab just clicked save (clicked, on the page at url); confirm the result later."""
+        self.pending[self.active] = (form_info, clicked, url)
+
+    def settle_all(self, on_settled):
+        """Confirm every outstanding save, e.g. before the final summary."""
+        for handle in list(self.pending):
+            self._settle(handle, on_settled)
+        if self.active in self.handles:
+            self.driver.switch_to.window(self.active)
+
+    def discard_prefetched(self):
+        """Forget prefetched pages (e.g. they loaded a login page); their tabs become idle."""
+        self.form_tabs.clear()
+
+    def _round_robin(self):
+        """Tabs in round-robin order, starting after the active one."""
+        start = self.handles.index(self.active) + 1 if self.active in self.handles else 0
+        return [self.handles[(start + offset) % len(self.handles)] for offset in range(len(self.handles))]
+
+    def _idle_tab(self, exclude):
+        """Next tab neither prefetching a form nor holding an unconfirmed save."""
+        busy = set(self.form_tabs.values()) | set(self.pending)
+        return next((h for h in self._round_robin() if h != exclude and h not in busy), None)
+
+    def _pending_tab(self):
+        """Next tab holding an unconfirmed save (to be settled and reused when no tab is idle)."""
+        return next((h for h in self._round_robin() if h in self.pending), None)
+
+    def _settle(self, handle, on_settled):
+        entry = self.pending.pop(handle, None)
+        if entry is None:
+            return
+        form_info, clicked, url = entry
+        self.driver.switch_to.window(handle)
+        self._wait_submitted(clicked, url)
+        self._wait_ready()
+        on_settled(form_info, self.error_probe(self.driver))
+
+    def _wait_submitted(self, clicked, url):
+        """Wait until the save has replaced the page: the clicked button went stale or the URL changed.
+        Right after the click readyState is still "complete" for the old page."""
+        start = time.perf_counter()
+        try:
+            WebDriverWait(self.driver, self.page_timeout).until(
+                lambda d: EC.staleness_of(clicked)(d) or d.current_url != url
+            )
+        except TimeoutException:
+            print(f"Save did not reload the tab after {time.perf_counter() - start:.1f}s, checking it anyway")
+
+    def _wait_ready(self):
+        start = time.perf_counter()
+        try:
+            WebDriverWait(self.driver, self.page_timeout).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
+        except TimeoutException:
+            print(f"Tab still loading after {time.perf_counter() - start:.1f}s, proceeding anyway")
@@ -0,0 +1,331 @@
+"""
+Record a real run's admin traffic and replay it offline.
+
+Recording (python main.py sync --record DIR, or LEADROUTER_RECORD_DIR=DIR):
+Chrome's performance log supplies every request to the WordPress site with
+its timing. Response bodies are read through the DevTools protocol, and the
+rendered page is saved after every navigation and save. Everything is
+written to DIR:
+    traffic.har        HAR 1.2 log of the site's requests (bodies included)
+    snapshots/*.html   rendered DOM after each page load, numbered in order
+    recording.json     site, time of recording, counts
+Cookies, Authorization headers, WordPress/Gravity Forms nonces and login
+passwords are replaced with "REDACTED" before anything is written.
+
+Replay (python traffic_replay.py DIR [--port 8800] [--latency-scale 1.0]):
+Serves the recording on http://127.0.0.1:PORT. Requests are matched on method,
+path and query (nonces ignored). Repeated requests get the recorded responses
+in order, for example a notification page before and after its save. Each
+response is delayed by its recorded time x --latency-scale (0 for full
+speed). Point main.py at the replay URL with LEADROUTER_SKIP_SITE_CHECK=1 to
+benchmark or debug against a real site's forms without the site or its SSO.
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from metrics import page_type
+
+REDACTED = "REDACTED"
+SECRET_HEADERS = {'cookie', 'set-cookie', 'authorization', 'proxy-authorization', 'x-wp-nonce'}
+SECRET_PARAMS = re.compile(r'nonce|^pwd$|^password$|^_wp_http_referer$', re.I)
+BODY_TYPES = {'Document', 'XHR', 'Fetch', 'Script', 'Stylesheet'}
+HOP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+# Nonce values in HTML attributes, JSON and URLs
+_NONCE_PATTERNS = [
+    (re.compile(r'''((?:name|id)=["'][^"']*nonce[^"']*["'][^>]*?value=["'])[^"']*''', re.I), r'\g<1>' + REDACTED),
+    (re.compile(r'''(value=["'])[^"']*(["'][^>]*?(?:name|id)=["'][^"']*nonce)''', re.I), r'\g<1>' + REDACTED + r'\g<2>'),
+    (re.compile(r'''("[A-Za-z_]*nonce[A-Za-z_]*"\s*:\s*")[^"]*''', re.I), r'\g<1>' + REDACTED),
+    (re.compile(r'''([?&;](?:amp;)?_?[A-Za-z_]*nonce=)[^&"'\s<]*''', re.I), r'\g<1>' + REDACTED),
+]
+
+
+def scrub_text(text):
+    """Replace nonce values in an HTML/JSON/URL-encoded body."""
+    for pattern, replacement in _NONCE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def scrub_form(data):
+    """Scrub a URL-encoded form body: nonces and passwords."""
+    try:
+        pairs = parse_qsl(data, keep_blank_values=True, strict_parsing=True)
+    except ValueError:
+        return scrub_text(data)
+    return urlencode([(k, REDACTED if SECRET_PARAMS.search(k) else v) for k, v in pairs])
+
+
+def scrub_headers(headers):
+    return [{'name': name, 'value': REDACTED if name.lower() in SECRET_HEADERS else str(value)}
+            for name, value in (headers or {}).items()]
+
+
+def replay_key(method, url):
+    """Match key: method, path and query without nonce parameters."""
+    parsed = urlparse(url)
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if not SECRET_PARAMS.search(k))
+    return f"{method.upper()} {parsed.path}?{urlencode(query)}"
+
+
+class TrafficRecorder:
+    """Turns a driver's performance log into HAR entries and page snapshots."""
+
+    def __init__(self, record_dir, site):
+        self.record_dir = record_dir
+        self.site = site.rstrip('/')
+        self.host = urlparse(self.site).hostname or ''
+        self.entries = []
+        self.snapshots = 0
+        self._requests = {}  # requestId -> partial entry
+        self._bodies_seen = set()  # Static URLs whose body is already recorded
+        os.makedirs(os.path.join(record_dir, 'snapshots'), exist_ok=True)
+
+    @staticmethod
+    def configure(chrome_options):
+        """Turn on the performance log for a Chrome about to be launched or attached."""
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+
+    def attach(self, driver):
+        """Collect after every navigation, while the new page's bodies are still available."""
+        execute = driver.execute
+
+        def recording_execute(driver_command, params=None):
+            result = execute(driver_command, params)
+            if driver_command == "get":
+                self.checkpoint(driver, params.get('url', '') if params else '')
+            return result
+
+        driver.execute = recording_execute
+        return driver
+
+    def _on_site(self, url):
+        host = urlparse(url).hostname or ''
+        return host == self.host or host.endswith('.' + self.host)
+
+    def checkpoint(self, driver, label=''):
+        """Drain the performance log and save a snapshot of the current page."""
+        self.collect(driver)
+        try:
+            html = driver.page_source
+            self.snapshots += 1
+            name = f"{self.snapshots:04d}-{page_type(label or driver.current_url)}.html"
+            with open(os.path.join(self.record_dir, 'snapshots', name), 'w', encoding='utf-8') as f:
+                f.write(scrub_text(html))
+        except Exception as e:
+            print(f"Could not save page snapshot: {e}")
+
+    def collect(self, driver):
+        try:
+            messages = driver.get_log('performance')
+        except Exception:
+            return
+        for item in messages:
+            try:
+                message = json.loads(item['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method, params = message.get('method', ''), message.get('params', {})
+            if method == 'Network.requestWillBeSent':
+                self._request_sent(params)
+            elif method == 'Network.responseReceived':
+                entry = self._requests.get(params.get('requestId'))
+                if entry:
+                    entry['response'] = params.get('response', {})
+                    entry['type'] = params.get('type', entry['type'])
+            elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                entry = self._requests.pop(params.get('requestId'), None)
+                if entry and entry.get('response'):
+                    entry['finished'] = params.get('timestamp', entry['started'])
+                    self._finish(driver, params.get('requestId'), entry)
+
+    def _request_sent(self, params):
+        request = params.get('request', {})
+        request_id = params.get('requestId')
+        previous = self._requests.pop(request_id, None)
+        if previous and params.get('redirectResponse'):
+            # Same requestId is reused for the redirect target; the redirect itself is complete
+            previous['response'] = params['redirectResponse']
+            previous['finished'] = params.get('timestamp', previous['started'])
+            self._finish(None, None, previous)
+        if not self._on_site(request.get('url', '')):
+            return  # SSO provider, CDNs, analytics
+        self._requests[request_id] = {
+            'request': request,
+            'type': params.get('type', 'Other'),
+            'started': params.get('timestamp', 0),
+            'wall_time': params.get('wallTime', time.time()),
+        }
+
+    def _finish(self, driver, request_id, entry):
+        request, response = entry['request'], entry['response']
+        content = {'size': 0, 'mimeType': response.get('mimeType', '')}
+        static = entry['type'] in ('Script', 'Stylesheet')
+        if driver and request_id and entry['type'] in BODY_TYPES and not (static and request['url'] in self._bodies_seen):
+            try:
+                body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                text = body.get('body', '')
+                if body.get('base64Encoded'):
+                    content['encoding'] = 'base64'
+                else:
+                    text = scrub_text(text)
+                content.update({'text': text, 'size': len(text)})
+                if static:
+                    self._bodies_seen.add(request['url'])
+            except Exception:
+                pass  # Body already discarded by Chrome (page navigated away)
+
+        elapsed_ms = max(0.0, (entry['finished'] - entry['started']) * 1000)
+        timing = response.get('timing') or {}
+        wait_ms = max(0.0, timing.get('receiveHeadersEnd', 0) - timing.get('sendEnd', 0)) if timing else elapsed_ms
+        har_request = {
+            'method': request.get('method', 'GET'),
+            'url': scrub_text(request['url']),
+            'httpVersion': response.get('protocol', 'http/1.1'),
+            'headers': scrub_headers(request.get('headers')),
+            'queryString': [], 'cookies': [], 'headersSize': -1, 'bodySize': -1,
+        }
+        if request.get('postData'):
+            har_request['postData'] = {'mimeType': (request.get('headers') or {}).get('Content-Type', ''),
+                                       'text': scrub_form(request['postData'])}
+        headers = scrub_headers(response.get('headers'))
+        self.entries.append({
+            'startedDateTime': datetime.fromtimestamp(entry['wall_time'], timezone.utc).isoformat(),
+            'time': round(elapsed_ms, 1),
+            'request': har_request,
+            'response': {
+                'status': response.get('status', 0),
+                'statusText': response.get('statusText', ''),
+                'httpVersion': response.get('protocol', 'http/1.1'),
+                'headers': headers,
+                'cookies': [],
+                'content': content,
+                'redirectURL': next((h['value'] for h in headers if h['name'].lower() == 'location'), ''),
+                'headersSize': -1, 'bodySize': -1,
+            },
+            'cache': {},
+            'timings': {'send': 0, 'wait': round(min(wait_ms, elapsed_ms), 1),
+                        'receive': round(max(0.0, elapsed_ms - wait_ms), 1)},
+            '_resourceType': entry['type'],
+        })
+
+    def write(self, driver=None):
+        if driver is not None:
+            self.collect(driver)
+        har = {'log': {'version': '1.2', 'creator': {'name': 'lead-router', 'version': '1'},
+                       'pages': [], 'entries': self.entries}}
+        with open(os.path.join(self.record_dir, 'traffic.har'), 'w', encoding='utf-8') as f:
+            json.dump(har, f)
+        with open(os.path.join(self.record_dir, 'recording.json'), 'w', encoding='utf-8') as f:
+            json.dump({'site': self.site, 'recorded_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                       'entries': len(self.entries), 'snapshots': self.snapshots}, f, indent=2)
+        print(f"Recorded {len(self.entries)} requests and {self.snapshots} page snapshots to {self.record_dir}")
+
+
+class ReplayServer:
+    """Serves a recording back with the recorded (or scaled) latencies."""
+
+    def __init__(self, record_dir, port=8800, latency_scale=1.0):
+        with open(os.path.join(record_dir, 'traffic.har'), encoding='utf-8') as f:
+            entries = json.load(f)['log']['entries']
+        with open(os.path.join(record_dir, 'recording.json'), encoding='utf-8') as f:
+            self.site = json.load(f)['site']
+        self.port = port
+        self.latency_scale = latency_scale
+        self.origin = f"http://127.0.0.1:{port}"
+        recorded = urlparse(self.site)
+        self.recorded_origin = f"{recorded.scheme}://{recorded.netloc}"
+        self.responses = {}  # key -> recorded entries in order
+        for entry in entries:
+            self.responses.setdefault(replay_key(entry['request']['method'], entry['request']['url']), []).append(entry)
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def next_entry(self, method, path):
+        key = replay_key(method, self.recorded_origin + path)
+        with self._lock:
+            candidates = self.responses.get(key)
+            if not candidates and method == 'HEAD':
+                candidates = self.responses.get(replay_key('GET', self.recorded_origin + path))
+            if not candidates:
+                return None
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+            return candidates[min(index, len(candidates) - 1)]  # Stay on the last one after that
+
+    def _rewrite(self, text):
+        return text.replace(self.recorded_origin, self.origin).replace(
+            self.recorded_origin.replace('/', '\\/'), self.origin.replace('/', '\\/'))
+
+    def serve_forever(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _replay(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                entry = replay.next_entry(self.command, self.path)
+                if entry is None:
+                    self.send_error(404, "Not in the recording")
+                    return
+                time.sleep(entry['time'] / 1000 * replay.latency_scale)
+                response = entry['response']
+                content = response['content']
+                if content.get('encoding') == 'base64':
+                    body = base64.b64decode(content.get('text', ''))
+                else:
+                    body = replay._rewrite(content.get('text', '')).encode('utf-8')
+                self.send_response(response['status'] or 200)
+                for header in response['headers']:
+                    name = header['name']
+                    if name.lower() in HOP_HEADERS or name.lower() in SECRET_HEADERS:
+                        continue
+                    value = replay._rewrite(header['value']) if name.lower() == 'location' else header['value']
+                    for line in value.split('\n'):  # CDP joins repeated headers with newlines
+                        self.send_header(name, line)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            do_GET = do_POST = do_HEAD = _replay
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        print(f"Replaying {sum(len(v) for v in self.responses.values())} recorded responses from {self.site} "
+              f"on {self.origin} (latency x{self.latency_scale:g}). Press Ctrl+C to stop.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a recorded Lead Router run for offline benchmarking")
+    parser.add_argument('record_dir', help="Directory written by main.py --record")
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help="Multiply recorded response times (0 = no delay, 2 = twice as slow)")
+    args = parser.parse_args()
+    ReplayServer(args.record_dir, args.port, args.latency_scale).serve_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())